@@ -0,0 +1,83 @@
+"""
+Сравнение кодирования стикеров в PNG и WebP: время кодирования и размер
+изображения.
+
+Запуск: python -m benchmarks.bench_encoding [--repeat N] [--font FONT]
+"""
+import argparse
+import statistics
+import time
+from typing import Callable, Dict, List, Sequence
+
+from PIL import features
+
+from core.fonts import DEFAULT_FONT
+from core.utils.sticker_creator import (
+    COLORS_MAP, MAX_STICKER_SIZE, create_sticker, encode_sticker,
+)
+
+
+PHRASES = (
+    ('Привет',),
+    ('Съешь же ещё', 'этих мягких', 'французских булок'),
+    ('раз', 'два', 'три', 'четыре', 'пять', 'шесть', 'семь'),
+)
+
+ENCODERS: Dict[str, Callable] = {
+    'PNG': lambda image: encode_sticker(image, 'PNG'),
+    'WEBP': lambda image: encode_sticker(image, 'WEBP'),
+    'WEBP (100 KB budget)': lambda image: encode_sticker(image, 'WEBP',
+                                                         max_size=100 * 1024),
+}
+
+
+def bench(font_name: str, repeat: int) -> List[Dict]:
+    images = [create_sticker(text=phrase, font_name=font_name,
+                             background_color=background_color)
+              for phrase in PHRASES
+              for background_color in (COLORS_MAP['Белый'],
+                                       COLORS_MAP['Фиолетовый'])]
+    results = []
+    for name, encode in ENCODERS.items():
+        if name.startswith('WEBP') and not features.check('webp'):
+            continue
+        timings, sizes = [], []
+        for image in images:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                content = encode(image)
+                timings.append(time.perf_counter() - started)
+                sizes.append(len(content))
+        results.append({
+            'format': name,
+            'encode_ms_median': statistics.median(timings) * 1000,
+            'encode_ms_max': max(timings) * 1000,
+            'size_kb_mean': statistics.mean(sizes) / 1024,
+            'size_kb_max': max(sizes) / 1024,
+            'over_budget': sum(size > MAX_STICKER_SIZE for size in sizes),
+        })
+    return results
+
+
+def print_results(results: Sequence[Dict]) -> None:
+    header = ('format', 'encode_ms_median', 'encode_ms_max',
+              'size_kb_mean', 'size_kb_max', 'over_budget')
+    print(' | '.join(f'{column:>20}' for column in header))
+    for row in results:
+        print(' | '.join(f'{row[column]:>20.2f}' if isinstance(row[column], float)
+                         else f'{row[column]:>20}' for column in header))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--font', default=DEFAULT_FONT)
+    args = parser.parse_args()
+
+    if not features.check('webp'):
+        print('Pillow собран без поддержки WebP, замеряется только PNG')
+    print_results(bench(args.font, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
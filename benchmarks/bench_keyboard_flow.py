@@ -0,0 +1,116 @@
+"""
+Количество запросов к Bot API и их суммарный размер на один созданный
+стикер: диалог /create_sticker с reply-клавиатурами и диалог /quick_sticker
+с inline-клавиатурой, которая редактируется в одном сообщении.
+
+Обновления передаются диспетчеру бота из server.py напрямую, запросы бота
+принимает локальная замена Bot API (см. load_test.py). В режиме вебхука
+нажатия кнопок подтверждаются в ответе на запрос Телеграма, поэтому
+запросы answerCallbackQuery для него не учитываются. Превью на панели
+/quick_sticker по умолчанию отключено (PREVIEW_SIZE=0), с превью каждая панель
+загружается в Телеграм как фото.
+
+Запуск: python -m benchmarks.bench_keyboard_flow [--stickers N]
+"""
+import argparse
+import asyncio
+import os
+import socket
+from typing import Dict, Sequence, Tuple
+
+from aiogram import Bot, types
+from aiogram.dispatcher import Dispatcher
+
+from benchmarks.load_test import TOKEN, FakeBotAPI, start_fake_api
+
+
+TEXT = 'Съешь же ещё этих мягких французских булок'
+
+# Шаги диалога: ('message', текст сообщения) либо ('button', текст кнопки
+# последней inline-клавиатуры чата; None - первая кнопка)
+FLOWS: Dict[str, Sequence[Tuple[str, str]]] = {
+    'reply': (('message', '/create_sticker'), ('message', TEXT),
+              ('message', 'Белый'), ('message', '1'), ('message', 'Чёрный'),
+              ('message', '3, 2, 2'), ('message', 'Нет')),
+    'inline': (('message', '/quick_sticker'), ('message', TEXT),
+               ('button', 'Белый'), ('button', None), ('button', 'Чёрный'),
+               ('button', '3, 2, 2')),
+}
+
+
+def get_message_update(api: FakeBotAPI, chat_id: int, text: str) -> dict:
+    api.send_update(chat_id, text)
+    return api._updates.pop()
+
+
+async def run_flow(server, api: FakeBotAPI, steps: Sequence[Tuple[str, str]],
+                   stickers: int) -> Dict[str, int]:
+    api.requests.clear()
+    api.request_bytes.clear()
+    for chat_id in range(1, stickers + 1):
+        api.replies.setdefault(chat_id, asyncio.Queue())
+        for kind, value in steps:
+            if kind == 'message':
+                update = get_message_update(api, chat_id, value)
+            else:
+                if value is None:
+                    value = next(iter(api.inline_keyboards[chat_id][1]))
+                update = api.get_callback_update(chat_id, value)
+            await server.dispatcher.process_update(types.Update(**update))
+    return dict(api.requests), dict(api.request_bytes)
+
+
+async def run(server, api: FakeBotAPI, stickers: int) -> None:
+    Bot.set_current(server.bot)
+    Dispatcher.set_current(server.dispatcher)
+    server.render_pool.start()
+    try:
+        print(f'{"flow":>16} | {"requests":>8} | {"bytes":>8} | methods')
+        for name, steps in FLOWS.items():
+            requests, request_bytes = await run_flow(server, api, steps,
+                                                     stickers)
+            modes = [(name, requests, request_bytes)]
+            if 'answercallbackquery' in requests:
+                modes = [
+                    (f'{name} (polling)', requests, request_bytes),
+                    (f'{name} (webhook)',
+                     {method: count for method, count in requests.items()
+                      if method != 'answercallbackquery'},
+                     {method: size for method, size in request_bytes.items()
+                      if method != 'answercallbackquery'}),
+                ]
+            for mode, mode_requests, mode_bytes in modes:
+                methods = ', '.join(f'{method}={count / stickers:g}'
+                                    for method, count in sorted(mode_requests.items()))
+                print(f'{mode:>16} | {sum(mode_requests.values()) / stickers:>8.1f} | '
+                      f'{sum(mode_bytes.values()) / stickers:>8.0f} | {methods}')
+    finally:
+        server.render_pool.shutdown()
+        await server.bot.session.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stickers', type=int, default=20)
+    args = parser.parse_args()
+
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    os.environ['BOT_TOKEN'] = TOKEN
+    os.environ['TELEGRAM_API_URL'] = 'http://127.0.0.1:{}'.format(
+        sock.getsockname()[1])
+
+    import server
+
+    api = FakeBotAPI()
+    runner = server.loop.run_until_complete(start_fake_api(api, sock))
+    try:
+        server.loop.run_until_complete(run(server, api, args.stickers))
+    finally:
+        server.loop.run_until_complete(runner.cleanup())
+        server.session_store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""
+Микробенчмарк отрисовки стикеров: create_sticker (полная отрисовка с
+холодным кэшем масок текста), перекраска - create_sticker с маской из кэша,
+превью стикера, _get_font_size, _get_text_area_height_in_px и кодирование в
+PNG на фиксированной матрице фраз (короткие и длинные слова, 1-10 строк),
+шрифтов и сочетаний цветов.
+
+Для каждого замера выводятся p50/p95 времени выполнения, пиковый объём
+выделенной за вызов памяти (tracemalloc) и количество загрузок шрифтов (с
+холодным кэшем шрифтов и во время замеров). Результаты можно сохранить как
+эталон и сравнить с ним следующий запуск - при замедлении p50 больше чем на
+--threshold либо росте количества загрузок шрифтов бенчмарк завершается с
+кодом 1.
+
+Запуск:
+    python -m benchmarks.bench_rendering [--repeat N] [--font FONT ...]
+        [--save-baseline PATH] [--baseline PATH] [--threshold 0.2]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from core.fonts import DEFAULT_FONT, FONTS
+from core.utils.font_cache import font_cache
+from core.utils.sticker_creator import (
+    COLORS_MAP, PICTURE_HEIGHT, PICTURE_WIDTH, TEXT_AREA_SIZE, _get_font, _get_font_size,
+    _get_text_area_height_in_px, create_preview, create_sticker,
+    encode_sticker, text_mask_cache,
+)
+
+
+SHORT_WORDS = ('да', 'кот', 'ой', 'мяу', 'эх', 'ага', 'ну', 'всё', 'ок', 'ух')
+LONG_WORDS = ('превосходительство', 'достопримечательность', 'человеконенавистник',
+              'переосвидетельствование', 'высокопревосходительство',
+              'электрификация', 'взаимозаменяемость', 'неудовлетворительно',
+              'интернационализация', 'сверхпроводимость')
+LINE_COUNTS = (1, 2, 3, 5, 7, 10)
+COLORS = (
+    (COLORS_MAP['Чёрный'], COLORS_MAP['Белый']),
+    (COLORS_MAP['Белый'], COLORS_MAP['Фиолетовый']),
+    (COLORS_MAP['Жёлтый'], COLORS_MAP['Синий']),
+)
+
+PREVIEW_SIZE = 256
+
+Case = Tuple[Tuple[str, ...], str, Sequence[int], Sequence[int]]
+
+
+def get_matrix(fonts: Sequence[str]) -> List[Case]:
+    """
+    Возвращает матрицу (текст, шрифт, цвет шрифта, цвет фона)
+    """
+    phrases = [tuple(words[:count])
+               for words in (SHORT_WORDS, LONG_WORDS)
+               for count in LINE_COUNTS]
+    return [(phrase, font_name, font_color, background_color)
+            for phrase in phrases
+            for font_name in fonts
+            for font_color, background_color in COLORS]
+
+
+def get_benchmarks(matrix: Sequence[Case]) -> Dict[str, List[Callable]]:
+    """
+    Возвращает подготовленные вызовы для каждого замера. Измерение высоты
+    текста и подбор размера шрифта не зависят от цветов, поэтому для них
+    используется только первое сочетание цветов
+    """
+    fonts = {(text, font_name): _get_font_size(text, font_name, TEXT_AREA_SIZE)
+             for text, font_name, _, _ in matrix}
+    images = [create_sticker(text, font_name=font_name, font_color=font_color,
+                             background_color=background_color)
+              for text, font_name, font_color, background_color in matrix]
+    texts = list(fonts)
+    # Маски текста (и уменьшенные маски превью) всей матрицы должны
+    # помещаться в кэш, иначе перекраска замеряет полную отрисовку
+    text_mask_cache.max_size = max(text_mask_cache.max_size,
+                                   2 * len(texts) * PICTURE_WIDTH * PICTURE_HEIGHT)
+
+    return {
+        'create_sticker': [
+            (lambda text=text, font_name=font_name, font_color=font_color,
+             background_color=background_color: _create_sticker_uncached(
+                text, font_name=font_name, font_color=font_color,
+                background_color=background_color))
+            for text, font_name, font_color, background_color in matrix
+        ],
+        'recolor': [
+            (lambda text=text, font_name=font_name, font_color=font_color,
+             background_color=background_color: create_sticker(
+                text, font_name=font_name, font_color=font_color,
+                background_color=background_color))
+            for text, font_name, font_color, background_color in matrix
+        ],
+        'create_preview': [
+            (lambda text=text, font_name=font_name, font_color=font_color,
+             background_color=background_color: create_preview(
+                text, preview_size=PREVIEW_SIZE, font_name=font_name,
+                font_color=font_color, background_color=background_color))
+            for text, font_name, font_color, background_color in matrix
+        ],
+        '_get_font_size': [
+            (lambda text=text, font_name=font_name:
+             _get_font_size(text, font_name, TEXT_AREA_SIZE))
+            for text, font_name in texts
+        ],
+        '_get_text_area_height_in_px': [
+            (lambda text=text, font=_get_font(font_name, size):
+             _get_text_area_height_in_px(text, font))
+            for (text, font_name), size in fonts.items()
+        ],
+        'encode_png': [
+            (lambda image=image: encode_sticker(image, 'PNG'))
+            for image in images
+        ],
+    }
+
+
+def _create_sticker_uncached(text: Sequence[str], **parameters):
+    text_mask_cache.clear()
+    return create_sticker(text, **parameters)
+
+
+def _percentile(timings: List[float], percent: int) -> float:
+    if len(timings) == 1:
+        return timings[0]
+    return statistics.quantiles(timings, n=100)[percent - 1]
+
+
+def bench(calls: Sequence[Callable], repeat: int) -> Dict[str, float]:
+    # Загрузки шрифтов считаются с холодным кэшем шрифтов за один проход
+    font_cache.clear()
+    misses = font_cache.fonts.stats()['misses']
+    for call in calls:
+        call()
+    font_loads_cold = font_cache.fonts.stats()['misses'] - misses
+
+    # Во время замеров шрифты должны браться из кэша, загрузки означают, что
+    # бюджета кэша шрифтов не хватает на рабочий набор
+    misses = font_cache.fonts.stats()['misses']
+    timings = []
+    for _ in range(repeat):
+        for call in calls:
+            started = time.perf_counter()
+            call()
+            timings.append(time.perf_counter() - started)
+    font_loads = font_cache.fonts.stats()['misses'] - misses
+
+    # Выделения памяти замеряются отдельным проходом, т. к. tracemalloc
+    # заметно замедляет выполнение
+    tracemalloc.start()
+    allocated = []
+    for call in calls:
+        _reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+        allocated.append(peak - before)
+    tracemalloc.stop()
+
+    return {
+        'calls': len(timings),
+        'p50_ms': _percentile(timings, 50) * 1000,
+        'p95_ms': _percentile(timings, 95) * 1000,
+        'alloc_kb_mean': statistics.mean(allocated) / 1024,
+        'alloc_kb_max': max(allocated) / 1024,
+        'font_loads_cold': font_loads_cold,
+        'font_loads': font_loads,
+    }
+
+
+def _reset_peak() -> None:
+    # tracemalloc.reset_peak появился только в Python 3.9
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.clear_traces()
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict],
+            threshold: float) -> List[str]:
+    """
+    Возвращает список регрессий относительно эталона: рост p50 больше чем на
+    threshold (доля от эталона) либо рост количества загрузок шрифтов
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]
+        limit = expected['p50_ms'] * (1 + threshold)
+        if result['p50_ms'] > limit:
+            regressions.append(f'{name}: p50 {result["p50_ms"]:.3f} ms > '
+                               f'{limit:.3f} ms (эталон '
+                               f'{expected["p50_ms"]:.3f} ms)')
+        for key in ('font_loads_cold', 'font_loads'):
+            if result[key] > expected[key]:
+                regressions.append(f'{name}: {key} {result[key]} > '
+                                   f'{expected[key]}')
+    return regressions
+
+
+def print_results(results: Dict[str, Dict]) -> None:
+    header = ('calls', 'p50_ms', 'p95_ms', 'alloc_kb_mean', 'alloc_kb_max',
+              'font_loads_cold', 'font_loads')
+    print(f'{"benchmark":>28} | ' + ' | '.join(f'{column:>15}'
+                                               for column in header))
+    for name, row in results.items():
+        print(f'{name:>28} | ' + ' | '.join(
+            f'{row[column]:>15.3f}' if isinstance(row[column], float)
+            else f'{row[column]:>15}' for column in header))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--font', action='append', dest='fonts',
+                        help='шрифт из core/fonts (можно указать несколько '
+                             'раз), по умолчанию - все шрифты из FONTS')
+    parser.add_argument('--save-baseline', metavar='PATH',
+                        help='сохранить результаты как эталон в JSON')
+    parser.add_argument('--baseline', metavar='PATH',
+                        help='сравнить результаты с эталоном из JSON')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='допустимое замедление p50 относительно эталона '
+                             '(доля, по умолчанию 0.2)')
+    args = parser.parse_args()
+
+    fonts = args.fonts or [font_name for font_name in FONTS.values()
+                           if isinstance(font_name, str)] or [DEFAULT_FONT]
+    benchmarks = get_benchmarks(get_matrix(fonts))
+    results = {name: bench(calls, args.repeat)
+               for name, calls in benchmarks.items()}
+    print_results(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, mode='w', encoding='utf-8') as file:
+            json.dump({'fonts': fonts, 'results': results}, file, indent=2,
+                      ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline.get('fonts') != fonts:
+            print(f'Эталон снят на других шрифтах: {baseline.get("fonts")}')
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print('Регрессии относительно эталона:')
+            for regression in regressions:
+                print(f'  {regression}')
+            sys.exit(1)
+        print('Регрессий относительно эталона нет')
+
+
+if __name__ == '__main__':
+    main()
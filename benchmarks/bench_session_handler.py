@@ -0,0 +1,65 @@
+"""
+Стоимость обработки одного сообщения диспетчером сессий (без отрисовки
+стикеров): полный диалог создания стикера и диалог, в котором шаги
+пропускаются командой /next_step (цепочки переходов между шагами).
+
+Запуск: python -m benchmarks.bench_session_handler [--dialogs N]
+"""
+import argparse
+import statistics
+import time
+from typing import Dict, List, Sequence
+
+from core.utils.sessions_dispatcher import SessionsDispatcher
+from core.utils.user_session_handler import handler
+
+# Сообщения диалога: команды начинаются с /
+SCENARIOS = {
+    'dialog': ('/create_sticker', 'Съешь же ещё этих мягких булок', '0 0 0',
+               '1', '255 255 255', '2 2 2', 'Нет'),
+    'next_step': ('/create_sticker', 'Съешь же ещё этих мягких булок',
+                  '/next_step', '/next_step', '/next_step', '/next_step',
+                  '/next_step'),
+    'step_back': ('/create_sticker', 'Съешь же ещё этих мягких булок',
+                  '/next_step', '/next_step', '/step_back', '/step_back',
+                  '/step_back', '/reset'),
+}
+
+
+def _percentile(timings: List[float], percent: int) -> float:
+    return statistics.quantiles(timings, n=100)[percent - 1] * 1e6
+
+
+def bench(messages: Sequence[str], dialogs: int) -> Dict[str, float]:
+    dispatcher = SessionsDispatcher(user_session_handler=handler)
+    timings = []
+    for chat_id in range(dialogs):
+        for message in messages:
+            started = time.perf_counter()
+            if message.startswith('/'):
+                dispatcher.command_handler(chat_id, message)
+            else:
+                dispatcher.message_handler(chat_id, message)
+            timings.append(time.perf_counter() - started)
+        dispatcher.close_session(chat_id)
+    return {
+        'mean_us': statistics.mean(timings) * 1e6,
+        'p50_us': _percentile(timings, 50),
+        'p99_us': _percentile(timings, 99),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dialogs', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f'{"scenario":>10} | {"mean_us":>8} | {"p50_us":>8} | {"p99_us":>8}')
+    for name, messages in SCENARIOS.items():
+        timings = bench(messages, args.dialogs)
+        print(f'{name:>10} | {timings["mean_us"]:>8.1f} | '
+              f'{timings["p50_us"]:>8.1f} | {timings["p99_us"]:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
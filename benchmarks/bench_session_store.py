@@ -0,0 +1,85 @@
+"""
+Задержка операций хранилищ сессий (создание, чтение, изменение, удаление)
+для хранилища в памяти и SQLite-хранилища.
+
+Запуск: python -m benchmarks.bench_session_store [--sessions N]
+"""
+import argparse
+import datetime
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from core.types import StickerParameters, UserSession
+from core.utils.session_store import SessionStore, create_session_store
+
+
+def _percentile(timings: List[float], percent: int) -> float:
+    return statistics.quantiles(timings, n=100)[percent - 1] * 1e6
+
+
+def _measure(func: Callable, chat_ids: range) -> Dict[str, float]:
+    timings = []
+    for chat_id in chat_ids:
+        started = time.perf_counter()
+        func(chat_id)
+        timings.append(time.perf_counter() - started)
+    return {
+        'p50_us': _percentile(timings, 50),
+        'p95_us': _percentile(timings, 95),
+        'p99_us': _percentile(timings, 99),
+    }
+
+
+def bench(session_store: SessionStore, sessions: int) -> Dict[str, Dict]:
+    chat_ids = range(sessions)
+    created = datetime.datetime.now(datetime.timezone.utc)
+
+    def create(chat_id: int) -> None:
+        session_store.save(chat_id, UserSession(created=created, current_step=0,
+                                                data_class=StickerParameters()))
+
+    def update(chat_id: int) -> None:
+        user_session = session_store.get(chat_id)
+        user_session.data_class.text = 'Съешь же ещё этих мягких французских булок'
+        user_session.current_step += 1
+        session_store.save(chat_id, user_session)
+
+    results = {
+        'create': _measure(create, chat_ids),
+        'get': _measure(session_store.get, chat_ids),
+        'update': _measure(update, chat_ids),
+        'delete': _measure(session_store.delete, chat_ids),
+    }
+    session_store.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sessions', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        stores = {
+            'memory': create_session_store('memory'),
+            'sqlite': create_session_store(
+                'sqlite', os.path.join(directory, 'sessions.sqlite3'),
+                batch_size=args.batch_size),
+            'sqlite (batch=1)': create_session_store(
+                'sqlite', os.path.join(directory, 'sessions_1.sqlite3'),
+                batch_size=1),
+        }
+        print(f'{"store":>18} | {"operation":>9} | {"p50_us":>9} | '
+              f'{"p95_us":>9} | {"p99_us":>9}')
+        for name, session_store in stores.items():
+            for operation, timings in bench(session_store, args.sessions).items():
+                print(f'{name:>18} | {operation:>9} | {timings["p50_us"]:>9.1f} | '
+                      f'{timings["p95_us"]:>9.1f} | {timings["p99_us"]:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Пропускная способность приёма обновлений (обновлений в секунду) через вебхук
+и через long polling. Телеграм эмулируется локальным aiohttp-сервером,
+обработка обновления - задержкой --handler-delay (ответ пользователю).
+
+Запуск: python -m benchmarks.bench_webhook [--updates N] [--connections N]
+"""
+import argparse
+import asyncio
+import time
+from typing import Callable, Dict, List
+
+from aiogram import Bot, types
+from aiogram.bot.api import TelegramAPIServer
+from aiogram.dispatcher import Dispatcher
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+
+from core.utils.webhook import create_webhook_app
+
+
+TOKEN = '123456789:AAEtestTOKENtestTOKENtestTOKENtest12'
+# Максимальное количество обновлений в ответе getUpdates
+GET_UPDATES_LIMIT = 100
+
+
+def get_update(update_id: int) -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 1600000000,
+            'chat': {'id': update_id, 'type': 'private'},
+            'from': {'id': update_id, 'is_bot': False, 'first_name': 'test'},
+            'text': 'Съешь же ещё этих мягких французских булок',
+        },
+    }
+
+
+def create_dispatcher(bot: Bot, handler_delay: float,
+                      on_processed: Callable[[], None]) -> Dispatcher:
+    dispatcher = Dispatcher(bot)
+
+    @dispatcher.message_handler()
+    async def process_message(_: types.Message) -> None:
+        await asyncio.sleep(handler_delay)
+        on_processed()
+
+    return dispatcher
+
+
+async def bench_webhook(updates: List[dict], connections: int, rtt: float,
+                        handler_delay: float) -> float:
+    done = asyncio.Event()
+    processed = 0
+
+    def on_processed() -> None:
+        nonlocal processed
+        processed += 1
+        if processed == len(updates):
+            done.set()
+
+    bot = Bot(token=TOKEN)
+    app = create_webhook_app(create_dispatcher(bot, handler_delay, on_processed),
+                             '/webhook')
+    queue: asyncio.Queue = asyncio.Queue()
+    for update in updates:
+        queue.put_nowait(update)
+
+    async def connection(session: ClientSession, url: str) -> None:
+        # Телеграм отправляет следующее обновление по соединению только
+        # после ответа на предыдущее
+        while not queue.empty():
+            update = queue.get_nowait()
+            await asyncio.sleep(rtt)
+            async with session.post(url, json=update) as response:
+                await response.read()
+
+    async with TestServer(app) as server, ClientSession() as session:
+        url = str(server.make_url('/webhook'))
+        started = time.perf_counter()
+        await asyncio.gather(*(connection(session, url)
+                               for _ in range(connections)))
+        await done.wait()
+        elapsed = time.perf_counter() - started
+    await bot.session.close()
+    return len(updates) / elapsed
+
+
+async def bench_polling(updates: List[dict], rtt: float, handler_delay: float,
+                        relax: float) -> float:
+    done = asyncio.Event()
+    processed = 0
+
+    def on_processed() -> None:
+        nonlocal processed
+        processed += 1
+        if processed == len(updates):
+            done.set()
+
+    async def api_method(request: web.Request) -> web.Response:
+        await asyncio.sleep(rtt)
+        if request.match_info['method'].lower() != 'getupdates':
+            return web.json_response({'ok': True, 'result': True})
+        data = await request.post()
+        offset = int(data.get('offset', 0) or 0)
+        result = [update for update in updates
+                  if update['update_id'] >= offset][:GET_UPDATES_LIMIT]
+        if not result:
+            # Эмуляция long polling - новых обновлений нет
+            await asyncio.sleep(1)
+        return web.json_response({'ok': True, 'result': result})
+
+    app = web.Application()
+    app.router.add_post('/bot{token}/{method}', api_method)
+    async with TestServer(app) as server:
+        bot = Bot(token=TOKEN, server=TelegramAPIServer.from_base(
+            str(server.make_url('')).rstrip('/')))
+        dispatcher = create_dispatcher(bot, handler_delay, on_processed)
+        started = time.perf_counter()
+        polling = asyncio.create_task(
+            dispatcher.start_polling(timeout=1, relax=relax))
+        await done.wait()
+        elapsed = time.perf_counter() - started
+        dispatcher.stop_polling()
+        polling.cancel()
+        await asyncio.gather(polling, return_exceptions=True)
+        await bot.session.close()
+    return len(updates) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--connections', type=int, default=40,
+                        help='количество соединений вебхука')
+    parser.add_argument('--rtt', type=float, default=0.05,
+                        help='задержка сети до Телеграма, секунд')
+    parser.add_argument('--handler-delay', type=float, default=0.05,
+                        help='время обработки обновления, секунд')
+    parser.add_argument('--relax', type=float, default=0.1,
+                        help='пауза между запросами getUpdates, секунд')
+    args = parser.parse_args()
+
+    updates = [get_update(update_id) for update_id in range(1, args.updates + 1)]
+    results: Dict[str, float] = {
+        'polling': asyncio.run(bench_polling(updates, args.rtt,
+                                             args.handler_delay, args.relax)),
+        f'webhook ({args.connections} connections)': asyncio.run(
+            bench_webhook(updates, args.connections, args.rtt,
+                          args.handler_delay)),
+    }
+    print(f'{"mode":>28} | {"updates/sec":>11}')
+    for mode, updates_per_second in results.items():
+        print(f'{mode:>28} | {updates_per_second:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
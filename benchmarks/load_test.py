@@ -0,0 +1,313 @@
+"""
+Нагрузочный тест бота целиком: локальный aiohttp-сервер вместо Bot API
+(getUpdates, sendMessage, sendPhoto, sendDocument, sendSticker,
+sendMediaGroup), на который
+направляется Bot из server.py, и множество симулированных чатов, проходящих
+полный сценарий /create_sticker -> текст -> цвет фона -> шрифт -> цвет
+шрифта -> разбивка -> "Да".
+
+Выводит перцентили задержки от отправки обновления до последнего ответа бота
+на него, количество сообщений в секунду, пиковое потребление памяти (RSS) и
+пиковое количество открытых файловых дескрипторов.
+
+Запуск: python -m benchmarks.load_test [--chats N] [--concurrency N]
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import os
+import resource
+import socket
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+
+TOKEN = '123456789:AAEtestTOKENtestTOKENtestTOKENtest12'
+# Максимальное количество обновлений в ответе getUpdates
+GET_UPDATES_LIMIT = 100
+REPLY_METHODS = ('sendmessage', 'sendphoto', 'senddocument', 'sendsticker',
+                 'sendmediagroup', 'editmessagetext', 'editmessagemedia',
+                 'editmessagecaption')
+
+# Сценарий чата: (сообщение пользователя, количество ответов бота на него)
+SCENARIO: Sequence[Tuple[str, int]] = (
+    ('/create_sticker', 1),
+    ('Съешь же ещё этих мягких французских булок', 1),
+    ('Белый', 1),
+    ('1', 1),
+    ('Чёрный', 1),
+    ('2, 2, 3', 2),
+    ('Да', 2),
+)
+
+
+class FakeBotAPI:
+    """
+    Локальная замена Bot API: отдаёт обновления через getUpdates и
+    фиксирует ответы бота в чаты, а также количество и размер запросов
+    к каждому методу и последнюю inline-клавиатуру в каждом чате
+    """
+    def __init__(self, rtt: float = 0):
+        self.rtt = rtt
+        self.replies: Dict[int, asyncio.Queue] = {}
+        self.replies_count = 0
+        self.requests: Dict[str, int] = collections.Counter()
+        self.request_bytes: Dict[str, int] = collections.Counter()
+        # chat_id -> (id сообщения, кнопки: текст -> данные кнопки)
+        self.inline_keyboards: Dict[int, Tuple[int, Dict[str, str]]] = {}
+        self._callback_ids = itertools.count(1)
+        self._updates: List[dict] = []
+        self._has_updates = asyncio.Event()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self.app = web.Application()
+        self.app.router.add_post('/bot{token}/{method}', self.handle)
+
+    def send_update(self, chat_id: int, text: str) -> None:
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'test'},
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0,
+                                    'length': len(text)}]
+        self._updates.append({'update_id': next(self._update_ids),
+                              'message': message})
+        self._has_updates.set()
+
+    def get_callback_update(self, chat_id: int, button: str) -> dict:
+        """
+        Возвращает обновление с нажатием кнопки последней inline-клавиатуры
+        чата
+        """
+        message_id, buttons = self.inline_keyboards[chat_id]
+        return {
+            'update_id': next(self._update_ids),
+            'callback_query': {
+                'id': str(next(self._callback_ids)),
+                'from': {'id': chat_id, 'is_bot': False, 'first_name': 'test'},
+                'message': {'message_id': message_id, 'date': int(time.time()),
+                            'chat': {'id': chat_id, 'type': 'private'}},
+                'chat_instance': str(chat_id),
+                'data': buttons[button],
+            },
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+        method = request.match_info['method'].lower()
+        data = await request.post()
+        self.requests[method] += 1
+        self.request_bytes[method] += request.content.total_bytes
+        if method == 'getupdates':
+            result = await self._get_updates(int(data.get('offset') or 0),
+                                             float(data.get('timeout') or 0))
+        elif method in REPLY_METHODS:
+            chat_id = int(data['chat_id'])
+            result = self._reply(method, chat_id)
+            if method.startswith('editmessage'):
+                result['message_id'] = int(data['message_id'])
+            if isinstance(result, dict):
+                self._save_inline_keyboard(chat_id, result['message_id'],
+                                           data.get('reply_markup'))
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+    def _save_inline_keyboard(self, chat_id: int, message_id: int,
+                              reply_markup: Optional[str]) -> None:
+        keyboard = json.loads(reply_markup or '{}').get('inline_keyboard')
+        if keyboard:
+            self.inline_keyboards[chat_id] = (message_id, {
+                button['text']: button['callback_data']
+                for row in keyboard for button in row})
+
+    async def _get_updates(self, offset: int, timeout: float) -> List[dict]:
+        self._updates = [update for update in self._updates
+                         if update['update_id'] >= offset]
+        if not self._updates:
+            self._has_updates.clear()
+            try:
+                await asyncio.wait_for(self._has_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:GET_UPDATES_LIMIT]
+
+    def _reply(self, method: str, chat_id: int) -> dict:
+        self.replies_count += 1
+        self.replies[chat_id].put_nowait(time.perf_counter())
+
+        message_id = next(self._message_ids)
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+        }
+        file = {'file_id': f'file_{message_id}',
+                'file_unique_id': f'unique_{message_id}'}
+        if method == 'sendphoto':
+            message['photo'] = [dict(file, width=512, height=512)]
+        elif method == 'senddocument':
+            message['document'] = file
+        elif method == 'sendsticker':
+            message['sticker'] = dict(file, width=512, height=512,
+                                      is_animated=False)
+        elif method == 'sendmediagroup':
+            # Альбом учитывается как один ответ
+            return [dict(message, photo=[dict(file, width=512, height=512)])]
+        return message
+
+
+async def run_chat(api: FakeBotAPI, chat_id: int, latencies: List[float],
+                   reply_timeout: float) -> bool:
+    """
+    Проходит сценарий в одном чате. Возвращает False, если бот не ответил
+    вовремя
+    """
+    replies = api.replies.setdefault(chat_id, asyncio.Queue())
+    for text, expected_replies in SCENARIO:
+        started = time.perf_counter()
+        api.send_update(chat_id, text)
+        replied = started
+        try:
+            for _ in range(expected_replies):
+                replied = await asyncio.wait_for(replies.get(), reply_timeout)
+        except asyncio.TimeoutError:
+            return False
+        latencies.append(replied - started)
+    return True
+
+
+async def sample_fds(peak: List[int], interval: float = 0.1) -> None:
+    while True:
+        fds = count_fds()
+        if fds is not None:
+            peak[0] = max(peak[0], fds)
+        await asyncio.sleep(interval)
+
+
+def count_fds() -> Optional[int]:
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None
+
+
+def get_peak_rss_mb() -> float:
+    # ru_maxrss в Linux измеряется в килобайтах, в macOS - в байтах
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak_rss / 1024 / 1024
+    return peak_rss / 1024
+
+
+def _percentile(values: List[float], percent: int) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100)[percent - 1]
+
+
+async def run(server, api: FakeBotAPI, chats: int, concurrency: int,
+              relax: float, reply_timeout: float) -> Dict[str, float]:
+    latencies: List[float] = []
+    failed = 0
+    peak_fds = [count_fds() or 0]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def chat(chat_id: int) -> None:
+        nonlocal failed
+        async with semaphore:
+            if not await run_chat(api, chat_id, latencies, reply_timeout):
+                failed += 1
+
+    server.render_pool.start()
+    polling = asyncio.create_task(
+        server.dispatcher.start_polling(timeout=1, relax=relax))
+    fds_sampler = asyncio.create_task(sample_fds(peak_fds))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(chat(chat_id) for chat_id in range(1, chats + 1)))
+    elapsed = time.perf_counter() - started
+
+    server.dispatcher.stop_polling()
+    for task in (polling, fds_sampler):
+        task.cancel()
+    await asyncio.gather(polling, fds_sampler, return_exceptions=True)
+    server.render_pool.shutdown()
+    await server.bot.session.close()
+
+    return {
+        'chats': chats,
+        'failed_chats': failed,
+        'updates': len(latencies),
+        'replies': api.replies_count,
+        'elapsed_s': elapsed,
+        'updates_per_s': len(latencies) / elapsed,
+        'replies_per_s': api.replies_count / elapsed,
+        'latency_p50_ms': _percentile(latencies, 50) * 1000,
+        'latency_p95_ms': _percentile(latencies, 95) * 1000,
+        'latency_p99_ms': _percentile(latencies, 99) * 1000,
+        'latency_max_ms': max(latencies) * 1000,
+        'peak_rss_mb': get_peak_rss_mb(),
+        'peak_fds': peak_fds[0],
+    }
+
+
+async def start_fake_api(api: FakeBotAPI, sock: socket.socket) -> web.AppRunner:
+    runner = web.AppRunner(api.app)
+    await runner.setup()
+    await web.SockSite(runner, sock).start()
+    return runner
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chats', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=200,
+                        help='количество одновременно активных чатов')
+    parser.add_argument('--rtt', type=float, default=0,
+                        help='задержка сети до Bot API, секунд')
+    parser.add_argument('--relax', type=float, default=0.1,
+                        help='пауза между запросами getUpdates, секунд')
+    parser.add_argument('--reply-timeout', type=float, default=60,
+                        help='время ожидания ответа бота, секунд')
+    args = parser.parse_args()
+
+    # Сокет создаётся заранее, чтобы до импорта server.py знать адрес,
+    # на который нужно направить Bot
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    os.environ['BOT_TOKEN'] = TOKEN
+    os.environ['TELEGRAM_API_URL'] = 'http://127.0.0.1:{}'.format(
+        sock.getsockname()[1])
+
+    import server
+
+    api = FakeBotAPI(rtt=args.rtt)
+    runner = server.loop.run_until_complete(start_fake_api(api, sock))
+    try:
+        results = server.loop.run_until_complete(
+            run(server, api, args.chats, args.concurrency, args.relax,
+                args.reply_timeout))
+    finally:
+        server.loop.run_until_complete(runner.cleanup())
+        server.session_store.close()
+
+    for name, value in results.items():
+        print(f'{name:>16}: {value:.2f}' if isinstance(value, float)
+              else f'{name:>16}: {value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,22 +2,158 @@ import os
 
 
 TOKEN = os.getenv('BOT_TOKEN')
+# Адрес Bot API сервера (например, локального telegram-bot-api),
+# по умолчанию - api.telegram.org
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', '')
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CONTENT_DIR = os.path.join(BASE_DIR, 'content')
 FONTS_DIR = os.path.join(BASE_DIR, 'fonts')
 LOGS_DIR = os.path.join(BASE_DIR, 'logs')
 
+# Логирование: записи передаются через очередь из LOG_QUEUE_SIZE записей
+# (записи сверх очереди отбрасываются) и записываются в файл в отдельном
+# потоке. Уровень записей в файл, ротация файла по размеру ('size' -
+# LOG_MAX_BYTES байт) либо раз в сутки ('time'), количество архивных файлов и
+# доля записей уровня DEBUG, попадающих в лог
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'WARNING').upper()
+LOG_ROTATION = os.getenv('LOG_ROTATION', 'size')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', 0.01))
 
-ACCESS_IDS = {
-    "YOUR_IDS",
-    "...",
-}
+# Бюджет памяти (в байтах) кэша загруженных шрифтов и кэша файлов шрифтов
+FONT_CACHE_MAX_BYTES = int(os.getenv('FONT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+FONT_FILES_CACHE_MAX_BYTES = int(os.getenv('FONT_FILES_CACHE_MAX_BYTES',
+                                           32 * 1024 * 1024))
+
+# Бюджет памяти (в байтах) кэша масок текста - расположения текста,
+# отрисованного в полутоновую маску. Стикеры, которые отличаются только
+# цветами, собираются из готовой маски без подбора размера шрифта и
+# отрисовки текста. Маска стикера 512x512 занимает 256 КБ
+TEXT_MASK_CACHE_MAX_BYTES = int(os.getenv('TEXT_MASK_CACHE_MAX_BYTES',
+                                          16 * 1024 * 1024))
+
+# Директория для сохранения таблиц метрик шрифтов (например,
+# core/font_metrics), пустая строка - таблицы строятся заново в каждом процессе
+FONT_METRICS_DIR = os.getenv('FONT_METRICS_DIR', '')
+
+# Пул воркеров для отрисовки стикеров: тип пула ('thread' либо 'process'),
+# количество воркеров, таймаут отрисовки в секундах и количество задач на
+# одного воркера, после которого пул пересоздаётся (0 - не пересоздавать)
+RENDER_EXECUTOR = os.getenv('RENDER_EXECUTOR', 'thread')
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', os.cpu_count() or 1))
+RENDER_TIMEOUT = float(os.getenv('RENDER_TIMEOUT', 30))
+RENDER_MAX_TASKS_PER_WORKER = int(os.getenv('RENDER_MAX_TASKS_PER_WORKER', 1000))
+
+# Очередь отрисовки: количество одновременных отрисовок (по умолчанию - по
+# одной на воркера) и максимальное количество стикеров, ожидающих отрисовки.
+# Очередь обслуживает чаты по кругу, поэтому набор стикеров одного
+# пользователя не задерживает стикеры остальных
+RENDER_MAX_CONCURRENT = int(os.getenv('RENDER_MAX_CONCURRENT', RENDER_WORKERS))
+RENDER_MAX_QUEUE_SIZE = int(os.getenv('RENDER_MAX_QUEUE_SIZE', 200))
+
+# Формат стикеров ('PNG' либо 'WEBP'). Стикеры в формате WebP отправляются
+# как стикеры Телеграма, в формате PNG - как фото
+STICKER_FORMAT = os.getenv('STICKER_FORMAT', 'PNG').upper()
+
+# Сторона (в пикселях) превью стикера, которое показывается на панели
+# /quick_sticker и обновляется после каждого шага (0 - превью отключено)
+PREVIEW_SIZE = int(os.getenv('PREVIEW_SIZE', 0))
+# Отдельная очередь отрисовки превью: превью не занимают больше
+# PREVIEW_MAX_CONCURRENT воркеров и не учитываются в лимите стикеров
+PREVIEW_MAX_CONCURRENT = int(os.getenv('PREVIEW_MAX_CONCURRENT', 1))
+PREVIEW_MAX_QUEUE_SIZE = int(os.getenv('PREVIEW_MAX_QUEUE_SIZE', 50))
+
+# Кэш отрисованных стикеров: бюджет (в байтах) кэша в памяти и кэша на диске
+# (0 - кэш на диске отключён)
+RENDER_CACHE_MAX_BYTES = int(os.getenv('RENDER_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+RENDER_CACHE_DISK_MAX_BYTES = int(os.getenv('RENDER_CACHE_DISK_MAX_BYTES', 0))
+RENDER_CACHE_DIR = os.path.join(CONTENT_DIR, 'render_cache')
+
+# Очистка CONTENT_DIR от оставшихся файлов: удаляются файлы старше
+# CONTENT_MAX_AGE секунд и самые старые файлы сверх CONTENT_MAX_BYTES байт
+# (0 - без ограничения). Директория проверяется при запуске бота и далее
+# каждые CONTENT_JANITOR_INTERVAL секунд. RENDER_CACHE_DIR не проверяется -
+# у дискового кэша свой бюджет
+CONTENT_MAX_AGE = float(os.getenv('CONTENT_MAX_AGE', 24 * 60 * 60))
+CONTENT_MAX_BYTES = int(os.getenv('CONTENT_MAX_BYTES', 256 * 1024 * 1024))
+CONTENT_JANITOR_INTERVAL = float(os.getenv('CONTENT_JANITOR_INTERVAL', 60 * 60))
+CONTENT_JANITOR_BATCH_SIZE = int(os.getenv('CONTENT_JANITOR_BATCH_SIZE', 500))
+
+# Максимальное количество file_id загруженных в Телеграм файлов
+FILE_ID_CACHE_SIZE = int(os.getenv('FILE_ID_CACHE_SIZE', 10000))
+
+# Сессия закрывается, если в ней не было активности SESSION_TTL секунд.
+# Истёкшие сессии проверяются каждые SESSION_SWEEP_INTERVAL секунд и
+# закрываются пачками по SESSION_SWEEP_BATCH_SIZE штук
+SESSION_TTL = float(os.getenv('SESSION_TTL', 600))
+SESSION_SWEEP_INTERVAL = float(os.getenv('SESSION_SWEEP_INTERVAL', 5))
+SESSION_SWEEP_BATCH_SIZE = int(os.getenv('SESSION_SWEEP_BATCH_SIZE', 100))
+
+# Хранилище сессий ('memory' либо 'sqlite'). SQLite-хранилище сохраняет
+# сессии между перезапусками бота, но база может использоваться только одним
+# процессом. Изменения записываются пачками по SESSION_STORE_BATCH_SIZE штук,
+# но не реже чем раз в SESSION_STORE_FLUSH_INTERVAL секунд
+SESSION_STORE = os.getenv('SESSION_STORE', 'memory')
+SESSION_STORE_PATH = os.getenv('SESSION_STORE_PATH',
+                               os.path.join(BASE_DIR, 'sessions.sqlite3'))
+SESSION_STORE_BATCH_SIZE = int(os.getenv('SESSION_STORE_BATCH_SIZE', 100))
+SESSION_STORE_FLUSH_INTERVAL = float(os.getenv('SESSION_STORE_FLUSH_INTERVAL', 1))
+
+# Режим получения обновлений ('polling' либо 'webhook'). В режиме вебхука
+# Телеграм присылает обновления на WEBHOOK_URL + WEBHOOK_PATH/WEBHOOK_SECRET,
+# сервер слушает WEBAPP_HOST:WEBAPP_PORT и одновременно обрабатывает не больше
+# WEBHOOK_MAX_CONCURRENT_UPDATES обновлений
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBAPP_HOST = os.getenv('WEBAPP_HOST', '0.0.0.0')
+WEBAPP_PORT = int(os.getenv('WEBAPP_PORT', 8080))
+WEBHOOK_MAX_CONCURRENT_UPDATES = int(os.getenv('WEBHOOK_MAX_CONCURRENT_UPDATES', 100))
+
+# Трассировка обработки обновлений (JSON-строки в logs/trace.log):
+# записывается доля TRACE_SAMPLE_RATE трасс и все трассы дольше
+# TRACE_SLOW_THRESHOLD секунд. 0 и 0 - трассировка выключена
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0))
+TRACE_SLOW_THRESHOLD = float(os.getenv('TRACE_SLOW_THRESHOLD', 2))
+
+# HTTP-сервер метрик в формате Prometheus (адрес /metrics).
+# METRICS_PORT=0 - сервер метрик не запускается
+METRICS_HOST = os.getenv('METRICS_HOST', '0.0.0.0')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+
+# Максимальное количество стикеров в наборе (команда /create_pack)
+PACK_MAX_STICKERS = int(os.getenv('PACK_MAX_STICKERS', 50))
+
+# Ограничение частоты запросов пользователя: сколько команд, текстовых
+# сообщений и стикеров пользователь может отправить/создать подряд. Лимиты
+# полностью восстанавливаются за THROTTLE_PERIOD секунд, 0 - без ограничения.
+# Лимит стикеров не должен быть меньше PACK_MAX_STICKERS
+THROTTLE_COMMANDS = int(os.getenv('THROTTLE_COMMANDS', 10))
+THROTTLE_MESSAGES = int(os.getenv('THROTTLE_MESSAGES', 30))
+THROTTLE_RENDERS = int(os.getenv('THROTTLE_RENDERS', 60))
+THROTTLE_PERIOD = float(os.getenv('THROTTLE_PERIOD', 60))
+
+
+# Id пользователей Телеграма, которым разрешён доступ к боту: через пробел
+# либо запятую в ACCESS_IDS и/или в файле ACCESS_IDS_PATH (по id на строку,
+# после # - комментарий). Файл перечитывается при изменении не чаще раза в
+# ACCESS_IDS_CHECK_INTERVAL секунд. Отказ в доступе отправляется
+# пользователю не чаще раза в ACCESS_DENY_INTERVAL секунд
+ACCESS_IDS = os.getenv('ACCESS_IDS', '')
+ACCESS_IDS_PATH = os.getenv('ACCESS_IDS_PATH', '')
+ACCESS_IDS_CHECK_INTERVAL = float(os.getenv('ACCESS_IDS_CHECK_INTERVAL', 5))
+ACCESS_DENY_INTERVAL = float(os.getenv('ACCESS_DENY_INTERVAL', 600))
 
 
 USER_COMMANDS = {
     'START_COMMANDS': (
         'create_sticker',
+        'quick_sticker',
+        'create_pack',
     ),
     'SERVICE_COMMANDS': (
         'next_step',
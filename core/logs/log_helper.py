@@ -1,7 +1,15 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import random
+from typing import List
 
-from core.config import LOGS_DIR
+from core.config import (
+    LOG_BACKUP_COUNT, LOG_DEBUG_SAMPLE_RATE, LOG_LEVEL, LOG_MAX_BYTES,
+    LOG_QUEUE_SIZE, LOG_ROTATION, LOGS_DIR,
+)
 
 
 _DEFAULT_FORMATTER = logging.Formatter(
@@ -10,26 +18,147 @@ _DEFAULT_FORMATTER = logging.Formatter(
 )
 
 
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Передаёт записи в ограниченную очередь, из которой их в отдельном потоке
+    записывает QueueListener. Если очередь заполнена - запись отбрасывается
+    (счётчик dropped), чтобы не блокировать event loop
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает только долю rate записей уровня DEBUG (и ниже), записи
+    остальных уровней пропускаются всегда
+    """
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Очередь может быть заполнена - ждём, пока поток записи освободит
+        # место, вместо исключения queue.Full
+        self.queue.put(self._sentinel)
+
+
+_JSON_FORMATTER = logging.Formatter(fmt='%(message)s')
+
+_queue_handlers: List[DroppingQueueHandler] = []
+_listeners: List[_QueueListener] = []
+
+
 def _get_file_handler(log_file: str, formatter: logging.Formatter,
-                      level: int) -> logging.FileHandler:
-    file_handler = logging.FileHandler(
-        filename=os.path.join(LOGS_DIR, log_file),
-        mode='a',
-        encoding='utf-8',
-    )
+                      level: int) -> logging.Handler:
+    """
+    Возвращает обработчик записи в файл с ротацией по размеру (LOG_ROTATION
+    = 'size') либо раз в сутки (LOG_ROTATION = 'time')
+    """
+    if LOG_ROTATION == 'time':
+        file_handler = logging.handlers.TimedRotatingFileHandler(
+            filename=os.path.join(LOGS_DIR, log_file),
+            when='midnight',
+            backupCount=LOG_BACKUP_COUNT,
+            encoding='utf-8',
+        )
+    else:
+        file_handler = logging.handlers.RotatingFileHandler(
+            filename=os.path.join(LOGS_DIR, log_file),
+            mode='a',
+            maxBytes=LOG_MAX_BYTES,
+            backupCount=LOG_BACKUP_COUNT,
+            encoding='utf-8',
+        )
     file_handler.setFormatter(formatter)
     file_handler.setLevel(level)
 
     return file_handler
 
 
+def _get_queue_handler(log_file: str, formatter: logging.Formatter,
+                       level: int) -> DroppingQueueHandler:
+    """
+    Возвращает обработчик, передающий записи в очередь, и запускает поток,
+    записывающий записи из очереди в файл
+    """
+    if not _listeners:
+        atexit.register(stop_logging)
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    queue_handler.setLevel(level)
+    listener = _QueueListener(
+        queue_handler.queue, _get_file_handler(log_file, formatter, level),
+        respect_handler_level=True)
+    listener.start()
+    _queue_handlers.append(queue_handler)
+    _listeners.append(listener)
+    return queue_handler
+
+
 def get_logger(*, log_file: str = 'log.log',
                formatter: logging.Formatter = _DEFAULT_FORMATTER) -> logging.Logger:
+    """
+    Настраивает корневой логгер: записи попадают в очередь и записываются в
+    файл в отдельном потоке. Повторный вызов возвращает уже настроенный логгер
+    """
+    level = logging.getLevelName(LOG_LEVEL)
     logger = logging.getLogger()
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(level)
     logger.propagate = True
+    if any(isinstance(handler, DroppingQueueHandler)
+           for handler in logger.handlers):
+        return logger
 
-    log_file = os.path.join(LOGS_DIR, log_file)
-    logger.addHandler(_get_file_handler(log_file, formatter, logging.WARNING))
+    queue_handler = _get_queue_handler(log_file, formatter, level)
+    queue_handler.addFilter(SamplingFilter(LOG_DEBUG_SAMPLE_RATE))
+    logger.addHandler(queue_handler)
 
     return logger
+
+
+def get_trace_logger(*, log_file: str = 'trace.log') -> logging.Logger:
+    """
+    Настраивает логгер трасс (см. core.utils.tracing): JSON-строки трасс
+    записываются в отдельный файл независимо от LOG_LEVEL
+    """
+    logger = logging.getLogger('trace')
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if not logger.handlers:
+        logger.addHandler(_get_queue_handler(log_file, _JSON_FORMATTER,
+                                             logging.INFO))
+
+    return logger
+
+
+def get_dropped_records() -> int:
+    """
+    Возвращает количество записей, отброшенных из-за заполненной очереди
+    """
+    return sum(handler.dropped for handler in _queue_handlers)
+
+
+def stop_logging() -> None:
+    """
+    Дописывает оставшиеся в очередях записи и останавливает потоки записи
+    """
+    while _listeners:
+        listener = _listeners.pop()
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
@@ -1,6 +1,8 @@
 from .answer import Answer
 from .close_session import CloseSession
 from .exceptions import *
+from .render_task import RenderTask
 from .session_handler import SessionHandler
 from .sticker_parameters import StickerParameters
+from .transition import Transition
 from .user_session import UserSession
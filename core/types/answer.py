@@ -1,7 +1,11 @@
 from dataclasses import dataclass
-from typing import Optional, Union
+from typing import BinaryIO, Optional, Sequence, Union
 
-from aiogram.types import ReplyKeyboardMarkup, ReplyKeyboardRemove
+from aiogram.types import (
+    InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove,
+)
+
+from core.types.render_task import RenderTask
 
 
 @dataclass
@@ -11,5 +15,11 @@ class Answer:
     content_type: str = 'message'
     content_location: str = 'local'
     content_path: Optional[str] = None
-    keyboard: Union[ReplyKeyboardMarkup,
-                    ReplyKeyboardRemove] = ReplyKeyboardRemove()
+    content: Optional[Union[bytes, BinaryIO]] = None
+    # Для ответов 'panel' - inline-клавиатура (None - убрать клавиатуру)
+    keyboard: Union[ReplyKeyboardMarkup, ReplyKeyboardRemove,
+                    InlineKeyboardMarkup, None] = ReplyKeyboardRemove()
+    render_task: Optional[RenderTask] = None
+    # Задачи на отрисовку для ответов из нескольких стикеров (альбом либо
+    # архив набора стикеров)
+    render_tasks: Optional[Sequence[RenderTask]] = None
@@ -0,0 +1,7 @@
+# Параметры стикера по умолчанию, общие для типов и модуля отрисовки стикеров
+DEFAULT_FORMAT = 'PNG'
+PICTURE_HEIGHT = 512
+PICTURE_WIDTH = 512
+
+RGB_BLACK = (0, 0, 0)
+RGB_WHITE = (255, 255, 255)
@@ -32,3 +32,38 @@ class NotCorrectSplittingText(Exception):
     Некорректное разбиение пользовательского текста на слова
     """
     pass
+
+
+class NotCorrectPhrases(Exception):
+    """
+    Некорректный список фраз для набора стикеров
+    """
+    pass
+
+
+class TooManyTransitions(Exception):
+    """
+    Шаги сессии передают управление друг другу без ответа пользователю
+    """
+    pass
+
+
+class RenderTimeout(Exception):
+    """
+    Отрисовка стикера не уложилась в отведённое время
+    """
+    pass
+
+
+class RenderQueueFull(Exception):
+    """
+    В очереди отрисовки нет места для новых стикеров
+    """
+    pass
+
+
+class RendersThrottled(Exception):
+    """
+    Пользователь превысил лимит создаваемых стикеров
+    """
+    pass
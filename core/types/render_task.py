@@ -0,0 +1,35 @@
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+from core.fonts import DEFAULT_FONT
+from core.types.constants import (
+    DEFAULT_FORMAT, PICTURE_HEIGHT, PICTURE_WIDTH, RGB_BLACK, RGB_WHITE,
+)
+
+
+@dataclass
+class RenderTask:
+    """
+    Задача на отрисовку стикера, выполняемая в пуле воркеров.
+    После отрисовки содержит закодированное изображение, а также время
+    отрисовки и кодирования изображения в секундах (если изображение не было
+    взято из кэша).
+    Если preview_size больше нуля - вместо стикера отрисовывается его
+    уменьшенное превью с большей стороной preview_size пикселей
+    """
+    text: Sequence[str]
+    file_name: str
+    font_name: str = DEFAULT_FONT
+    font_color: Sequence[int] = RGB_BLACK
+    background_color: Sequence[int] = RGB_WHITE
+    picture_width: int = PICTURE_WIDTH
+    picture_height: int = PICTURE_HEIGHT
+    image_format: str = DEFAULT_FORMAT
+    preview_size: int = 0
+    content: Optional[bytes] = None
+    render_time: Optional[float] = None
+    encode_time: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.content is not None
@@ -1,10 +1,19 @@
 import functools
+import time
 from dataclasses import dataclass, field
-from typing import Callable, Optional, Sequence, Union
+from typing import Callable, List, Optional, Sequence, Tuple, Union
 
 from core.types.answer import Answer
 from core.types.close_session import CloseSession
+from core.types.exceptions import TooManyTransitions
+from core.types.transition import Transition
 from core.types.user_session import UserSession
+from core.utils.tracing import span
+
+
+# Функция, вызываемая после каждой функции-обработчика шага: псевдоним шага,
+# результат функции и время её выполнения в секундах
+TransitionHook = Callable[[str, object, float], None]
 
 
 @dataclass(frozen=True)
@@ -12,15 +21,28 @@ class SessionHandler:
     """
     Обработчик пользовательской сессии.
     Перед началом работы необходимо его инициализировать со списком шагов,
-    необходимых для создания стикера
+    необходимых для создания стикера.
+    Функции-обработчики шагов возвращают ответы пользователю либо Transition -
+    переход на соседний шаг, который обрабатывается сразу же. Не больше
+    max_transitions переходов на одно сообщение
     """
     steps: Sequence
     first_step: int = 0
     functions_map: dict = field(default_factory=dict)
+    max_transitions: int = 16
+    # Шаги выбирают параметры inline-кнопками - обработчику передаются
+    # данные нажатых кнопок
+    inline_keyboard: bool = False
+    # Таблица переходов: номер шага -> (псевдоним, функция-обработчик)
+    _table: List[Tuple[str, Optional[Callable]]] = field(
+        default_factory=list, init=False, repr=False, compare=False)
+    _transition_hooks: List[TransitionHook] = field(
+        default_factory=list, init=False, repr=False, compare=False)
 
     def __post_init__(self):
         if isinstance(self.steps, Sequence) and self.first_step != 0:
             raise KeyError('Индекс первого шага д. б. равен 0')
+        self._compile()
 
     @property
     def last_step(self) -> int:
@@ -36,6 +58,7 @@ class SessionHandler:
                                f'был добавлен в список steps')
             func.alias = alias
             self.functions_map[alias] = func
+            self._compile()
 
             @functools.wraps(func)
             def inner(self, *args, **kwargs):
@@ -45,25 +68,64 @@ class SessionHandler:
 
         return function_decorator
 
+    def add_transition_hook(self, hook: TransitionHook) -> None:
+        """
+        Добавляет функцию, вызываемую после каждой функции-обработчика шага
+        (например, для учёта времени шагов в метриках)
+        """
+        if hook not in self._transition_hooks:
+            self._transition_hooks.append(hook)
+
     def handle_session(self, user_session: UserSession,
                        message: Optional[str] = None) -> Sequence[Union[Answer, CloseSession]]:
         """
         В зависимости от номера шага в переданной сессии вызывает
-        соответствующую ему функцию-обработчик
+        соответствующую ему функцию-обработчик. Пока функции-обработчики
+        возвращают Transition - переходит на соседние шаги
         """
-        step_number = user_session.current_step
-        func = self._get_step_handler(step_number)
+        hooks = self._transition_hooks
+        for _ in range(self.max_transitions + 1):
+            alias, func = self._get_step(user_session.current_step)
+            started = time.perf_counter() if hooks else 0
+            with span('step', step=alias):
+                result = func(user_session, message)
+            if hooks:
+                duration = time.perf_counter() - started
+                for hook in hooks:
+                    hook(alias, result, duration)
+
+            if not isinstance(result, Transition):
+                return result
+            self.update_current_step(user_session, command=result.command)
+            message = None
 
-        return func(user_session, message)
+        raise TooManyTransitions(
+            f'Больше {self.max_transitions} переходов между шагами без ответа '
+            f'пользователю (шаг {user_session.current_step})')
 
     def _get_step_handler(self, step_number: int) -> Callable:
         """
         Возвращает функцию-обработчик для шага по его номеру
         """
-        function_alias = self.steps[step_number]
-        func = self.functions_map[function_alias]
+        return self._get_step(step_number)[1]
 
-        return func
+    def _get_step(self, step_number: int) -> Tuple[str, Callable]:
+        """
+        Возвращает псевдоним и функцию-обработчик шага по его номеру
+        """
+        alias, func = self._table[step_number]
+        if func is None:
+            raise KeyError(f'Для шага {alias} не зарегистрирована '
+                           f'функция-обработчик')
+        return alias, func
+
+    def _compile(self) -> None:
+        """
+        Строит таблицу переходов по списку шагов и зарегистрированным
+        функциям-обработчикам
+        """
+        self._table[:] = [(alias, self.functions_map.get(alias))
+                          for alias in self.steps]
 
     def update_current_step(self, user_session: UserSession,
                             command: str = 'next_step') -> None:
@@ -1,8 +1,9 @@
 from dataclasses import dataclass
 from typing import Optional, Sequence
 
+from core.config import STICKER_FORMAT
 from core.fonts import DEFAULT_FONT
-from core.utils.sticker_creator import RGB_BLACK, RGB_WHITE
+from core.types.constants import RGB_BLACK, RGB_WHITE
 
 
 @dataclass
@@ -13,3 +14,6 @@ class StickerParameters:
     font_name: str = DEFAULT_FONT
     font_color: Sequence[int] = RGB_BLACK
     background_color: Sequence[int] = RGB_WHITE
+    image_format: str = STICKER_FORMAT
+    # Фразы набора стикеров (команда /create_pack), по стикеру на фразу
+    phrases: Optional[Sequence[str]] = None
@@ -0,0 +1,11 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Transition:
+    """
+    Результат функции-обработчика шага: обработчик сессии переходит на
+    соседний шаг (command - 'next_step' либо 'step_back') и сразу вызывает
+    функцию-обработчик нового шага без сообщения пользователя
+    """
+    command: str = 'next_step'
@@ -2,6 +2,7 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
+from core.types.render_task import RenderTask
 from core.types.sticker_parameters import StickerParameters
 
 
@@ -11,4 +12,8 @@ class UserSession:
     created: datetime
     current_step: int
     data_class: StickerParameters
-    file_path: Optional[str] = None
+    render_task: Optional[RenderTask] = None
+    # Стартовая команда, которой создана сессия - определяет обработчик сессии
+    command: str = 'create_sticker'
+    # Момент (по монотонным часам), после которого сессия считается истёкшей
+    expires_at: float = 0.0
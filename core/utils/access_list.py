@@ -0,0 +1,89 @@
+import logging
+import os
+import re
+import time
+from typing import FrozenSet, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_access_ids(text: str) -> FrozenSet[int]:
+    """
+    Возвращает id пользователей из текста: id разделяются пробелами, запятыми
+    либо переносами строк, всё после # - комментарий
+    """
+    text = re.sub(r'#.*', '', text)
+    ids = set()
+    for item in re.split(r'[\s,;]+', text):
+        if not item:
+            continue
+        try:
+            ids.add(int(item))
+        except ValueError:
+            raise ValueError(f'Некорректный id пользователя {item!r}')
+    return frozenset(ids)
+
+
+class AccessList:
+    """
+    Список id пользователей, которым разрешён доступ к боту - id из строки
+    (переменная окружения) и из файла. Файл проверяется не чаще
+    раза в check_interval секунд и перечитывается при изменении, поэтому
+    список можно менять без перезапуска бота. Если файл удалён либо
+    содержит ошибки - используется последний загруженный список
+    """
+    def __init__(self, ids: str = '', path: Optional[str] = None,
+                 check_interval: float = 5):
+        self.path = path or None
+        self.check_interval = check_interval
+        self._static_ids = parse_access_ids(ids)
+        self._ids: FrozenSet[int] = self._static_ids
+        self._file_state: Optional[Tuple[int, int]] = None
+        self._next_check = 0.0
+        if self.path is not None:
+            self.reload()
+
+    @property
+    def ids(self) -> FrozenSet[int]:
+        self._maybe_reload()
+        return self._ids
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def reload(self) -> bool:
+        """
+        Перечитывает файл, если он изменился. Возвращает True, если список
+        обновлён
+        """
+        self._next_check = self._get_monotonic_time() + self.check_interval
+        try:
+            stat = os.stat(self.path)
+            file_state = (stat.st_mtime_ns, stat.st_size)
+            if file_state == self._file_state:
+                return False
+            with open(self.path, encoding='utf-8') as file:
+                ids = parse_access_ids(file.read())
+        except (OSError, ValueError) as exc:
+            logger.warning(f'Не удалось загрузить список доступа '
+                           f'{self.path}: {exc}')
+            return False
+
+        self._ids = self._static_ids | ids
+        self._file_state = file_state
+        logger.info(f'Загружен список доступа {self.path}: '
+                    f'{len(ids)} пользователей')
+        return True
+
+    def _maybe_reload(self) -> None:
+        if (self.path is not None and
+                self._get_monotonic_time() >= self._next_check):
+            self.reload()
+
+    @staticmethod
+    def _get_monotonic_time() -> float:
+        return time.monotonic()
@@ -0,0 +1,249 @@
+"""
+Пакетная отрисовка стикеров без чата с ботом - для наборов стикеров и
+предварительного заполнения кэша отрисованных стикеров.
+
+Запуск:
+    python -m core.utils.bulk_render INPUT (.csv либо .jsonl) --output OUTPUT
+        (директория либо .zip) [--workers N] [--executor process|thread]
+        [--format PNG|WEBP] [--seed-cache]
+
+Колонки CSV (ключи JSONL): text - текст стикера (обязательно), splitting -
+разбивка текста по строкам ("2, 1"; по умолчанию каждое слово на отдельной
+строке), font - номер либо название шрифта, font_color и background_color -
+название цвета либо RGB-код ("255, 0, 0"), format - PNG либо WEBP,
+file_name - имя файла стикера
+"""
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import csv
+import json
+import logging
+import os
+import sys
+import time
+import zipfile
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from core.config import (
+    RENDER_CACHE_DIR, RENDER_CACHE_DISK_MAX_BYTES, STICKER_FORMAT,
+)
+from core.fonts import DEFAULT_FONT, FONTS
+from core.types import RenderTask
+from core.utils.render_cache import DiskCache, get_render_key
+from core.utils.render_pool import EXECUTOR_TYPES, render_sticker, warm_up_worker
+from core.utils.session_helpers import (
+    get_splitting_numbers, get_splitting_text, set_color_helper,
+    set_splitting_numbers_helper,
+)
+from core.utils.sticker_creator import RGB_BLACK, RGB_WHITE
+
+
+logger = logging.getLogger(__name__)
+
+
+def create_stickers(tasks: Iterable[RenderTask], *,
+                    executor_type: str = 'process',
+                    max_workers: Optional[int] = None,
+                    max_in_flight: Optional[int] = None) -> Iterator[RenderTask]:
+    """
+    Отрисовывает стикеры в пуле воркеров и возвращает задачи по мере
+    готовности (порядок не сохраняется). Задачи читаются из tasks лениво, в
+    работе одновременно не больше max_in_flight задач, поэтому потребление
+    памяти не зависит от количества задач.
+    Каждый воркер один раз загружает шрифты в свой кэш. Если отрисовка
+    завершилась ошибкой - задача возвращается без изображения
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or max_workers * 4
+    executor = EXECUTOR_TYPES[executor_type](max_workers=max_workers,
+                                             initializer=warm_up_worker)
+    with executor:
+        in_flight: Dict[concurrent.futures.Future, RenderTask] = {}
+        for task in tasks:
+            if len(in_flight) >= max_in_flight:
+                yield from _get_finished(in_flight)
+            in_flight[executor.submit(render_sticker, task)] = task
+        while in_flight:
+            yield from _get_finished(in_flight)
+
+
+def _get_finished(in_flight: Dict[concurrent.futures.Future, RenderTask]
+                  ) -> Iterator[RenderTask]:
+    done, _ = concurrent.futures.wait(
+        in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+    for future in done:
+        task = in_flight.pop(future)
+        try:
+            task.content, task.render_time, task.encode_time = future.result()
+        except Exception as exc:
+            logger.exception(msg=exc)
+        yield task
+
+
+def read_rows(path: str) -> Iterator[Dict]:
+    """
+    Построчно читает параметры стикеров из CSV либо JSONL
+    """
+    with open(path, encoding='utf-8', newline='') as file:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def get_render_task(row: Dict, index: int,
+                    default_format: str = STICKER_FORMAT) -> RenderTask:
+    """
+    Создаёт задачу на отрисовку из строки входного файла. Параметры
+    проверяются так же, как в диалоге с ботом
+    """
+    text = ' '.join(str(row.get('text') or '').split())
+    if not text:
+        raise ValueError('не указан текст стикера')
+
+    splitting_numbers = set_splitting_numbers_helper(text)
+    if row.get('splitting'):
+        splitting_numbers = get_splitting_numbers(_to_str(row['splitting']),
+                                                  splitting_numbers)
+
+    image_format = str(row.get('format') or default_format).upper()
+    file_name = row.get('file_name') or f'{index:06d}.{image_format.lower()}'
+    return RenderTask(
+        text=get_splitting_text(text, splitting_numbers),
+        file_name=file_name,
+        font_name=_get_font_name(row.get('font')),
+        font_color=_get_color(row.get('font_color'), RGB_BLACK),
+        background_color=_get_color(row.get('background_color'), RGB_WHITE),
+        image_format=image_format,
+    )
+
+
+def _get_font_name(font) -> str:
+    if font in (None, ''):
+        return DEFAULT_FONT
+    if str(font).isdigit():
+        try:
+            return FONTS[int(font)]
+        except KeyError:
+            raise ValueError(f'неизвестный номер шрифта {font}')
+    if font not in FONTS.values():
+        raise ValueError(f'неизвестный шрифт {font}')
+    return font
+
+
+def _get_color(color, default: Tuple[int, int, int]) -> Tuple[int, ...]:
+    if color in (None, ''):
+        return default
+    return tuple(set_color_helper(_to_str(color)))
+
+
+def _to_str(value) -> str:
+    if isinstance(value, (list, tuple)):
+        return ', '.join(str(item) for item in value)
+    return str(value)
+
+
+def read_tasks(path: str, default_format: str = STICKER_FORMAT,
+               stats: Optional[collections.Counter] = None
+               ) -> Iterator[RenderTask]:
+    """
+    Возвращает задачи на отрисовку из входного файла, пропуская строки с
+    ошибками (ошибки пишутся в лог, количество пропущенных строк - в
+    stats['skipped'])
+    """
+    for index, row in enumerate(read_rows(path), start=1):
+        try:
+            yield get_render_task(row, index, default_format)
+        except Exception as exc:
+            if stats is not None:
+                stats['skipped'] += 1
+            logger.warning(f'Строка {index} пропущена: {exc}')
+
+
+class StickerWriter:
+    """
+    Записывает готовые стикеры в директорию либо в zip-архив
+    """
+    def __init__(self, output: str):
+        self.output = output
+        self._archive = None
+        if output.endswith('.zip'):
+            self._archive = zipfile.ZipFile(output, mode='w',
+                                            compression=zipfile.ZIP_STORED)
+        else:
+            os.makedirs(output, exist_ok=True)
+
+    def write(self, task: RenderTask) -> None:
+        file_name = os.path.basename(task.file_name)
+        if self._archive is not None:
+            self._archive.writestr(file_name, task.content)
+            return
+        with open(os.path.join(self.output, file_name), mode='wb') as file:
+            file.write(task.content)
+
+    def close(self) -> None:
+        if self._archive is not None:
+            self._archive.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='CSV либо JSONL с параметрами стикеров')
+    parser.add_argument('--output', required=True,
+                        help='директория либо .zip для готовых стикеров')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--executor', choices=tuple(EXECUTOR_TYPES),
+                        default='process')
+    parser.add_argument('--format', default=STICKER_FORMAT,
+                        help='формат стикеров по умолчанию')
+    parser.add_argument('--seed-cache', action='store_true',
+                        help='сохранить стикеры в дисковый кэш отрисованных '
+                             'стикеров бота')
+    parser.add_argument('--report-interval', type=float, default=5,
+                        help='интервал вывода прогресса, секунд')
+    args = parser.parse_args()
+
+    disk_cache = None
+    if args.seed_cache:
+        if RENDER_CACHE_DISK_MAX_BYTES <= 0:
+            parser.error('дисковый кэш отключён (RENDER_CACHE_DISK_MAX_BYTES=0)')
+        disk_cache = DiskCache(RENDER_CACHE_DIR, RENDER_CACHE_DISK_MAX_BYTES)
+
+    rendered = failed = size = 0
+    stats = collections.Counter()
+    writer = StickerWriter(args.output)
+    started = last_report = time.perf_counter()
+    with contextlib.closing(writer):
+        tasks = read_tasks(args.input, args.format.upper(), stats)
+        for task in create_stickers(tasks, executor_type=args.executor,
+                                    max_workers=args.workers):
+            if not task.done:
+                failed += 1
+                continue
+            writer.write(task)
+            if disk_cache is not None:
+                disk_cache.put(get_render_key(task), task.content)
+            rendered += 1
+            size += len(task.content)
+
+            now = time.perf_counter()
+            if now - last_report >= args.report_interval:
+                last_report = now
+                print(f'Отрисовано {rendered} стикеров, '
+                      f'{rendered / (now - started):.1f} стикеров/с',
+                      file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    print(f'Отрисовано: {rendered}, ошибок отрисовки: {failed}, '
+          f'пропущено строк: {stats["skipped"]}')
+    print(f'Время: {elapsed:.2f} с, {rendered / elapsed if elapsed else 0:.1f} '
+          f'стикеров/с, {size / 1024 / 1024:.1f} МБ')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Потокобезопасный LRU-кэш, ограниченный суммарным размером значений.
+    Размер значения определяется функцией get_size (по умолчанию - len)
+    """
+    def __init__(self, max_size: int,
+                 get_size: Callable[[Any], int] = len):
+        self.max_size = max_size
+        self._get_size = get_size
+        self._items: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Возвращает значение по ключу и помечает его как недавно использованное
+        """
+        with self._lock:
+            try:
+                value = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any,
+            size: Optional[int] = None) -> None:
+        """
+        Добавляет значение в кэш, вытесняя давно не использованные значения.
+        Значения больше всего бюджета кэша не сохраняются
+        """
+        if size is None:
+            size = self._get_size(value)
+        if size > self.max_size:
+            return
+
+        with self._lock:
+            if key in self._items:
+                self._pop(key)
+            self._items[key] = value
+            self._sizes[key] = size
+            self.size += size
+            while self.size > self.max_size:
+                self._pop(next(iter(self._items)))
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any],
+                    size: Optional[int] = None) -> Any:
+        """
+        Возвращает значение из кэша либо загружает его с помощью loader.
+        Загрузка выполняется без блокировки кэша
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.put(key, value, size)
+        return value
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._items:
+                return default
+            return self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._sizes.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Возвращает статистику использования кэша
+        """
+        requests = self.hits + self.misses
+        return {
+            'items': len(self._items),
+            'size': self.size,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / requests if requests else 0.0,
+        }
+
+    def _pop(self, key: Hashable) -> Any:
+        self.size -= self._sizes.pop(key)
+        return self._items.pop(key)
+
+
+_MISSING = object()
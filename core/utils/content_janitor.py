@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from core.utils.metrics import JANITOR_RECLAIMED_BYTES, JANITOR_REMOVED_FILES
+
+
+logger = logging.getLogger(__name__)
+
+# Время изменения, размер и путь файла
+FileEntry = Tuple[float, int, str]
+
+
+@dataclass
+class JanitorReport:
+    """
+    Результат очистки директории
+    """
+    files: int = 0
+    size: int = 0
+    expired_files: int = 0
+    evicted_files: int = 0
+    reclaimed_bytes: int = 0
+    errors: int = 0
+
+    @property
+    def removed_files(self) -> int:
+        return self.expired_files + self.evicted_files
+
+
+class ContentJanitor:
+    """
+    Фоновая очистка директории от оставшихся файлов: удаляются файлы старше
+    max_age секунд, а если суммарный размер файлов больше max_size - самые
+    старые файлы сверх бюджета (0 - без ограничения).
+    Обход директории и удаление файлов выполняются в пуле потоков, удаление -
+    пачками по batch_size файлов. Поддиректории из exclude (например, дисковый
+    кэш со своим бюджетом) не проверяются
+    """
+    def __init__(self, directory: str, max_age: float = 0, max_size: int = 0,
+                 interval: float = 3600, batch_size: int = 500,
+                 exclude: Sequence[str] = ()):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_size = max_size
+        self.interval = interval
+        self.batch_size = batch_size
+        self.exclude = frozenset(os.path.abspath(path) for path in exclude)
+
+    async def run(self) -> None:
+        """
+        Очищает директорию при запуске и далее каждые interval секунд
+        """
+        while True:
+            try:
+                await self.clean()
+            except Exception as exc:
+                logger.exception(msg=exc)
+            await asyncio.sleep(self.interval)
+
+    async def clean(self, now: Optional[float] = None) -> JanitorReport:
+        """
+        Индексирует директорию и удаляет устаревшие файлы и файлы сверх
+        бюджета, начиная с самых старых
+        """
+        loop = asyncio.get_running_loop()
+        entries = await loop.run_in_executor(None, self.scan)
+        expired, evicted = self.select(entries, time.time() if now is None else now)
+
+        report = JanitorReport(files=len(entries),
+                               size=sum(size for _, size, _ in entries))
+        for is_expired, victims in ((True, expired), (False, evicted)):
+            for index in range(0, len(victims), self.batch_size):
+                removed, reclaimed, errors = await loop.run_in_executor(
+                    None, self.remove, victims[index:index + self.batch_size])
+                if is_expired:
+                    report.expired_files += removed
+                else:
+                    report.evicted_files += removed
+                report.reclaimed_bytes += reclaimed
+                report.errors += errors
+
+        JANITOR_REMOVED_FILES.inc(report.removed_files)
+        JANITOR_RECLAIMED_BYTES.inc(report.reclaimed_bytes)
+        if report.removed_files or report.errors:
+            logger.info(f'Очистка {self.directory}: удалено файлов - '
+                        f'{report.removed_files} (устаревших - '
+                        f'{report.expired_files}, сверх бюджета - '
+                        f'{report.evicted_files}), освобождено '
+                        f'{report.reclaimed_bytes} Б из {report.size} Б, '
+                        f'ошибок - {report.errors}')
+        return report
+
+    def scan(self) -> List[FileEntry]:
+        """
+        Возвращает файлы директории (рекурсивно) от самых старых к новым
+        """
+        entries = []
+        directories = [self.directory]
+        while directories:
+            directory = directories.pop()
+            try:
+                with os.scandir(directory) as files:
+                    for entry in files:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if os.path.abspath(entry.path) not in self.exclude:
+                                    directories.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                stat = entry.stat(follow_symlinks=False)
+                                entries.append((stat.st_mtime, stat.st_size,
+                                                entry.path))
+                        except OSError:
+                            # Файл удалён во время обхода
+                            continue
+            except OSError:
+                continue
+        entries.sort()
+        return entries
+
+    def select(self, entries: Sequence[FileEntry],
+               now: float) -> Tuple[List[FileEntry], List[FileEntry]]:
+        """
+        Возвращает устаревшие файлы и файлы, которые нужно удалить, чтобы
+        уложиться в бюджет. entries отсортированы от старых к новым
+        """
+        expired_count = 0
+        if self.max_age > 0:
+            border = now - self.max_age
+            while (expired_count < len(entries) and
+                   entries[expired_count][0] < border):
+                expired_count += 1
+        expired = list(entries[:expired_count])
+
+        evicted = []
+        if self.max_size > 0:
+            size = sum(size for _, size, _ in entries[expired_count:])
+            for entry in entries[expired_count:]:
+                if size <= self.max_size:
+                    break
+                evicted.append(entry)
+                size -= entry[1]
+        return expired, evicted
+
+    @staticmethod
+    def remove(entries: Sequence[FileEntry]) -> Tuple[int, int, int]:
+        """
+        Удаляет файлы. Возвращает количество удалённых файлов, освобождённые
+        байты и количество ошибок
+        """
+        removed = reclaimed = errors = 0
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            except OSError:
+                errors += 1
+                continue
+            removed += 1
+            reclaimed += size
+        return removed, reclaimed, errors
@@ -0,0 +1,55 @@
+import hashlib
+import os
+from typing import Dict, Hashable, Optional, Tuple
+
+from aiogram import types
+
+from core.utils.cache import LRUCache
+
+
+class FileIdCache:
+    """
+    Кэш file_id файлов, уже загруженных на сервер Телеграма. Ключ - тип
+    контента и хеш содержимого файла (для локальных файлов - путь, время
+    изменения и размер файла), поэтому повторная отправка тех же байтов
+    выполняется по file_id без повторной загрузки
+    """
+    def __init__(self, max_items: int):
+        self._cache = LRUCache(max_items, get_size=lambda file_id: 1)
+
+    @staticmethod
+    def get_key(content_type: str, content: bytes) -> Tuple[str, str]:
+        return content_type, hashlib.sha256(content).hexdigest()
+
+    @staticmethod
+    def get_path_key(content_type: str, path: str) -> Tuple[str, str, int, int]:
+        """
+        Возвращает ключ локального файла, не читая его содержимое.
+        Изменённый файл получает новый ключ
+        """
+        stat = os.stat(path)
+        return content_type, os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+    def get(self, key: Hashable) -> Optional[str]:
+        return self._cache.get(key)
+
+    def put(self, key: Hashable, file_id: Optional[str]) -> None:
+        if file_id is not None:
+            self._cache.put(key, file_id)
+
+    def stats(self) -> Dict[str, float]:
+        return self._cache.stats()
+
+
+def get_file_id(message: types.Message, content_type: str) -> Optional[str]:
+    """
+    Возвращает file_id файла из сообщения, отправленного ботом
+    """
+    if content_type == 'photo' and message.photo:
+        # Телеграм возвращает несколько размеров фото, последний - исходный
+        return message.photo[-1].file_id
+    if content_type == 'document' and message.document:
+        return message.document.file_id
+    if content_type == 'sticker' and message.sticker:
+        return message.sticker.file_id
+    return None
@@ -0,0 +1,62 @@
+import io
+import os
+from typing import Dict
+
+from PIL import ImageFont
+
+from core.config import (
+    FONTS_DIR, FONT_CACHE_MAX_BYTES, FONT_FILES_CACHE_MAX_BYTES,
+)
+from core.utils.cache import LRUCache
+
+
+class FontCache:
+    """
+    Общий для процесса кэш шрифтов: исходные байты файлов шрифтов и
+    загруженные в FreeType шрифты с ключом (название шрифта, размер).
+    Размер загруженного шрифта оценивается размером файла шрифта
+    """
+    def __init__(self, fonts_dir: str, max_fonts_size: int,
+                 max_files_size: int):
+        self.fonts_dir = fonts_dir
+        self.files = LRUCache(max_files_size)
+        self.fonts = LRUCache(max_fonts_size)
+
+    def get_font_bytes(self, font_name: str) -> bytes:
+        """
+        Возвращает содержимое файла шрифта, читая его с диска только при
+        первом обращении
+        """
+        return self.files.get_or_load(font_name,
+                                      lambda: self._read_font_file(font_name))
+
+    def get_font(self, font_name: str,
+                 font_size: int) -> ImageFont.FreeTypeFont:
+        """
+        Возвращает шрифт заданного размера
+        """
+        font_bytes = self.get_font_bytes(font_name)
+        return self.fonts.get_or_load(
+            (font_name, font_size),
+            lambda: ImageFont.truetype(font=io.BytesIO(font_bytes),
+                                       size=font_size),
+            size=len(font_bytes),
+        )
+
+    def clear(self) -> None:
+        self.fonts.clear()
+        self.files.clear()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            'fonts': self.fonts.stats(),
+            'files': self.files.stats(),
+        }
+
+    def _read_font_file(self, font_name: str) -> bytes:
+        with open(os.path.join(self.fonts_dir, font_name), mode='rb') as file:
+            return file.read()
+
+
+font_cache = FontCache(FONTS_DIR, FONT_CACHE_MAX_BYTES,
+                       FONT_FILES_CACHE_MAX_BYTES)
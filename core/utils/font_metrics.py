@@ -0,0 +1,210 @@
+import json
+import os
+import string
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+from core.config import FONT_METRICS_DIR
+from core.utils.font_cache import font_cache
+
+
+# Размер шрифта, на котором снимаются метрики. Метрики для других размеров
+# получаются масштабированием
+REFERENCE_SIZE = 200
+# Символы, метрики которых снимаются при построении таблицы, остальные
+# символы и пары символов измеряются при первом обращении
+PRELOADED_CHARS = (string.ascii_letters + string.digits + string.punctuation +
+                   'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+                   'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ ')
+
+# Ширина, высота и вертикальное смещение глифа
+GlyphMetrics = Tuple[int, int, int]
+
+
+class FontMetrics:
+    """
+    Таблица метрик шрифта на размере REFERENCE_SIZE: размеры и смещения
+    глифов, поправки ширины для пар соседних символов (кернинг и боковые
+    отступы глифов), ascent и descent шрифта.
+    Позволяет без раскладки текста в FreeType оценить размеры текста на любом
+    размере шрифта. Из-за хинтинга и округления оценка приблизительная и
+    используется только как подсказка при подборе размера шрифта
+    """
+    def __init__(self, font_name: str, reference_size: int = REFERENCE_SIZE,
+                 glyphs: Optional[Dict[str, GlyphMetrics]] = None,
+                 pairs: Optional[Dict[str, int]] = None,
+                 ascent: Optional[int] = None, descent: Optional[int] = None):
+        self.font_name = font_name
+        self.reference_size = reference_size
+        self.glyphs: Dict[str, GlyphMetrics] = dict(glyphs or {})
+        self.pairs: Dict[str, int] = dict(pairs or {})
+        self._font = None
+        if ascent is None or descent is None:
+            ascent, descent = self._get_font().getmetrics()
+        self.ascent = ascent
+        self.descent = descent
+
+    @classmethod
+    def build(cls, font_name: str, chars: str = PRELOADED_CHARS,
+              reference_size: int = REFERENCE_SIZE) -> 'FontMetrics':
+        font_metrics = cls(font_name, reference_size)
+        for char in chars:
+            font_metrics.get_glyph(char)
+        return font_metrics
+
+    def get_glyph(self, char: str) -> GlyphMetrics:
+        glyph = self.glyphs.get(char)
+        if glyph is None:
+            (width, height), (_, offset_y) = self._measure(char)
+            glyph = self.glyphs[char] = (width, height, offset_y)
+        return glyph
+
+    def get_pair(self, pair: str) -> int:
+        correction = self.pairs.get(pair)
+        if correction is None:
+            (width, _), _ = self._measure(pair)
+            correction = self.pairs[pair] = (width -
+                                             self.get_glyph(pair[0])[0] -
+                                             self.get_glyph(pair[1])[0])
+        return correction
+
+    def get_text_width(self, text: str) -> int:
+        """
+        Возвращает оценку ширины текста на размере reference_size
+        """
+        width = sum(self.get_glyph(char)[0] for char in text)
+        width += sum(self.get_pair(text[index:index + 2])
+                     for index in range(len(text) - 1))
+        return width
+
+    def get_text_box(self, text: str) -> Tuple[int, int]:
+        """
+        Возвращает оценку высоты текста и его вертикального смещения на
+        размере reference_size
+        """
+        glyphs = [self.get_glyph(char) for char in text if not char.isspace()]
+        if not glyphs:
+            return 0, 0
+        top = min(offset_y for _, _, offset_y in glyphs)
+        bottom = max(offset_y + height for _, height, offset_y in glyphs)
+        return bottom - top, top
+
+    def predict_size(self, text: str, max_text_length: int) -> Optional[int]:
+        """
+        Возвращает оценку размера шрифта, при котором ширина текста равна
+        max_text_length
+        """
+        width = self.get_text_width(text)
+        if width <= 0:
+            return None
+        return int(max_text_length * self.reference_size / width)
+
+    def predict_area_size(self, words: Sequence[str],
+                          max_text_length: int) -> Optional[int]:
+        """
+        Возвращает оценку размера шрифта, при котором высота текстовой
+        области (см. sticker_creator._get_text_area_height_in_px) равна
+        max_text_length
+        """
+        height = 0
+        for word in words:
+            word_height, offset_y = self.get_text_box(word)
+            height += word_height + max(abs(offset_y), word_height / 5)
+        if height <= 0:
+            return None
+        return int(max_text_length * self.reference_size / height)
+
+    def to_dict(self) -> dict:
+        return {
+            'font_name': self.font_name,
+            'reference_size': self.reference_size,
+            'ascent': self.ascent,
+            'descent': self.descent,
+            # Таблицы копируются, т. к. могут дополняться из других потоков
+            'glyphs': dict(self.glyphs),
+            'pairs': dict(self.pairs),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'FontMetrics':
+        return cls(
+            font_name=data['font_name'],
+            reference_size=data['reference_size'],
+            glyphs={char: tuple(glyph) for char, glyph in data['glyphs'].items()},
+            pairs=data['pairs'],
+            ascent=data['ascent'],
+            descent=data['descent'],
+        )
+
+    def _measure(self, text: str) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        return self._get_font().font.getsize(text)
+
+    def _get_font(self):
+        if self._font is None:
+            self._font = font_cache.get_font(self.font_name, self.reference_size)
+        return self._font
+
+
+class FontMetricsRegistry:
+    """
+    Таблицы метрик шрифтов процесса. Таблица строится при первом обращении к
+    шрифту, а если задана директория - загружается из неё и сохраняется в неё
+    (для повторного использования воркерами и после перезапуска)
+    """
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self._metrics: Dict[str, FontMetrics] = {}
+        self._lock = threading.Lock()
+
+    def get(self, font_name: str) -> FontMetrics:
+        font_metrics = self._metrics.get(font_name)
+        if font_metrics is None:
+            with self._lock:
+                font_metrics = self._metrics.get(font_name)
+                if font_metrics is None:
+                    font_metrics = self._metrics[font_name] = self._load(font_name)
+        return font_metrics
+
+    def save(self) -> None:
+        """
+        Сохраняет таблицы, в том числе дополненные после загрузки
+        """
+        if not self.directory:
+            return
+        for font_metrics in tuple(self._metrics.values()):
+            self._save(font_metrics)
+
+    def clear(self) -> None:
+        self._metrics.clear()
+
+    def _load(self, font_name: str) -> FontMetrics:
+        path = self._get_path(font_name)
+        if path is not None and os.path.isfile(path):
+            try:
+                with open(path, encoding='utf-8') as file:
+                    font_metrics = FontMetrics.from_dict(json.load(file))
+                if font_metrics.reference_size == REFERENCE_SIZE:
+                    return font_metrics
+            except (OSError, ValueError, KeyError):
+                pass
+
+        font_metrics = FontMetrics.build(font_name)
+        if path is not None:
+            self._save(font_metrics)
+        return font_metrics
+
+    def _save(self, font_metrics: FontMetrics) -> None:
+        path = self._get_path(font_metrics.font_name)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, mode='w', encoding='utf-8') as file:
+            json.dump(font_metrics.to_dict(), file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _get_path(self, font_name: str) -> Optional[str]:
+        if not self.directory:
+            return None
+        return os.path.join(self.directory, f'{font_name}.json')
+
+
+font_metrics_registry = FontMetricsRegistry(FONT_METRICS_DIR)
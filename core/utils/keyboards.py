@@ -1,4 +1,9 @@
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
+from typing import Sequence, Tuple
+
+from aiogram.types import (
+    InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton,
+    ReplyKeyboardMarkup,
+)
 
 from core.fonts import MIN_FONT_NUMBER, MAX_FONT_NUMBER
 from core.utils.sticker_creator import COLORS_MAP
@@ -16,3 +21,12 @@ kb_fonts_numbers = ReplyKeyboardMarkup(resize_keyboard=True,
 _colors = [KeyboardButton(color) for color in COLORS_MAP.keys()]
 kb_colors = ReplyKeyboardMarkup(resize_keyboard=True,
                                 one_time_keyboard=True).add(*_colors)
+
+
+def get_inline_keyboard(buttons: Sequence[Tuple[str, str]],
+                        row_width: int = 3) -> InlineKeyboardMarkup:
+    """
+    Возвращает inline-клавиатуру из кнопок (текст кнопки, данные кнопки)
+    """
+    return InlineKeyboardMarkup(row_width=row_width).add(
+        *(InlineKeyboardButton(text, callback_data=data) for text, data in buttons))
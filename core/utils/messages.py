@@ -46,6 +46,43 @@ _messages_map = {
                        'Для того чтобы создать ещё один стикер введите одну '
                        'из доступных стартовых команд.\n\n'
                        'Стартовые команды:\n'
-                       '/create_sticker - начать создание стикера',
+                       '/create_sticker - начать создание стикера\n'
+                       '/quick_sticker - создать стикер с помощью кнопок\n'
+                       '/create_pack - создать набор стикеров',
+    },
+    # Панели /quick_sticker редактируются после каждого нажатия кнопки,
+    # поэтому их текст короткий
+    'choose_background_color': {
+        'start_message': 'Цвет фона (либо RGB-код, например - 0, 0, 0):',
+    },
+    'choose_font': {
+        'start_message': 'Шрифт:',
+    },
+    'choose_font_color': {
+        'start_message': 'Цвет шрифта:',
+    },
+    'choose_splitting_numbers': {
+        'start_message': 'Слов в каждой строке:',
+    },
+    'send_quick_sticker': {
+        'end_message': 'Стикер готов. Ещё один - /quick_sticker',
+    },
+    'set_phrases': {
+        'start_message': 'Пришлите фразы для набора стикеров, каждую фразу '
+                         'с новой строки (не больше {max_stickers} фраз). '
+                         'Каждое слово фразы будет на отдельной строке стикера',
+    },
+    'send_pack': {
+        'start_message': 'Создаю {count} стикеров, готовые стикеры будут '
+                         'приходить по мере отрисовки',
+        'end_message': 'Создание набора стикеров завершено.\n'
+                       'Стикеры из архива можно загрузить в набор через '
+                       '@Stickers.\n'
+                       'Для того чтобы продолжить введите одну из доступных '
+                       'стартовых команд.\n\n'
+                       'Стартовые команды:\n'
+                       '/create_sticker - начать создание стикера\n'
+                       '/quick_sticker - создать стикер с помощью кнопок\n'
+                       '/create_pack - создать набор стикеров',
     },
 }
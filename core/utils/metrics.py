@@ -0,0 +1,307 @@
+import bisect
+import math
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from aiohttp import web
+
+
+# Границы корзин гистограмм по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (1024, 4 * 1024, 16 * 1024, 32 * 1024, 64 * 1024, 128 * 1024,
+                 256 * 1024, 512 * 1024, 1024 * 1024)
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[Dict[str, str], float]
+
+
+class _Metric:
+    """
+    Базовая метрика с набором меток. Для каждого набора значений меток
+    создаётся дочерний объект, который стоит сохранить у себя, чтобы не
+    искать его при каждом изменении метрики
+    """
+    type = ''
+
+    def __init__(self, name: str, documentation: str,
+                 label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._children: Dict[LabelValues, '_Metric'] = {}
+
+    def labels(self, *values: str, **labels: str):
+        if labels:
+            values = tuple(labels[name] for name in self.label_names)
+        values = tuple(str(value) for value in values)
+        if len(values) != len(self.label_names):
+            raise ValueError(f'Метрика {self.name} ожидает метки '
+                             f'{self.label_names}')
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._create_child()
+        return child
+
+    def collect(self) -> List[str]:
+        lines = []
+        if self.label_names:
+            for values, child in sorted(self._children.items()):
+                lines.extend(child._samples(dict(zip(self.label_names, values))))
+        else:
+            lines.extend(self._samples({}))
+        return lines
+
+    def _create_child(self) -> '_Metric':
+        return type(self)(self.name, self.documentation)
+
+    def _samples(self, labels: Dict[str, str]) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """
+    Монотонно возрастающий счётчик
+    """
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str,
+                 label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def _samples(self, labels: Dict[str, str]) -> List[str]:
+        return [_format_sample(f'{self.name}_total', labels, self.value)]
+
+
+class Gauge(_Metric):
+    """
+    Значение, которое может как расти, так и уменьшаться
+    """
+    type = 'gauge'
+
+    def __init__(self, name: str, documentation: str,
+                 label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def _samples(self, labels: Dict[str, str]) -> List[str]:
+        return [_format_sample(self.name, labels, self.value)]
+
+
+class Histogram(_Metric):
+    """
+    Гистограмма с фиксированными границами корзин. Наблюдение увеличивает
+    только одну корзину, накопительные значения считаются при выгрузке
+    """
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str,
+                 label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def _create_child(self) -> 'Histogram':
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def _samples(self, labels: Dict[str, str]) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            cumulative += count
+            lines.append(_format_sample(f'{self.name}_bucket',
+                                        dict(labels, le=_format_value(bound)),
+                                        cumulative))
+        lines.append(_format_sample(f'{self.name}_sum', labels, self.sum))
+        lines.append(_format_sample(f'{self.name}_count', labels, cumulative))
+        return lines
+
+
+class CallbackMetric:
+    """
+    Метрика, значения которой вычисляются при выгрузке - для величин, которые
+    уже подсчитываются в другом месте (размер хранилища, статистика кэшей)
+    """
+    def __init__(self, name: str, documentation: str, metric_type: str,
+                 callback: Callable[[], Iterable[Sample]]):
+        self.name = name
+        self.documentation = documentation
+        self.type = metric_type
+        self.callback = callback
+
+    def collect(self) -> List[str]:
+        name = f'{self.name}_total' if self.type == 'counter' else self.name
+        return [_format_sample(name, labels, value)
+                for labels, value in self.callback()]
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик, выгружаемых в текстовом формате Prometheus.
+    Метрики изменяются без блокировок, поэтому изменять их следует только из
+    потока event loop (результаты воркеров отрисовки учитываются после
+    получения результата в event loop)
+    """
+    def __init__(self, prefix: str = ''):
+        self.prefix = prefix
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, documentation: str,
+                label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self.prefix + name, documentation,
+                                      label_names))
+
+    def gauge(self, name: str, documentation: str,
+              label_names: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(self.prefix + name, documentation,
+                                    label_names))
+
+    def histogram(self, name: str, documentation: str,
+                  label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self.prefix + name, documentation,
+                                        label_names, buckets))
+
+    def callback(self, name: str, documentation: str, metric_type: str,
+                 callback: Callable[[], Iterable[Sample]]) -> CallbackMetric:
+        """
+        Регистрирует (либо заменяет) вычисляемую при выгрузке метрику
+        """
+        metric = CallbackMetric(self.prefix + name, documentation, metric_type,
+                                callback)
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            # Значения счётчиков выгружаются с суффиксом _total, описание
+            # метрики должно называться так же
+            name = f'{metric.name}_total' if metric.type == 'counter' else metric.name
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'Метрика {metric.name} уже зарегистрирована')
+        self._metrics[metric.name] = metric
+        return metric
+
+
+def _format_sample(name: str, labels: Dict[str, str], value: float) -> str:
+    if labels:
+        label_pairs = ','.join(f'{key}="{_escape(str(label))}"'
+                               for key, label in labels.items())
+        return f'{name}{{{label_pairs}}} {_format_value(value)}'
+    return f'{name} {_format_value(value)}'
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def create_metrics_app(metrics_registry: MetricsRegistry,
+                       path: str = '/metrics') -> web.Application:
+    """
+    Создаёт aiohttp-приложение, отдающее метрики по адресу path
+    """
+    async def metrics_handler(_: web.Request) -> web.Response:
+        return web.Response(text=metrics_registry.render(),
+                            content_type='text/plain', charset='utf-8',
+                            headers={'X-Content-Type-Options': 'nosniff'})
+
+    app = web.Application()
+    app.router.add_get(path, metrics_handler)
+    return app
+
+
+registry = MetricsRegistry(prefix='sticker_bot_')
+
+SESSIONS_CREATED = registry.counter(
+    'sessions_created', 'Количество созданных сессий')
+SESSIONS_EXPIRED = registry.counter(
+    'sessions_expired', 'Количество сессий, закрытых по истечении SESSION_TTL')
+STEP_DURATION = registry.histogram(
+    'step_duration_seconds', 'Время обработки сообщения шагом сессии',
+    ('step',))
+RENDER_DURATION = registry.histogram(
+    'render_duration_seconds', 'Время отрисовки стикера', ('format',))
+ENCODE_DURATION = registry.histogram(
+    'encode_duration_seconds', 'Время кодирования стикера', ('format',))
+STICKER_BYTES = registry.histogram(
+    'sticker_bytes', 'Размер закодированного стикера', ('format',),
+    buckets=BYTES_BUCKETS)
+RENDER_QUEUE_WAIT = registry.histogram(
+    'render_queue_wait_seconds', 'Время ожидания стикера в очереди отрисовки')
+RENDER_QUEUE_REJECTED = registry.counter(
+    'render_queue_rejected', 'Количество стикеров, не принятых в переполненную '
+                             'очередь отрисовки')
+RENDER_ABANDONED_TASKS = registry.counter(
+    'render_abandoned_tasks', 'Количество зависших отрисовок, оставленных '
+                              'выполняться в пересозданном пуле воркеров')
+THROTTLED_UPDATES = registry.counter(
+    'throttled_updates', 'Количество запросов, отброшенных ограничением частоты',
+    ('kind',))
+ACCESS_DENIED = registry.counter(
+    'access_denied', 'Количество сообщений от пользователей без доступа')
+JANITOR_REMOVED_FILES = registry.counter(
+    'content_janitor_removed_files', 'Количество файлов, удалённых из CONTENT_DIR')
+JANITOR_RECLAIMED_BYTES = registry.counter(
+    'content_janitor_reclaimed_bytes', 'Объём файлов, удалённых из CONTENT_DIR')
+SEND_DURATION = registry.histogram(
+    'telegram_send_duration_seconds', 'Время отправки ответа в Телеграм',
+    ('content_type',))
+SEND_ERRORS = registry.counter(
+    'telegram_send_errors', 'Количество ошибок отправки ответа в Телеграм',
+    ('content_type',))
+
+
+def register_cache_metrics(caches: Dict[str, Callable[[], Dict[str, float]]]
+                           ) -> None:
+    """
+    Регистрирует метрики попаданий/промахов и доли попаданий для кэшей.
+    caches - название кэша и функция, возвращающая статистику кэша
+    (см. LRUCache.stats)
+    """
+    def get_samples(key: str) -> Callable[[], List[Sample]]:
+        return lambda: [({'cache': name}, get_stats()[key])
+                        for name, get_stats in caches.items()]
+
+    registry.callback('cache_hits', 'Количество попаданий в кэш', 'counter',
+                      get_samples('hits'))
+    registry.callback('cache_misses', 'Количество промахов кэша', 'counter',
+                      get_samples('misses'))
+    registry.callback('cache_hit_ratio', 'Доля попаданий в кэш', 'gauge',
+                      get_samples('hit_rate'))
@@ -1 +1,2 @@
 from .access_middleware import AccessMiddleware
+from .throttling_middleware import ThrottlingMiddleware
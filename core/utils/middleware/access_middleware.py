@@ -1,20 +1,56 @@
-from typing import Set
+import time
+from typing import Container
 
 from aiogram import types
 from aiogram.dispatcher.handler import CancelHandler
 from aiogram.dispatcher.middlewares import BaseMiddleware
 
+from core.utils.cache import LRUCache
+from core.utils.metrics import ACCESS_DENIED
+
 
 class AccessMiddleware(BaseMiddleware):
     """
     Аутентификация — пропускаем сообщения только от определённых
-    Telegram аккаунтов
+    Telegram аккаунтов.
+    Отказ в доступе отправляется пользователю не чаще раза в deny_interval
+    секунд, время последнего отказа хранится для max_denied_users
+    пользователей
     """
-    def __init__(self, access_ids: Set):
+    def __init__(self, access_ids: Container[int], deny_interval: float = 600,
+                 max_denied_users: int = 10000):
         self.access_ids = access_ids
+        self.deny_interval = deny_interval
+        self._denied = LRUCache(max_size=max_denied_users, get_size=lambda _: 1)
         super().__init__()
 
     async def on_process_message(self, message: types.Message, _) -> None:
-        if message.from_user.id not in self.access_ids:
+        user_id = message.from_user.id
+        if user_id in self.access_ids:
+            return
+        ACCESS_DENIED.inc()
+        if self.should_reply(user_id):
             await message.answer("Access Denied")
-            raise CancelHandler()
+        raise CancelHandler()
+
+    async def on_process_callback_query(self, callback_query: types.CallbackQuery,
+                                        _) -> None:
+        if callback_query.from_user.id in self.access_ids:
+            return
+        ACCESS_DENIED.inc()
+        raise CancelHandler()
+
+    def should_reply(self, user_id: int) -> bool:
+        """
+        Возвращает True, если пользователю нужно ответить отказом
+        """
+        now = self._get_monotonic_time()
+        denied = self._denied.get(user_id)
+        if denied is not None and now - denied < self.deny_interval:
+            return False
+        self._denied.put(user_id, now)
+        return True
+
+    @staticmethod
+    def _get_monotonic_time() -> float:
+        return time.monotonic()
@@ -0,0 +1,140 @@
+import math
+import time
+from typing import Dict
+
+from aiogram import types
+from aiogram.dispatcher.handler import CancelHandler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+from core.utils.metrics import THROTTLED_UPDATES
+
+
+class TokenBucket:
+    """
+    Бакет токенов одного пользователя. Токены восстанавливаются лениво - при
+    обращении к бакету
+    """
+    __slots__ = ('tokens', 'updated', 'notified')
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+        # Время последнего уведомления пользователя об ограничении
+        self.notified = -math.inf
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Ограничение частоты запросов пользователей (token bucket). Для каждого
+    вида запросов ('commands', 'messages', 'renders') задаётся лимит - сколько
+    запросов пользователь может сделать подряд; лимит полностью
+    восстанавливается за period секунд.
+    Команды и сообщения проверяются при получении, отрисовки - вызовом
+    consume перед отрисовкой (и refund, если отрисовка не была принята в
+    очередь). Запросы сверх лимита отбрасываются, а
+    пользователь получает не больше одного уведомления за period секунд.
+    Бакеты, не использовавшиеся дольше period секунд (т. е. полностью
+    восстановившиеся), удаляются не чаще раза в period секунд
+    """
+    def __init__(self, limits: Dict[str, int], period: float = 60):
+        # Лимит 0 - запросы этого вида не ограничиваются
+        self.limits = {kind: limit for kind, limit in limits.items() if limit > 0}
+        self.period = period
+        self._buckets: Dict[str, Dict[int, TokenBucket]] = {
+            kind: {} for kind in self.limits}
+        self._last_cleanup = self._get_monotonic_time()
+        super().__init__()
+
+    async def on_process_message(self, message: types.Message, _) -> None:
+        kind = 'commands' if message.is_command() else 'messages'
+        user_id = message.from_user.id
+        if self.consume(user_id, kind):
+            return
+        if self.should_notify(user_id, kind):
+            await message.answer(self.get_notice(kind))
+        raise CancelHandler()
+
+    async def on_process_callback_query(self, callback_query: types.CallbackQuery,
+                                        _) -> None:
+        # Нажатия inline-кнопок учитываются как сообщения. Лишние нажатия
+        # отбрасываются без уведомления - кнопки той же панели пользователь
+        # может нажать несколько раз подряд
+        if not self.consume(callback_query.from_user.id, 'messages'):
+            raise CancelHandler()
+
+    def consume(self, user_id: int, kind: str, cost: int = 1) -> bool:
+        """
+        Списывает cost токенов из бакета пользователя. Возвращает False, если
+        токенов не хватает (запрос нужно отбросить). Запрос дороже лимита
+        требует полного бакета
+        """
+        limit = self.limits.get(kind)
+        if limit is None:
+            return True
+
+        now = self._get_monotonic_time()
+        if now - self._last_cleanup >= self.period:
+            self._cleanup(now)
+
+        buckets = self._buckets[kind]
+        bucket = buckets.get(user_id)
+        if bucket is None:
+            bucket = buckets[user_id] = TokenBucket(limit, now)
+        else:
+            bucket.tokens = min(limit, bucket.tokens +
+                                (now - bucket.updated) * limit / self.period)
+            bucket.updated = now
+
+        cost = min(cost, limit)
+        if bucket.tokens < cost:
+            THROTTLED_UPDATES.labels(kind).inc()
+            return False
+        bucket.tokens -= cost
+        return True
+
+    def refund(self, user_id: int, kind: str, cost: int = 1) -> None:
+        """
+        Возвращает токены, списанные consume, если запрос так и не был
+        выполнен (например, отклонён очередью отрисовки)
+        """
+        limit = self.limits.get(kind)
+        bucket = self._buckets.get(kind, {}).get(user_id)
+        if limit is None or bucket is None:
+            return
+        bucket.tokens = min(limit, bucket.tokens + min(cost, limit))
+
+    def should_notify(self, user_id: int, kind: str) -> bool:
+        """
+        Возвращает True, если пользователя нужно уведомить об ограничении -
+        не чаще раза в period секунд для каждого вида запросов
+        """
+        bucket = self._buckets.get(kind, {}).get(user_id)
+        if bucket is None:
+            return False
+        now = self._get_monotonic_time()
+        if now - bucket.notified < self.period:
+            return False
+        bucket.notified = now
+        return True
+
+    def get_notice(self, kind: str) -> str:
+        if kind == 'renders':
+            return ('Вы создаёте слишком много стикеров, попробуйте ещё раз '
+                    'через минуту')
+        return 'Вы отправляете сообщения слишком часто, подождите немного'
+
+    def _cleanup(self, now: float) -> None:
+        """
+        Удаляет полностью восстановившиеся бакеты
+        """
+        self._last_cleanup = now
+        for buckets in self._buckets.values():
+            idle = [user_id for user_id, bucket in buckets.items()
+                    if now - bucket.updated >= self.period and
+                    now - bucket.notified >= self.period]
+            for user_id in idle:
+                del buckets[user_id]
+
+    @staticmethod
+    def _get_monotonic_time() -> float:
+        return time.monotonic()
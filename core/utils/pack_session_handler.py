@@ -0,0 +1,140 @@
+from typing import Optional, Sequence, Union
+
+from emoji import emoji_count
+
+from core.config import PACK_MAX_STICKERS, USER_COMMANDS
+from core.types import (
+    Answer, CloseSession, RenderTask, UserSession, SessionHandler, Transition,
+    NotCorrectPhrases,
+)
+from core.utils.messages import get_message
+from core.utils.session_helpers import (
+    generate_filename, get_date_formatted, get_splitting_text,
+    set_splitting_numbers_helper,
+)
+from core.utils.session_steps import (
+    set_background_color, set_font, set_font_color,
+)
+
+# Максимальное количество фото в одном альбоме Телеграма
+MEDIA_GROUP_SIZE = 10
+
+# Обработчик сессии набора стикеров (команда /create_pack): пользователь
+# присылает список фраз и один стиль для всех стикеров набора
+pack_handler = SessionHandler(
+    steps=(
+        'set_phrases',
+        'set_background_color',
+        'set_font',
+        'set_font_color',
+        'send_pack',
+    )
+)
+# Стиль набора выбирается теми же шагами, что и стиль одного стикера
+pack_handler.register_function(alias='set_background_color')(set_background_color)
+pack_handler.register_function(alias='set_font')(set_font)
+pack_handler.register_function(alias='set_font_color')(set_font_color)
+
+
+@pack_handler.register_function(alias='set_phrases')
+def _set_phrases(user_session: UserSession,
+                 message: Optional[str]) -> Union[Sequence[Answer], Transition]:
+    """
+    Проверяет правильность присланного списка фраз, обновляет фразы в
+    экземпляре пользовательской сессии
+    """
+    alias = _set_phrases.alias
+    if message is None:
+        return (Answer(text=get_message(step=alias,
+                                        max_stickers=PACK_MAX_STICKERS)),)
+    if message in USER_COMMANDS['SERVICE_COMMANDS']:
+        return (Answer(text=get_message(step=alias,
+                                        message_type='unsupported_command')),)
+
+    try:
+        user_session.data_class.phrases = _get_phrases(message)
+    except NotCorrectPhrases as exc:
+        return (Answer(text=str(exc)),)
+    else:
+        return Transition()
+
+
+@pack_handler.register_function(alias='send_pack')
+def _send_pack(user_session: UserSession,
+               message: Optional[str]) -> Sequence[Union[Answer, CloseSession]]:
+    """
+    Создаёт задачи на отрисовку стикеров набора и возвращает их альбомами
+    по MEDIA_GROUP_SIZE стикеров, а затем архивом со всеми стикерами.
+    Отрисовка выполняется в пуле воркеров при отправке ответов - все стикеры
+    отрисовываются параллельно, а альбомы отправляются по мере готовности
+    """
+    alias = _send_pack.alias
+    if message is not None:
+        return (Answer(text=get_message(step=alias,
+                                        message_type='unsupported_command')),)
+
+    render_tasks = _get_render_tasks(user_session)
+    albums = tuple(
+        Answer(content_type='media_group',
+               render_tasks=render_tasks[index:index + MEDIA_GROUP_SIZE])
+        for index in range(0, len(render_tasks), MEDIA_GROUP_SIZE)
+    )
+    return (
+        (Answer(text=get_message(step=alias, count=len(render_tasks))),) +
+        albums +
+        (
+            Answer(content_type='archive',
+                   content_path=_get_archive_name(user_session),
+                   render_tasks=render_tasks),
+            CloseSession(),
+            Answer(text=get_message(step=alias, message_type='end_message')),
+        )
+    )
+
+
+def _get_phrases(text: str) -> Sequence[str]:
+    """
+    Возвращает фразы набора стикеров - непустые строки присланного текста
+    """
+    if emoji_count(text) > 0:
+        raise NotCorrectPhrases('Фразы не могут содержать в себе смайлики, '
+                                'пришлите фразы без смайликов')
+
+    phrases = tuple(' '.join(line.split()) for line in text.splitlines()
+                    if line.strip())
+    if not phrases:
+        raise NotCorrectPhrases('Пришлите хотя бы одну фразу')
+    if len(phrases) > PACK_MAX_STICKERS:
+        raise NotCorrectPhrases(
+            f'В наборе может быть не больше {PACK_MAX_STICKERS} стикеров, '
+            f'вы прислали {len(phrases)} фраз'
+        )
+    return phrases
+
+
+def _get_render_tasks(user_session: UserSession) -> Sequence[RenderTask]:
+    """
+    Возвращает задачи на отрисовку стикеров набора в формате PNG (альбомы
+    Телеграма состоят только из фото). Каждое слово фразы - на отдельной строке
+    """
+    parameters = user_session.data_class
+    return tuple(
+        RenderTask(
+            text=get_splitting_text(phrase,
+                                    set_splitting_numbers_helper(phrase)),
+            file_name=f'{index:02d}.png',
+            font_name=parameters.font_name,
+            font_color=parameters.font_color,
+            background_color=parameters.background_color,
+            image_format='PNG',
+        )
+        for index, phrase in enumerate(parameters.phrases, start=1)
+    )
+
+
+def _get_archive_name(user_session: UserSession) -> str:
+    """
+    Возвращает название архива набора стикеров
+    """
+    return (f'{get_date_formatted(user_session.created)}_'
+            f'{generate_filename()}.zip')
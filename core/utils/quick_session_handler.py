@@ -0,0 +1,309 @@
+import os
+import re
+from typing import Optional, Sequence, Tuple, Union
+
+from core.config import PREVIEW_SIZE, USER_COMMANDS
+from core.fonts import FONTS
+from core.types import (
+    Answer, CloseSession, RenderTask, UserSession, SessionHandler, Transition,
+    NotCorrectFontNumber, NotCorrectRGBCode, NotCorrectSplittingText,
+)
+from core.utils.keyboards import get_inline_keyboard
+from core.utils.messages import get_message
+from core.utils.session_helpers import (
+    get_render_task, get_splitting_numbers, get_splitting_text,
+    get_sticker_content_type, get_str_splitting_numbers, set_color_helper,
+    set_font_helper, set_splitting_numbers_helper,
+)
+from core.utils.session_steps import set_text
+from core.utils.sticker_creator import COLORS_MAP
+
+# Максимальное количество строк в предлагаемых кнопками разбивках текста
+MAX_SPLITTING_LINES = 4
+
+# Данные inline-кнопки: тег сессии, номер шага и значение кнопки (индекс
+# варианта либо кнопка навигации). Например, "k3f1:1:5" - 8 байт при
+# ограничении Телеграма в 64 байта
+_CALLBACK_DATA_PATTERN = re.compile(r'([0-9a-z]+):(\d+):(\d+|[bn])')
+_TAG_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+_NAVIGATION = {
+    'b': 'step_back',
+    'n': 'next_step',
+}
+
+_COLORS = tuple(COLORS_MAP.values())
+_COLOR_BUTTONS = tuple((name, str(index))
+                       for index, name in enumerate(COLORS_MAP))
+_FONT_BUTTONS = tuple(
+    (os.path.splitext(font)[0] if isinstance(font, str) else str(number),
+     str(number))
+    for number, font in FONTS.items())
+
+# Обработчик сессии быстрого создания стикера (команда /quick_sticker):
+# параметры стикера выбираются inline-кнопками под одним сообщением
+# (панелью), которое редактируется после каждого выбора вместо отправки
+# нового сообщения с клавиатурой. Если превью включено (PREVIEW_SIZE), панель
+# - фото с превью стикера, которое обновляется вместе с панелью
+quick_handler = SessionHandler(
+    steps=(
+        'set_text',
+        'choose_background_color',
+        'choose_font',
+        'choose_font_color',
+        'choose_splitting_numbers',
+        'send_quick_sticker',
+    ),
+    inline_keyboard=True,
+)
+
+
+@quick_handler.register_function(alias='set_text')
+def _set_text(user_session: UserSession,
+              message: Optional[str]) -> Union[Sequence[Answer], Transition]:
+    """
+    Шаг ввода текста /create_sticker. Нажатия кнопок старых панелей (например,
+    после /step_back с первой панели) игнорируются, а не становятся текстом
+    стикера
+    """
+    if message is not None and _CALLBACK_DATA_PATTERN.fullmatch(message):
+        return ()
+    return set_text(user_session, message)
+
+
+@quick_handler.register_function(alias='choose_background_color')
+def _choose_background_color(user_session: UserSession,
+                             message: Optional[str]
+                             ) -> Union[Sequence[Answer], Transition]:
+    """
+    Показывает панель выбора цвета фона стикера, обновляет цвет фона в
+    экземпляре пользовательской сессии
+    """
+    alias = _choose_background_color.alias
+    if message is None:
+        # Первая панель - вернуться к вводу текста можно командой /step_back
+        return (_get_panel(user_session, alias, _COLOR_BUTTONS,
+                           step_back=False),)
+
+    kind, value = _parse_message(user_session, message)
+    if kind == 'stale':
+        return ()
+    if kind == 'command':
+        return Transition(value)
+
+    try:
+        user_session.data_class.background_color = _get_color(kind, value)
+    except NotCorrectRGBCode as exc:
+        return (Answer(text=str(exc)),)
+    return Transition()
+
+
+@quick_handler.register_function(alias='choose_font')
+def _choose_font(user_session: UserSession,
+                 message: Optional[str]) -> Union[Sequence[Answer], Transition]:
+    """
+    Показывает панель выбора шрифта, обновляет шрифт в экземпляре
+    пользовательской сессии
+    """
+    alias = _choose_font.alias
+    if message is None:
+        return (_get_panel(user_session, alias, _FONT_BUTTONS, row_width=2),)
+
+    kind, value = _parse_message(user_session, message)
+    if kind == 'stale':
+        return ()
+    if kind == 'command':
+        return Transition(value)
+
+    try:
+        set_font_helper(value, user_session)
+    except NotCorrectFontNumber as exc:
+        return (Answer(text=str(exc)),)
+    return Transition()
+
+
+@quick_handler.register_function(alias='choose_font_color')
+def _choose_font_color(user_session: UserSession,
+                       message: Optional[str]) -> Union[Sequence[Answer], Transition]:
+    """
+    Показывает панель выбора цвета шрифта, обновляет цвет шрифта в
+    экземпляре пользовательской сессии
+    """
+    alias = _choose_font_color.alias
+    if message is None:
+        return (_get_panel(user_session, alias, _COLOR_BUTTONS),)
+
+    kind, value = _parse_message(user_session, message)
+    if kind == 'stale':
+        return ()
+    if kind == 'command':
+        return Transition(value)
+
+    try:
+        user_session.data_class.font_color = _get_color(kind, value)
+    except NotCorrectRGBCode as exc:
+        return (Answer(text=str(exc)),)
+    return Transition()
+
+
+@quick_handler.register_function(alias='choose_splitting_numbers')
+def _choose_splitting_numbers(user_session: UserSession,
+                              message: Optional[str]
+                              ) -> Union[Sequence[Answer], Transition]:
+    """
+    Показывает панель выбора разбивки текста по строкам, обновляет разбивку
+    в экземпляре пользовательской сессии. Текст из одного слова не
+    разбивается - шаг пропускается
+    """
+    alias = _choose_splitting_numbers.alias
+    data_class = user_session.data_class
+    if data_class.splitting_numbers is None:
+        data_class.splitting_numbers = set_splitting_numbers_helper(
+            data_class.text)
+    presets = _get_splitting_presets(len(data_class.splitting_numbers))
+
+    if message is None:
+        if len(data_class.splitting_numbers) == 1:
+            return Transition()
+        buttons = tuple((get_str_splitting_numbers(preset), str(index))
+                        for index, preset in enumerate(presets))
+        return (_get_panel(user_session, alias, buttons, row_width=1),)
+
+    kind, value = _parse_message(user_session, message)
+    if kind == 'stale':
+        return ()
+    if kind == 'command':
+        return Transition(value)
+
+    try:
+        if kind == 'button':
+            splitting_numbers = presets[int(value)]
+        else:
+            splitting_numbers = get_splitting_numbers(
+                value, data_class.splitting_numbers)
+    except IndexError:
+        return ()
+    except NotCorrectSplittingText as exc:
+        return (Answer(text=str(exc)),)
+    data_class.splitting_numbers = splitting_numbers
+    return Transition()
+
+
+@quick_handler.register_function(alias='send_quick_sticker')
+def _send_quick_sticker(user_session: UserSession,
+                        message: Optional[str]
+                        ) -> Sequence[Union[Answer, CloseSession]]:
+    """
+    Убирает кнопки с панели (превью на ней показывает итоговый стикер),
+    создаёт задачу на отрисовку стикера и закрывает сессию. Сама отрисовка
+    выполняется в пуле воркеров при отправке ответа
+    """
+    alias = _send_quick_sticker.alias
+    render_task = get_render_task(user_session)
+    return (
+        Answer(content_type='panel', keyboard=None,
+               text=get_message(step=alias, message_type='end_message'),
+               render_task=_get_preview_task(user_session)),
+        Answer(content_type=get_sticker_content_type(render_task),
+               render_task=render_task),
+        CloseSession(),
+    )
+
+
+def _get_panel(user_session: UserSession, alias: str,
+               buttons: Sequence[Tuple[str, str]], row_width: int = 3,
+               step_back: bool = True) -> Answer:
+    """
+    Возвращает панель шага - сообщение (либо фото с превью стикера) с
+    кнопками вариантов и кнопками навигации. Данные кнопок привязаны к сессии
+    и шагу, поэтому нажатия кнопок старых панелей игнорируются
+    """
+    prefix = f'{_get_session_tag(user_session)}:{user_session.current_step}:'
+    keyboard = get_inline_keyboard(
+        [(text, prefix + value) for text, value in buttons], row_width=row_width)
+    navigation = get_inline_keyboard(
+        [('« Назад', prefix + 'b')] * step_back + [('Далее »', prefix + 'n')],
+        row_width=2)
+    keyboard.inline_keyboard.extend(navigation.inline_keyboard)
+    return Answer(content_type='panel', keyboard=keyboard,
+                  text=get_message(step=alias),
+                  render_task=_get_preview_task(user_session))
+
+
+def _get_preview_task(user_session: UserSession) -> Optional[RenderTask]:
+    """
+    Возвращает задачу на отрисовку превью стикера с текущими параметрами
+    сессии либо None, если превью отключено. До выбора разбивки текста
+    используется разбивка по умолчанию
+    """
+    if not PREVIEW_SIZE:
+        return None
+    data_class = user_session.data_class
+    splitting_numbers = (data_class.splitting_numbers or
+                         set_splitting_numbers_helper(data_class.text))
+    return RenderTask(
+        text=get_splitting_text(data_class.text, splitting_numbers),
+        file_name='preview.png',
+        font_name=data_class.font_name,
+        font_color=data_class.font_color,
+        background_color=data_class.background_color,
+        image_format='PNG',
+        preview_size=PREVIEW_SIZE,
+    )
+
+
+def _parse_message(user_session: UserSession, message: str) -> Tuple[str, str]:
+    """
+    Разбирает сообщение для шага с панелью. Возвращает вид сообщения и его
+    значение: 'command' - сервисная команда либо кнопка навигации,
+    'button' - значение нажатой кнопки панели, 'stale' - кнопка старой панели,
+    'text' - присланный пользователем текст
+    """
+    if message in USER_COMMANDS['SERVICE_COMMANDS']:
+        return 'command', message
+
+    match = _CALLBACK_DATA_PATTERN.fullmatch(message)
+    if match is None:
+        return 'text', message
+    tag, step, value = match.groups()
+    if (tag != _get_session_tag(user_session) or
+            int(step) != user_session.current_step):
+        return 'stale', value
+    if value in _NAVIGATION:
+        return 'command', _NAVIGATION[value]
+    return 'button', value
+
+
+def _get_color(kind: str, value: str) -> Sequence[int]:
+    """
+    Возвращает RGB-код выбранного кнопкой либо присланного цвета
+    """
+    if kind == 'button':
+        index = int(value)
+        if index < len(_COLORS):
+            return _COLORS[index]
+    return set_color_helper(value)
+
+
+def _get_session_tag(user_session: UserSession) -> str:
+    """
+    Возвращает короткий тег сессии для данных inline-кнопок
+    """
+    number = user_session.created.microsecond
+    tag = ''
+    while True:
+        number, digit = divmod(number, 36)
+        tag = _TAG_DIGITS[digit] + tag
+        if not number:
+            return tag
+
+
+def _get_splitting_presets(words_count: int) -> Sequence[Tuple[int, ...]]:
+    """
+    Возвращает варианты разбивки текста по строкам: по слову на строку и
+    равномерные разбивки на 1..MAX_SPLITTING_LINES строк
+    """
+    presets = {(1,) * words_count: None}
+    for lines in range(1, min(words_count, MAX_SPLITTING_LINES + 1)):
+        words, extra = divmod(words_count, lines)
+        presets[tuple(words + (index < extra) for index in range(lines))] = None
+    return tuple(presets)
@@ -0,0 +1,196 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from core.types import RenderTask
+from core.utils.cache import LRUCache
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_render_key(task: RenderTask) -> str:
+    """
+    Возвращает хеш нормализованных параметров стикера, по которому
+    отрисованное изображение хранится в кэше
+    """
+    parameters = (
+        [' '.join(line.split()) for line in task.text],
+        task.font_name,
+        [int(i) for i in task.font_color],
+        [int(i) for i in task.background_color],
+        task.picture_width,
+        task.picture_height,
+        task.image_format.upper(),
+    )
+    if task.preview_size:
+        # Ключи стикеров не меняются, чтобы не терять кэш на диске
+        parameters += (task.preview_size,)
+    data = json.dumps(parameters, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class DiskCache:
+    """
+    Кэш на диске с ограничением по суммарному размеру файлов.
+    При превышении бюджета удаляются давно не использованные файлы
+    """
+    def __init__(self, directory: str, max_size: int):
+        self.directory = directory
+        self.max_size = max_size
+        self._sizes: 'OrderedDict[str, int]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load_index()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._sizes
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key not in self._sizes:
+                self.misses += 1
+                return None
+        try:
+            with open(self._get_path(key), mode='rb') as file:
+                content = file.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+                self._pop(key)
+            return None
+
+        with self._lock:
+            self.hits += 1
+            if key in self._sizes:
+                self._sizes.move_to_end(key)
+        return content
+
+    def put(self, key: str, content: bytes) -> None:
+        if len(content) > self.max_size:
+            return
+
+        # У каждой записи свой временный файл, чтобы одновременная запись
+        # одного и того же стикера не портила файл в кэше
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, mode='wb') as file:
+                file.write(content)
+            os.replace(tmp_path, self._get_path(key))
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._pop(key)
+            self._sizes[key] = len(content)
+            self.size += len(content)
+            while self.size > self.max_size:
+                evicted = next(iter(self._sizes))
+                self._pop(evicted)
+                self.evictions += 1
+                try:
+                    os.remove(self._get_path(evicted))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> Dict[str, float]:
+        requests = self.hits + self.misses
+        return {
+            'items': len(self._sizes),
+            'size': self.size,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / requests if requests else 0.0,
+        }
+
+    def _load_index(self) -> None:
+        """
+        Индексирует файлы, оставшиеся в директории кэша после перезапуска,
+        от давно использованных к недавно использованным
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        with os.scandir(self.directory) as files:
+            for entry in files:
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+            self.size += size
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _pop(self, key: str) -> None:
+        self.size -= self._sizes.pop(key, 0)
+
+
+class RenderCache:
+    """
+    Кэш отрисованных стикеров с адресацией по параметрам стикера.
+    Состоит из LRU-кэша в памяти и необязательного кэша на диске, у каждого
+    уровня свой бюджет в байтах
+    """
+    def __init__(self, max_memory_size: int,
+                 disk_directory: Optional[str] = None,
+                 max_disk_size: int = 0):
+        self.memory = LRUCache(max_memory_size)
+        self.disk = None
+        if disk_directory and max_disk_size > 0:
+            self.disk = DiskCache(disk_directory, max_disk_size)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Ищет изображение только в памяти, не выполняет операций с диском
+        """
+        return self.memory.get(key)
+
+    def get_from_disk(self, key: str) -> Optional[bytes]:
+        """
+        Ищет изображение на диске и при нахождении переносит его в память
+        """
+        if self.disk is None:
+            return None
+        content = self.disk.get(key)
+        if content is not None:
+            self.memory.put(key, content)
+        return content
+
+    def put(self, key: str, content: bytes) -> None:
+        self.memory.put(key, content)
+
+    def put_to_disk(self, key: str, content: bytes) -> None:
+        """
+        Сохраняет изображение на диск. Ошибка записи не прерывает работу -
+        стикер остаётся в кэше в памяти
+        """
+        if self.disk is None:
+            return
+        try:
+            self.disk.put(key, content)
+        except OSError:
+            logger.exception(f'Не удалось сохранить стикер {key} в кэш на диске')
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        stats = {'memory': self.memory.stats()}
+        if self.disk is not None:
+            stats['disk'] = self.disk.stats()
+        return stats
@@ -0,0 +1,193 @@
+import asyncio
+import contextlib
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, Set, Tuple
+
+from core.fonts import FONTS
+from core.types import RenderTask, RenderTimeout
+from core.utils.font_cache import font_cache
+from core.utils.font_metrics import font_metrics_registry
+from core.utils.metrics import (
+    ENCODE_DURATION, RENDER_ABANDONED_TASKS, RENDER_DURATION, STICKER_BYTES,
+)
+from core.utils.render_cache import RenderCache, get_render_key
+from core.utils.sticker_creator import (
+    create_preview, create_sticker, encode_sticker,
+)
+
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_TYPES = {
+    'thread': ThreadPoolExecutor,
+    'process': ProcessPoolExecutor,
+}
+
+
+class RenderPool:
+    """
+    Пул воркеров (потоков либо процессов), в котором выполняется отрисовка и
+    кодирование стикеров, чтобы не блокировать event loop бота.
+    Пул прогревает кэш шрифтов воркеров при запуске, пересоздаётся после
+    заданного количества задач и прерывает ожидание долгой отрисовки.
+    Если передан кэш - повторная отрисовка одинаковых стикеров не выполняется
+    """
+    def __init__(self, *, executor_type: str = 'thread', max_workers: int = 1,
+                 timeout: Optional[float] = None,
+                 max_tasks_per_worker: int = 0,
+                 cache: Optional[RenderCache] = None):
+        if executor_type not in EXECUTOR_TYPES:
+            raise ValueError(f'Неизвестный тип пула воркеров {executor_type}, '
+                             f'допустимые значения - {tuple(EXECUTOR_TYPES)}')
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.cache = cache
+        self._executor: Optional[Executor] = None
+        self._tasks_count = 0
+        self.abandoned_tasks = 0
+        self._disk_writes: Set[asyncio.Future] = set()
+
+    def start(self) -> None:
+        """
+        Создаёт пул воркеров и запускает прогрев кэша шрифтов в каждом из них
+        """
+        if self._executor is None:
+            self._executor = EXECUTOR_TYPES[self.executor_type](
+                max_workers=self.max_workers)
+            self._tasks_count = 0
+            self._warm_up()
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def recycle(self) -> None:
+        """
+        Пересоздаёт пул воркеров. Уже запущенные задачи старого пула
+        завершатся в фоне
+        """
+        self.shutdown(wait=False)
+        self.start()
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        """
+        Выполняет функцию в пуле воркеров и возвращает её результат.
+        Если результат не получен за timeout секунд - возвращает RenderTimeout
+        """
+        self.start()
+        future = self._executor.submit(func, *args)
+        self._tasks_count += 1
+        if (self.max_tasks_per_worker and
+                self._tasks_count >= self.max_tasks_per_worker * self.max_workers):
+            self.recycle()
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future),
+                                          timeout=self.timeout)
+        except asyncio.TimeoutError:
+            # Зависший воркер нельзя прервать, поэтому новые задачи
+            # отправляются в новый пул. Воркер старого пула продолжает
+            # работать, пока задача не завершится
+            self.abandoned_tasks += 1
+            RENDER_ABANDONED_TASKS.inc()
+            logger.warning(f'Отрисовка не завершилась за {self.timeout} с, '
+                           f'пул воркеров пересоздан, зависших задач - '
+                           f'{self.abandoned_tasks}')
+            self.recycle()
+            raise RenderTimeout(f'Отрисовка не завершилась за {self.timeout} с')
+
+    async def render(self, task: RenderTask) -> None:
+        """
+        Отрисовывает стикер по переданной задаче и сохраняет закодированное
+        изображение в задаче. Если стикер с такими параметрами уже есть в
+        кэше - берёт изображение из кэша
+        """
+        if self.cache is None:
+            await self._render(task)
+            return
+
+        loop = asyncio.get_running_loop()
+        key = get_render_key(task)
+        content = self.cache.get(key)
+        if content is None and self.cache.disk is not None:
+            content = await loop.run_in_executor(None, self.cache.get_from_disk,
+                                                 key)
+        if content is not None:
+            task.content = content
+            return
+
+        await self._render(task)
+        self.cache.put(key, task.content)
+        if self.cache.disk is not None:
+            # Запись на диск не задерживает ответ пользователю, но ссылка
+            # на неё сохраняется, чтобы ошибка не потерялась
+            future = loop.run_in_executor(None, self.cache.put_to_disk, key,
+                                          task.content)
+            self._disk_writes.add(future)
+            future.add_done_callback(self._on_disk_write_done)
+
+    async def _render(self, task: RenderTask) -> None:
+        task.content, task.render_time, task.encode_time = await self.run(
+            render_sticker, task)
+        RENDER_DURATION.labels(task.image_format).observe(task.render_time)
+        ENCODE_DURATION.labels(task.image_format).observe(task.encode_time)
+        if not task.preview_size:
+            STICKER_BYTES.labels(task.image_format).observe(len(task.content))
+        logger.debug(f'Стикер отрисован за {task.render_time:.3f} с, '
+                     f'закодирован в {task.image_format} за '
+                     f'{task.encode_time:.3f} с, размер - {len(task.content)} Б')
+
+    def _on_disk_write_done(self, future: asyncio.Future) -> None:
+        self._disk_writes.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            logger.error('Не удалось сохранить стикер в кэш на диске',
+                         exc_info=future.exception())
+
+    def _warm_up(self) -> None:
+        for _ in range(self.max_workers):
+            self._executor.submit(warm_up_worker)
+
+
+def render_sticker(task: RenderTask) -> Tuple[bytes, float, float]:
+    """
+    Отрисовывает стикер (либо его превью) и возвращает закодированное
+    изображение, время отрисовки и время кодирования изображения.
+    Выполняется в воркере
+    """
+    started = time.perf_counter()
+    parameters = dict(
+        text=task.text,
+        background_color=task.background_color,
+        font_name=task.font_name,
+        font_color=task.font_color,
+        picture_width=task.picture_width,
+        picture_height=task.picture_height,
+    )
+    if task.preview_size:
+        # Превью кодируется в PNG с палитрой - оно в несколько раз меньше
+        # полноцветного и не требует перевода в RGBA
+        sticker = create_preview(preview_size=task.preview_size, mode='P',
+                                 **parameters)
+    else:
+        sticker = create_sticker(**parameters)
+    rendered = time.perf_counter()
+    content = encode_sticker(sticker, task.image_format)
+
+    return content, rendered - started, time.perf_counter() - rendered
+
+
+def warm_up_worker() -> None:
+    """
+    Загружает файлы шрифтов в кэш воркера и строит (либо загружает) таблицы
+    метрик шрифтов
+    """
+    for font_name in FONTS.values():
+        if isinstance(font_name, str):
+            with contextlib.suppress(OSError):
+                font_cache.get_font_bytes(font_name)
+                font_metrics_registry.get(font_name)
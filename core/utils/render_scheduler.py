@@ -0,0 +1,155 @@
+import asyncio
+import collections
+import functools
+import time
+from typing import Deque, List, Optional, Sequence
+
+from core.types import RenderQueueFull, RenderTask
+from core.utils.metrics import RENDER_QUEUE_REJECTED, RENDER_QUEUE_WAIT
+from core.utils.render_pool import RenderPool
+from core.utils.tracing import span
+
+
+class RenderScheduler:
+    """
+    Очередь отрисовки между обработчиками ответов и пулом воркеров.
+    Одновременно выполняется не больше max_concurrent отрисовок, остальные
+    стикеры ждут в очереди. Очередь обслуживает чаты по кругу - по одному
+    стикеру из каждого ожидающего чата, поэтому пользователь с большим
+    набором стикеров не задерживает остальных. Если в очереди нет места -
+    стикеры не принимаются (RenderQueueFull)
+    """
+    def __init__(self, render_pool: RenderPool, max_concurrent: int = 1,
+                 max_queue_size: int = 100):
+        self.render_pool = render_pool
+        self.max_concurrent = max(max_concurrent, 1)
+        self.max_queue_size = max_queue_size
+        self._active = 0
+        self._queue_size = 0
+        # Ожидающие отрисовки по чатам, порядок чатов - порядок обслуживания
+        self._waiters: 'collections.OrderedDict[int, Deque[asyncio.Future]]' = \
+            collections.OrderedDict()
+
+    @property
+    def active(self) -> int:
+        """
+        Количество выполняющихся отрисовок
+        """
+        return self._active
+
+    @property
+    def queue_size(self) -> int:
+        """
+        Количество стикеров, ожидающих отрисовки
+        """
+        return self._queue_size
+
+    def submit(self, chat_id: int,
+               tasks: Sequence[RenderTask]) -> List[asyncio.Future]:
+        """
+        Ставит задачи в очередь отрисовки и возвращает future отрисовки для
+        каждой задачи. Задачи принимаются либо все, либо ни одной - если в
+        очереди не хватает места, возвращает RenderQueueFull
+        """
+        waiting = max(len(tasks) - self._get_free_slots(), 0)
+        if self._queue_size + waiting > self.max_queue_size:
+            RENDER_QUEUE_REJECTED.inc(len(tasks))
+            raise RenderQueueFull(f'В очереди отрисовки {self._queue_size} '
+                                  f'стикеров из {self.max_queue_size}')
+
+        loop = asyncio.get_event_loop()
+        futures = []
+        for task in tasks:
+            waiter = None
+            if self._get_free_slots():
+                self._active += 1
+            else:
+                waiter = loop.create_future()
+                self._waiters.setdefault(chat_id, collections.deque()).append(waiter)
+                self._queue_size += 1
+            future = asyncio.ensure_future(self._run(task, waiter))
+            future.add_done_callback(functools.partial(self._on_done, chat_id,
+                                                       waiter))
+            futures.append(future)
+        return futures
+
+    async def render(self, chat_id: int, task: RenderTask) -> None:
+        """
+        Отрисовывает стикер, дождавшись своей очереди
+        """
+        await self.submit(chat_id, (task,))[0]
+
+    def get_position(self, chat_id: int) -> int:
+        """
+        Возвращает номер в очереди, под которым будет отрисован следующий
+        стикер чата (0 - у чата нет стикеров в очереди)
+        """
+        for position, waiting_chat_id in enumerate(self._waiters, start=1):
+            if waiting_chat_id == chat_id:
+                return position
+        return 0
+
+    async def _run(self, task: RenderTask,
+                   waiter: Optional[asyncio.Future]) -> None:
+        enqueued = time.monotonic()
+        if waiter is not None:
+            with span('render_queue'):
+                await waiter
+        RENDER_QUEUE_WAIT.observe(time.monotonic() - enqueued)
+        with span('render', file_name=task.file_name,
+                  image_format=task.image_format) as record:
+            await self.render_pool.render(task)
+            if record is not None:
+                # Отрисовка и кодирование выполняются в воркере, их время
+                # возвращается вместе с изображением (None - взято из кэша)
+                record['cached'] = task.render_time is None
+                if task.render_time is not None:
+                    record['create_sticker_ms'] = round(task.render_time * 1000, 3)
+                    record['encode_ms'] = round(task.encode_time * 1000, 3)
+
+    def _on_done(self, chat_id: int, waiter: Optional[asyncio.Future],
+                 _: asyncio.Future) -> None:
+        """
+        Освобождает место после отрисовки. Если отрисовка отменена до
+        получения места - убирает стикер из очереди
+        """
+        if waiter is None or (waiter.done() and not waiter.cancelled()):
+            self._release()
+        else:
+            waiter.cancel()
+            self._remove_waiter(chat_id, waiter)
+
+    def _get_free_slots(self) -> int:
+        # Пока в очереди есть стикеры, новые стикеры встают в очередь, даже
+        # если место освободилось, но ещё не передано следующему в очереди
+        if self._queue_size:
+            return 0
+        return self.max_concurrent - self._active
+
+    def _release(self) -> None:
+        """
+        Освобождает место и передаёт его первому ожидающему стикеру
+        следующего по кругу чата
+        """
+        self._active -= 1
+        while self._waiters:
+            chat_id, waiters = next(iter(self._waiters.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                self._waiters.move_to_end(chat_id)
+            else:
+                del self._waiters[chat_id]
+            self._queue_size -= 1
+            if not waiter.done():
+                self._active += 1
+                waiter.set_result(None)
+                return
+
+    def _remove_waiter(self, chat_id: int, waiter: asyncio.Future) -> None:
+        waiters = self._waiters.get(chat_id)
+        if waiters is None or waiter not in waiters:
+            return
+        waiters.remove(waiter)
+        self._queue_size -= 1
+        if not waiters:
+            del self._waiters[chat_id]
@@ -0,0 +1,171 @@
+import datetime
+import re
+import uuid
+from typing import Sequence
+
+from core.fonts import FONTS, MAX_FONT_NUMBER, MIN_FONT_NUMBER
+from core.types import (
+    RenderTask, UserSession,
+    NotCorrectFontNumber, NotCorrectRGBCode, NotCorrectSplittingText,
+)
+from core.utils.sticker_creator import COLORS_MAP
+
+
+# Функции разбора параметров стикера, задач на отрисовку и имён файлов, общие
+# для обработчиков сессий и пакетной отрисовки стикеров
+
+
+def set_color_helper(code: str) -> Sequence[int]:
+    """
+    Возвращает RGB-код
+    """
+    if code.capitalize() in COLORS_MAP:
+        return COLORS_MAP[code]
+
+    pattern = r'\d+'
+    rgb_code = tuple([int(i) for i in re.findall(pattern, code)])
+
+    if _is_valid_rgb_code(rgb_code):
+        return rgb_code
+
+    raise NotCorrectRGBCode(
+        'Вы прислали недопустимый RGB-код.\n'
+        'Корректный RGB-код должен состоять из 3-х целых чисел, '
+        'каждое число д. б. в диапазоне от 0 до 255'
+    )
+
+
+def _is_valid_rgb_code(rgb_code: Sequence[int]) -> bool:
+    """
+    Проверяет валидность RGB-кода
+    """
+    if len(rgb_code) != 3:
+        return False
+
+    for i in rgb_code:
+        if i < 0 or i > 255:
+            return False
+
+    return True
+
+
+def set_splitting_numbers_helper(text: str) -> Sequence[int]:
+    """
+    Возвращает дефолтную разбивку текста по строкам
+    """
+    words_count = len(text.split())
+
+    return tuple([1 for _ in range(words_count)])
+
+
+def get_splitting_numbers(text: str,
+                          default_splitting: Sequence[int]) -> Sequence[int]:
+    """
+    Проверяет корректность присланной разбивки текста
+    """
+    pattern = r'\d+'
+    user_splitting_text = tuple([int(i) for i in re.findall(pattern, text)])
+
+    flag = (sum(default_splitting) == sum(user_splitting_text))
+
+    for i in user_splitting_text:
+        if not flag:
+            break
+        flag = flag and i > 0
+
+    if flag:
+        return user_splitting_text
+
+    raise NotCorrectSplittingText(
+        'Сумма чисел в присланной разбивке не равна количеству слов в вашем '
+        'тексте для стикера либо разбивка содержит недопустимые числа.\n'
+        'Примеры валидной разбивки текста:\n'
+        '"Текст из 2 строк" - "2, 2"\n'
+        '"Текст из 3 строк" - "1, 2, 1"\n'
+        '"Текст из 4 строк" - "1, 1, 1, 1"'
+    )
+
+
+def get_str_splitting_numbers(numbers: Sequence[int]) -> str:
+    str_splitting_numbers = re.sub(r'[()]', '', str(numbers))
+
+    return str_splitting_numbers
+
+
+def get_splitting_text(text: str,
+                       split_pattern: Sequence[int]) -> Sequence[str]:
+    """
+    Разбивает текст по шаблону
+    """
+    split_text = text.split()
+    words = []
+    index = 0
+
+    for i in split_pattern:
+        temp = []
+        for _ in range(i):
+            temp.append(split_text[index])
+            index += 1
+        words.append(' '.join(temp))
+
+    return tuple(words)
+
+
+def generate_filename() -> str:
+    """
+    Генерирует уникальную строку для названия файла
+    """
+    return str(uuid.uuid4())
+
+
+def get_date_formatted(_datetime: datetime.datetime) -> str:
+    """
+    Возвращает дату строкой
+    """
+    return _datetime.strftime('%Y-%m-%d')
+
+
+def get_render_task(user_session: UserSession) -> RenderTask:
+    """
+    Возвращает задачу на отрисовку стикера с параметрами из сессии
+    """
+    image_format = user_session.data_class.image_format
+    return RenderTask(
+        text=get_splitting_text(user_session.data_class.text,
+                                user_session.data_class.splitting_numbers),
+        file_name=get_file_name(user_session.created, image_format),
+        background_color=user_session.data_class.background_color,
+        font_name=user_session.data_class.font_name,
+        font_color=user_session.data_class.font_color,
+        image_format=image_format,
+    )
+
+
+def get_sticker_content_type(render_task: RenderTask) -> str:
+    """
+    Стикеры в формате PNG отправляются как фото, остальные - как стикеры
+    """
+    return 'photo' if render_task.image_format == 'PNG' else 'sticker'
+
+
+def set_font_helper(font_number: str, user_session: UserSession) -> None:
+    """
+    Проверяет номер присланного шрифта
+    """
+    try:
+        index = int(font_number)
+        user_session.data_class.font_name = FONTS[index]
+    except (ValueError, KeyError):
+        raise NotCorrectFontNumber(
+            f'Вы прислали неверный номер шрифта. Корректный номер д. б. целым '
+            f'числом в диапазоне от {MIN_FONT_NUMBER} до {MAX_FONT_NUMBER}'
+        )
+    else:
+        return
+
+
+def get_file_name(_datetime: datetime.datetime, image_format: str) -> str:
+    """
+    Возвращает название файла стикера
+    """
+    return f'{get_date_formatted(_datetime)}_{generate_filename()}.{image_format.lower()}'
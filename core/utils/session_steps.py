@@ -0,0 +1,109 @@
+import os
+from typing import Optional, Sequence, Union
+
+from emoji import emoji_count
+
+from core.config import USER_COMMANDS
+from core.fonts import EXAMPLE_FONTS_PATH
+from core.types import (
+    Answer, UserSession, Transition, NotCorrectFontNumber, NotCorrectRGBCode,
+)
+from core.utils.keyboards import kb_colors, kb_fonts_numbers
+from core.utils.messages import get_message
+from core.utils.session_helpers import set_color_helper, set_font_helper
+
+# Функции-обработчики шагов ввода текста и стиля стикера, общие для
+# обработчиков сессий. Каждый обработчик регистрирует их под псевдонимами,
+# совпадающими с именами функций
+
+# Пример шрифтов может быть файлом на диске (будет загружен в Телеграм один раз,
+# далее отправляется по file_id) либо file_id/URL файла на сервере Телеграма
+_EXAMPLE_FONTS_LOCATION = ('local' if isinstance(EXAMPLE_FONTS_PATH, str) and
+                           os.path.isfile(EXAMPLE_FONTS_PATH)
+                           else 'telegram_server')
+
+
+def set_text(user_session: UserSession,
+             message: Optional[str]) -> Union[Sequence[Answer], Transition]:
+    """
+    Проверяет правильность присланного текста для стикера, обновляет текст в
+    экземпляре пользовательской сессии
+    """
+    alias = set_text.alias
+    if message is None:
+        return (Answer(text=get_message(step=alias)),)
+    if message in USER_COMMANDS['SERVICE_COMMANDS']:
+        return (Answer(text=get_message(step=alias,
+                                        message_type='unsupported_command')),)
+    if emoji_count(message) > 0:
+        return (Answer(text='Текст стикера не может содержать в себе смайлики, '
+                            'пришлите текст без смайликов'),)
+
+    user_session.data_class.text = message
+    return Transition()
+
+
+def set_background_color(user_session: UserSession,
+                         message: Optional[str]) -> Union[Sequence[Answer], Transition]:
+    """
+    Проверяет правильность присланного RGB-кода цвета для заливки фона стикера,
+    обновляет RGB-код цвета в экземпляре пользовательской сессии
+    """
+    alias = set_background_color.alias
+    if message is None:
+        return (Answer(text=get_message(step=alias),
+                       keyboard=kb_colors),)
+    if message in USER_COMMANDS['SERVICE_COMMANDS']:
+        return Transition(message)
+
+    try:
+        user_session.data_class.background_color = set_color_helper(message)
+    except NotCorrectRGBCode as exc:
+        return (Answer(text=str(exc), keyboard=kb_colors),)
+    else:
+        return Transition()
+
+
+def set_font(user_session: UserSession,
+             message: Optional[str]) -> Union[Sequence[Answer], Transition]:
+    """
+    Проверяет правильность присланного номера шрифта, обновляет шрифт в
+    экземпляре пользовательской сессии
+    """
+    alias = set_font.alias
+    if message is None:
+        return (Answer(content_type='photo',
+                       content_path=EXAMPLE_FONTS_PATH,
+                       content_location=_EXAMPLE_FONTS_LOCATION,
+                       text=get_message(step=alias),
+                       keyboard=kb_fonts_numbers),)
+    if message in USER_COMMANDS['SERVICE_COMMANDS']:
+        return Transition(message)
+
+    try:
+        set_font_helper(message, user_session)
+    except NotCorrectFontNumber as exc:
+        return (Answer(text=str(exc)),)
+    else:
+        return Transition()
+
+
+def set_font_color(user_session: UserSession,
+                   message: Optional[str]) -> Union[Sequence[Answer], Transition]:
+    """
+    Проверяет правильность присланного RGB-кода цвета для шрифта, обновляет
+    RGB-код цвета в экземпляре пользовательской сессии
+    """
+    alias = set_font_color.alias
+    if message is None:
+        return (Answer(text=get_message(step=alias),
+                       keyboard=kb_colors),)
+    if message in USER_COMMANDS['SERVICE_COMMANDS']:
+        return Transition(message)
+
+    try:
+        user_session.data_class.font_color = set_color_helper(message)
+    except NotCorrectRGBCode as exc:
+        return (Answer(text=str(exc), keyboard=kb_colors),)
+    else:
+        return Transition()
@@ -0,0 +1,325 @@
+import abc
+import datetime
+import json
+import sqlite3
+import time
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from core.types import RenderTask, StickerParameters, UserSession
+
+
+class SessionStore(abc.ABC):
+    """
+    Хранилище пользовательских сессий с ключом chat_id.
+    Для уже загруженной сессии хранилище всегда возвращает один и тот же
+    объект, изменения сессии сохраняются вызовом save
+    """
+    @abc.abstractmethod
+    def get(self, chat_id: int) -> Optional[UserSession]:
+        pass
+
+    @abc.abstractmethod
+    def save(self, chat_id: int, user_session: UserSession) -> None:
+        pass
+
+    @abc.abstractmethod
+    def delete(self, chat_id: int) -> None:
+        pass
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @abc.abstractmethod
+    def __iter__(self) -> Iterator[int]:
+        pass
+
+    def purge(self, older_than: float) -> int:
+        """
+        Удаляет сессии, которые не сохранялись с момента older_than
+        (unix time). Возвращает количество удалённых сессий
+        """
+        return 0
+
+    def get_update_times(self) -> Dict[int, float]:
+        """
+        Возвращает время последнего сохранения (unix time) каждой сессии:
+        chat_id -> время. Хранилище, которое не переживает перезапуск бота,
+        возвращает пустой словарь
+        """
+        return {}
+
+    def flush(self) -> None:
+        """
+        Записывает отложенные изменения
+        """
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+    def __contains__(self, chat_id: int) -> bool:
+        return self.get(chat_id) is not None
+
+    def __getitem__(self, chat_id: int) -> UserSession:
+        user_session = self.get(chat_id)
+        if user_session is None:
+            raise KeyError(chat_id)
+        return user_session
+
+    def __setitem__(self, chat_id: int, user_session: UserSession) -> None:
+        self.save(chat_id, user_session)
+
+    def pop(self, chat_id: int, default: Optional[UserSession] = None) -> Optional[UserSession]:
+        user_session = self.get(chat_id)
+        if user_session is None:
+            return default
+        self.delete(chat_id)
+        return user_session
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Хранилище сессий в памяти процесса
+    """
+    def __init__(self):
+        self._sessions: Dict[int, UserSession] = {}
+
+    def get(self, chat_id: int) -> Optional[UserSession]:
+        return self._sessions.get(chat_id)
+
+    def save(self, chat_id: int, user_session: UserSession) -> None:
+        self._sessions[chat_id] = user_session
+
+    def delete(self, chat_id: int) -> None:
+        self._sessions.pop(chat_id, None)
+
+    def clear(self) -> None:
+        self._sessions.clear()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(tuple(self._sessions))
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self._sessions
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Хранилище сессий в SQLite (в режиме WAL), переживающее перезапуск бота.
+    База принадлежит одному процессу: хранилище держит эксклюзивную
+    блокировку, и второй процесс с той же базой не запустится. Поэтому
+    загруженные сессии и список chat_id хранятся в памяти - проверка наличия
+    сессии и количество сессий не обращаются к базе. Изменения записываются в
+    базу пачками - при накоплении batch_size изменений, не реже чем раз в
+    flush_interval секунд (при очередной операции) и при вызове flush
+    """
+    def __init__(self, path: str, batch_size: int = 100,
+                 flush_interval: float = 1.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._connection = sqlite3.connect(path, isolation_level=None)
+        self._connection.execute('PRAGMA locking_mode=EXCLUSIVE')
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        try:
+            # В режиме EXCLUSIVE блокировка не снимается после транзакции
+            self._connection.execute('BEGIN EXCLUSIVE')
+            self._connection.execute('COMMIT')
+        except sqlite3.OperationalError as error:
+            self._connection.close()
+            raise sqlite3.OperationalError(
+                f'База сессий {path} используется другим процессом') from error
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            'chat_id INTEGER PRIMARY KEY, data BLOB NOT NULL, '
+            'updated REAL NOT NULL)'
+        )
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)')
+        self._chat_ids: Set[int] = {
+            row[0] for row in self._connection.execute(
+                'SELECT chat_id FROM sessions')
+        }
+        self._sessions: Dict[int, UserSession] = {}
+        # chat_id -> сессия для записи либо None для удаления
+        self._pending: Dict[int, Optional[UserSession]] = {}
+        self._last_flush = time.monotonic()
+
+    def get(self, chat_id: int) -> Optional[UserSession]:
+        if chat_id not in self._chat_ids:
+            return None
+        if chat_id in self._sessions:
+            return self._sessions[chat_id]
+
+        row = self._connection.execute(
+            'SELECT data FROM sessions WHERE chat_id = ?', (chat_id,)
+        ).fetchone()
+        if row is None:
+            self._chat_ids.discard(chat_id)
+            return None
+        user_session = deserialize_session(row[0])
+        self._sessions[chat_id] = user_session
+        return user_session
+
+    def save(self, chat_id: int, user_session: UserSession) -> None:
+        self._chat_ids.add(chat_id)
+        self._sessions[chat_id] = user_session
+        self._pending[chat_id] = user_session
+        self._maybe_flush()
+
+    def delete(self, chat_id: int) -> None:
+        self._chat_ids.discard(chat_id)
+        self._sessions.pop(chat_id, None)
+        self._pending[chat_id] = None
+        self._maybe_flush()
+
+    def clear(self) -> None:
+        self._chat_ids.clear()
+        self._sessions.clear()
+        self._pending.clear()
+        self._connection.execute('DELETE FROM sessions')
+
+    def purge(self, older_than: float) -> int:
+        self.flush()
+        purged = [row[0] for row in self._connection.execute(
+            'SELECT chat_id FROM sessions WHERE updated < ?', (older_than,))]
+        with self._connection:
+            self._connection.execute('BEGIN')
+            self._connection.executemany(
+                'DELETE FROM sessions WHERE chat_id = ?',
+                [(chat_id,) for chat_id in purged])
+        for chat_id in purged:
+            self._chat_ids.discard(chat_id)
+            self._sessions.pop(chat_id, None)
+        return len(purged)
+
+    def get_update_times(self) -> Dict[int, float]:
+        self.flush()
+        return dict(self._connection.execute(
+            'SELECT chat_id, updated FROM sessions'))
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+
+        now = time.time()
+        updated = [(chat_id, serialize_session(user_session), now)
+                   for chat_id, user_session in self._pending.items()
+                   if user_session is not None]
+        deleted = [(chat_id,) for chat_id, user_session in self._pending.items()
+                   if user_session is None]
+        self._pending.clear()
+
+        with self._connection:
+            self._connection.execute('BEGIN')
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO sessions (chat_id, data, updated) '
+                'VALUES (?, ?, ?)', updated)
+            self._connection.executemany(
+                'DELETE FROM sessions WHERE chat_id = ?', deleted)
+
+    def close(self) -> None:
+        self.flush()
+        self._connection.close()
+
+    def __len__(self) -> int:
+        return len(self._chat_ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(tuple(self._chat_ids))
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self._chat_ids
+
+    def _maybe_flush(self) -> None:
+        if (len(self._pending) >= self.batch_size or
+                time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+
+def serialize_session(user_session: UserSession) -> bytes:
+    """
+    Сериализует сессию в компактный JSON-массив. Отрисованное изображение не
+    сохраняется - при необходимости стикер будет отрисован повторно
+    """
+    parameters = user_session.data_class
+    render_task = user_session.render_task
+    data = (
+        user_session.created.isoformat(),
+        user_session.current_step,
+        (parameters.text, parameters.splitting_numbers, parameters.font_name,
+         parameters.font_color, parameters.background_color,
+         parameters.image_format, parameters.phrases),
+        None if render_task is None else (
+            render_task.text, render_task.file_name, render_task.font_name,
+            render_task.font_color, render_task.background_color,
+            render_task.picture_width, render_task.picture_height,
+            render_task.image_format),
+        user_session.command,
+    )
+    return json.dumps(data, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def deserialize_session(data: bytes) -> UserSession:
+    """
+    Восстанавливает сессию, сериализованную serialize_session
+    """
+    created, current_step, parameters, render_task, command = json.loads(data)
+    text, splitting_numbers, font_name, font_color, background_color, \
+        image_format, phrases = parameters
+
+    user_session = UserSession(
+        created=datetime.datetime.fromisoformat(created),
+        current_step=current_step,
+        data_class=StickerParameters(
+            text=text,
+            splitting_numbers=_to_tuple(splitting_numbers),
+            font_name=font_name,
+            font_color=_to_tuple(font_color),
+            background_color=_to_tuple(background_color),
+            image_format=image_format,
+            phrases=_to_tuple(phrases),
+        ),
+        command=command,
+    )
+    if render_task is not None:
+        text, file_name, font_name, font_color, background_color, \
+            picture_width, picture_height, image_format = render_task
+        user_session.render_task = RenderTask(
+            text=tuple(text),
+            file_name=file_name,
+            font_name=font_name,
+            font_color=tuple(font_color),
+            background_color=tuple(background_color),
+            picture_width=picture_width,
+            picture_height=picture_height,
+            image_format=image_format,
+        )
+    return user_session
+
+
+def _to_tuple(value: Optional[list]) -> Optional[Tuple]:
+    return None if value is None else tuple(value)
+
+
+def create_session_store(store_type: str, path: Optional[str] = None,
+                         **kwargs) -> SessionStore:
+    """
+    Создаёт хранилище сессий заданного типа ('memory' либо 'sqlite')
+    """
+    if store_type == 'memory':
+        return MemorySessionStore()
+    if store_type == 'sqlite':
+        return SQLiteSessionStore(path, **kwargs)
+    raise ValueError(f'Неизвестный тип хранилища сессий {store_type}, '
+                     f'допустимые значения - memory, sqlite')
@@ -1,15 +1,22 @@
 import asyncio
 import datetime
-import os
-from typing import Dict, Sequence, Union
+import heapq
+import itertools
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import pytz
 
-from core.config import USER_COMMANDS
+from core.config import (
+    SESSION_SWEEP_BATCH_SIZE, SESSION_SWEEP_INTERVAL, SESSION_TTL, USER_COMMANDS,
+)
 from core.types import (
     Answer, CloseSession, SessionHandler, StickerParameters, UserSession,
     NotCreatedUserSession, NotClosedUserSession,
 )
+from core.utils.metrics import SESSIONS_CREATED, SESSIONS_EXPIRED, STEP_DURATION
+from core.utils.session_store import MemorySessionStore, SessionStore
+from core.utils.tracing import span
 
 
 class SessionsDispatcher:
@@ -17,9 +24,32 @@ class SessionsDispatcher:
     Диспетчер сессий - принимает сообщения из бота, отдаёт ответ,
     создаёт/закрывает сессии
     """
-    def __init__(self, user_session_handler):
-        self._sessions: Dict[int, UserSession] = {}
+    def __init__(self, user_session_handler, session_ttl: float = SESSION_TTL,
+                 session_store: Optional[SessionStore] = None,
+                 session_handlers: Optional[Dict[str, SessionHandler]] = None):
+        if session_store is None:
+            session_store = MemorySessionStore()
+        self._sessions: SessionStore = session_store
         self._user_session_handler: SessionHandler = user_session_handler
+        # Обработчики сессий для стартовых команд, отличных от /create_sticker
+        # (стартовая команда -> обработчик). Сессии остальных стартовых команд
+        # обрабатывает user_session_handler
+        self._session_handlers: Dict[str, SessionHandler] = dict(
+            session_handlers or {})
+        for session_handler in (user_session_handler,
+                                *self._session_handlers.values()):
+            session_handler.add_transition_hook(_observe_step_duration)
+        self._session_ttl = session_ttl
+        # Куча (время истечения, порядковый номер, chat_id, сессия) - по одной
+        # записи на сессию. Продление сессии только обновляет её expires_at,
+        # а запись в куче обновляется лениво, когда доходит до её вершины
+        self._expiry_heap: List[Tuple[float, int, int, Optional[UserSession]]] = []
+        self._expiry_counter = itertools.count()
+        # Сессии, сохранённые до перезапуска: давно не использованные
+        # удаляются, остальные добавляются в кучу без загрузки (сессия None)
+        # со временем истечения от их последнего сохранения
+        self._sessions.purge(time.time() - session_ttl)
+        self._push_restored_sessions()
 
     @staticmethod
     def _get_init_message() -> Sequence[Answer]:
@@ -29,7 +59,11 @@ class SessionsDispatcher:
         return (Answer(text='Начните работу с ботом с помощью одной из '
                             'доступных стартовых команд.\n\n'
                             'Стартовые команды:\n'
-                            '/create_sticker - начать создание стикера\n\n'
+                            '/create_sticker - начать создание стикера\n'
+                            '/quick_sticker - создать стикер, выбирая '
+                            'параметры кнопками\n'
+                            '/create_pack - создать набор стикеров из '
+                            'нескольких фраз\n\n'
                             'Сервисные команды:\n'
                             '/next_step - пропустить текущий шаг (будет '
                             'установлено значение по умолчанию)\n'
@@ -49,11 +83,12 @@ class SessionsDispatcher:
 
         if command in USER_COMMANDS['START_COMMANDS']:
             try:
-                user_session = self._create_session(chat_id)
+                user_session = self._create_session(chat_id, command)
             except NotClosedUserSession as exc:
+                self._touch_session(chat_id, self._sessions.get(chat_id))
                 return (Answer(text=str(exc)),)
             else:
-                return self._user_session_handler.handle_session(user_session)
+                return self._handle_session(chat_id, user_session)
 
         if command in USER_COMMANDS['SERVICE_COMMANDS']:
             try:
@@ -61,50 +96,93 @@ class SessionsDispatcher:
             except NotCreatedUserSession as exc:
                 return (Answer(text=str(exc)),)
             else:
-                return self._user_session_handler.handle_session(user_session,
-                                                                 message=command)
+                return self._handle_session(chat_id, user_session,
+                                            message=command)
 
     def message_handler(self, chat_id: int,
                         message: str) -> Sequence[Union[Answer, CloseSession]]:
         """
         Промежуточный обработчик для сообщений из бота
         """
-        if chat_id not in self._sessions:
+        user_session = self._sessions.get(chat_id)
+        if user_session is None:
             return (Answer(text='Для начала работы с ботом используйте одну из '
                                 'доступных стартовых команд.\n\n'
                                 'Стартовые команды:\n'
-                                '/create_sticker - начать создание стикера'),)
+                                '/create_sticker - начать создание стикера\n'
+                                '/quick_sticker - создать стикер с помощью '
+                                'кнопок\n'
+                                '/create_pack - создать набор стикеров'),)
+
+        self._touch_session(chat_id, user_session)
+        return self._handle_session(chat_id, user_session, message=message)
+
+    def callback_handler(self, chat_id: int,
+                         data: str) -> Sequence[Union[Answer, CloseSession]]:
+        """
+        Промежуточный обработчик для нажатий inline-кнопок. Нажатия кнопок
+        закрытых сессий и сессий без inline-кнопок игнорируются
+        """
+        user_session = self._sessions.get(chat_id)
+        if (user_session is None or not
+                self._get_session_handler(user_session.command).inline_keyboard):
+            return ()
 
-        user_session = self._sessions[chat_id]
-        return self._user_session_handler.handle_session(user_session=user_session,
-                                                         message=message)
+        self._touch_session(chat_id, user_session)
+        return self._handle_session(chat_id, user_session, message=data)
 
     def close_session(self, chat_id: int) -> None:
         """
-        Закрывает сессию, удаляет созданный стикер (если он был создан)
+        Закрывает сессию
         """
-        if chat_id in self._sessions:
-            try:
-                os.remove(self._sessions[chat_id].file_path)
-            except (FileNotFoundError, TypeError):
-                pass
-            self._sessions.pop(chat_id, None)
+        self._sessions.delete(chat_id)
 
     async def close_old_sessions(self) -> None:
-        creation_limit = 600  # 10 min
+        """
+        Периодически закрывает сессии, в которых не было активности дольше
+        session_ttl секунд. Истёкшие сессии обрабатываются пачками, чтобы не
+        блокировать event loop
+        """
         while True:
-            await asyncio.sleep(creation_limit / 2)
-            current_time = self._get_now_datetime()
+            await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+            while self._close_old_sessions() == SESSION_SWEEP_BATCH_SIZE:
+                await asyncio.sleep(0)
+            self._sessions.flush()
 
-            close_list = set()
-            for chat_id, session in self._sessions.items():
-                if (current_time - session.created).total_seconds() > creation_limit:
-                    close_list.add(chat_id)
+    def _close_old_sessions(self, now: Optional[float] = None,
+                            batch_size: int = SESSION_SWEEP_BATCH_SIZE) -> int:
+        """
+        Закрывает истёкшие сессии, обрабатывая не больше batch_size записей
+        кучи. Возвращает количество обработанных записей
+        """
+        if now is None:
+            now = self._get_monotonic_time()
+
+        processed = 0
+        while (self._expiry_heap and processed < batch_size and
+               self._expiry_heap[0][0] <= now):
+            _, _, chat_id, session = heapq.heappop(self._expiry_heap)
+            processed += 1
+            if session is None:
+                # Сессия, сохранённая до перезапуска. Если к ней обращались
+                # после перезапуска, она продлена и добавлена в кучу заново
+                session = self._sessions.get(chat_id)
+                if session is None or session.expires_at > 0:
+                    continue
+            elif self._sessions.get(chat_id) is not session:
+                # Сессия уже закрыта
+                continue
+            elif session.expires_at > now:
+                # Сессия была продлена - переносим запись на новое время
+                self._push_expiry(chat_id, session)
+                continue
+            self.close_session(chat_id)
+            SESSIONS_EXPIRED.inc()
 
-            for chat_id in close_list:
-                self.close_session(chat_id)
+        return processed
 
-    def _create_session(self, chat_id: int) -> UserSession:
+    def _create_session(self, chat_id: int,
+                        command: str = 'create_sticker') -> UserSession:
         """
         Создаёт сессию и возвращает её. Если сессия уже создана - возвращает
         ошибку
@@ -114,27 +192,85 @@ class SessionsDispatcher:
                 'Вы не закончили создавать предыдущий стикер.\n'
                 'Если вы хотите начать сначала - пришлите команду /reset'
             )
-        self._sessions[chat_id] = UserSession(
+        user_session = UserSession(
             created=self._get_now_datetime(),
-            current_step=self._user_session_handler.first_step,
-            data_class=StickerParameters()
+            current_step=self._get_session_handler(command).first_step,
+            data_class=StickerParameters(),
+            command=command,
         )
+        self._sessions.save(chat_id, user_session)
+        self._touch_session(chat_id, user_session)
+        SESSIONS_CREATED.inc()
 
-        return self._sessions[chat_id]
+        return user_session
 
     def _get_session(self, chat_id: int) -> UserSession:
         """
         Возращает созданную ранее сессию. Если сессия ещё не создана -
         возвращает ошибку
         """
-        if chat_id not in self._sessions:
+        user_session = self._sessions.get(chat_id)
+        if user_session is None:
             raise NotCreatedUserSession(
                 'Для начала работы с ботом введите одну из доступных '
                 'стартовых команд.\n\n'
                 'Стартовые команды:\n'
-                '/create_sticker - начать создание стикера'
+                '/create_sticker - начать создание стикера\n'
+                '/quick_sticker - создать стикер с помощью кнопок\n'
+                '/create_pack - создать набор стикеров'
             )
-        return self._sessions[chat_id]
+        self._touch_session(chat_id, user_session)
+        return user_session
+
+    def _handle_session(self, chat_id: int, user_session: UserSession,
+                        message: Optional[str] = None
+                        ) -> Sequence[Union[Answer, CloseSession]]:
+        """
+        Передаёт сообщение обработчику сессии и сохраняет изменённую сессию
+        """
+        session_handler = self._get_session_handler(user_session.command)
+        step = session_handler.steps[user_session.current_step]
+        with span('handle_session', command=user_session.command, step=step):
+            answers = session_handler.handle_session(user_session,
+                                                     message=message)
+        self._sessions.save(chat_id, user_session)
+        return answers
+
+    def _get_session_handler(self, command: str) -> SessionHandler:
+        """
+        Возвращает обработчик сессий, созданных стартовой командой command
+        """
+        return self._session_handlers.get(command, self._user_session_handler)
+
+    def _touch_session(self, chat_id: int, user_session: UserSession) -> None:
+        """
+        Продлевает сессию на session_ttl секунд от текущего момента.
+        Новые (либо загруженные из хранилища) сессии добавляются в кучу
+        """
+        is_tracked = user_session.expires_at > 0
+        user_session.expires_at = self._get_monotonic_time() + self._session_ttl
+        if not is_tracked:
+            self._push_expiry(chat_id, user_session)
+
+    def _push_expiry(self, chat_id: int, user_session: UserSession) -> None:
+        heapq.heappush(self._expiry_heap, (user_session.expires_at,
+                                           next(self._expiry_counter),
+                                           chat_id, user_session))
+
+    def _push_restored_sessions(self) -> None:
+        """
+        Добавляет в кучу сессии, сохранённые в хранилище до перезапуска
+        """
+        now, monotonic_now = time.time(), self._get_monotonic_time()
+        for chat_id, updated in self._sessions.get_update_times().items():
+            expires_at = monotonic_now + updated + self._session_ttl - now
+            self._expiry_heap.append((expires_at, next(self._expiry_counter),
+                                      chat_id, None))
+        heapq.heapify(self._expiry_heap)
+
+    @staticmethod
+    def _get_monotonic_time() -> float:
+        return time.monotonic()
 
     @staticmethod
     def _get_now_datetime() -> datetime.datetime:
@@ -144,3 +280,17 @@ class SessionsDispatcher:
         tz = pytz.timezone('Europe/Minsk')
         now = datetime.datetime.now(tz)
         return now
+
+
+# Дочерние метрики STEP_DURATION для каждого шага
+_step_durations: Dict[str, Any] = {}
+
+
+def _observe_step_duration(step: str, _, duration: float) -> None:
+    """
+    Учитывает в метриках время выполнения функции-обработчика шага
+    """
+    histogram = _step_durations.get(step)
+    if histogram is None:
+        histogram = _step_durations[step] = STEP_DURATION.labels(step)
+    histogram.observe(duration)
@@ -1,26 +1,33 @@
-import os
-from typing import Sequence, Tuple
+import functools
+import io
+from typing import Callable, Optional, Sequence, Tuple
 
 from PIL import Image, ImageDraw, ImageFont
 
+from core.config import TEXT_MASK_CACHE_MAX_BYTES
 from core.fonts import DEFAULT_FONT
-from core.config import FONTS_DIR
+from core.types.constants import (
+    DEFAULT_FORMAT, PICTURE_HEIGHT, PICTURE_WIDTH, RGB_BLACK, RGB_WHITE,
+)
+from core.utils.cache import LRUCache
+from core.utils.font_cache import font_cache
+from core.utils.font_metrics import font_metrics_registry
 
 
 DEFAULT_MODE = 'RGBA'
-PICTURE_HEIGHT = 512
-PICTURE_WIDTH = 512
+MAX_STICKER_SIZE = 512 * 1024  # ограничение Телеграма на размер стикера
+MIN_WEBP_QUALITY = 1
+MAX_WEBP_QUALITY = 100
 TEXT_AREA_SIZE = 492  # 512 - 10 * 2
 IMAGE_FACTOR = 1.5
+MIN_FONT_SIZE = 1
 
-RGB_BLACK = (0, 0, 0)
 RGB_BLUE = (0, 0, 255)
 RGB_GREEN = (0, 255, 0)
 RGB_ORANGE = (255, 165, 0)
 RGB_PINK = (255, 0, 255)
 RGB_PURPLE = (128, 0, 128)
 RGB_RED = (255, 0, 0)
-RGB_WHITE = (255, 255, 255)
 RGB_YELLOW = (255, 255, 0)
 
 COLORS_MAP = {
@@ -40,41 +47,168 @@ def _get_font_size(words: Sequence[str], font_name: str,
                    max_text_length: int) -> int:
     """
     Подбирает максимальный размер шрифта исходя из предельно возможного размера
-    текстовой области
+    текстовой области.
+    Вместо пошагового перебора размеров используется экспоненциальный поиск
+    границы с последующим бинарным поиском, т. е. O(log n) измерений текста.
+    Результат совпадает с пошаговым перебором при условии, что ширина и высота
+    текста монотонно не убывают с ростом размера шрифта.
+    Сначала проверяются размер, предсказанный по таблице метрик шрифта, и
+    соседний с ним: если граница лежит между ними, текст измеряется только на
+    этих двух размерах. Иначе предсказание используется как подсказка для поиска
     """
     word_with_max_length = max(words, key=len)
     font_size = int(max_text_length / len(word_with_max_length) * IMAGE_FACTOR)
+    font_metrics = font_metrics_registry.get(font_name)
+
+    widths = {}
+    heights = {}
+
+    def width(size: int) -> int:
+        if size not in widths:
+            font = _get_font(font_name, size)
+            widths[size] = _get_text_length_in_px(word_with_max_length, font)
+        return widths[size]
+
+    def height(size: int) -> float:
+        if size not in heights:
+            font = _get_font(font_name, size)
+            heights[size] = _get_text_area_height_in_px(words, font)
+        return heights[size]
+
+    # Пошаговый перебор останавливался на первом размере, который пересёк
+    # границу max_text_length, двигаясь от стартового размера. При движении
+    # вверх результатом был последний размер короче границы, при движении
+    # вниз - последний размер длиннее границы (либо размер, точно равный ей)
+    width_hint = font_metrics.predict_size(word_with_max_length, max_text_length)
+    hinted_size = _get_hinted_width_size(width, max_text_length, font_size,
+                                         width_hint)
+    if hinted_size is not None:
+        font_size = hinted_size
+    elif width(font_size) < max_text_length:
+        font_size = _search_font_size(
+            lambda size: width(size) >= max_text_length, font_size, 1,
+            hint=width_hint)
+        if width(font_size) != max_text_length:
+            font_size -= 1
+    elif width(font_size) > max_text_length:
+        font_size = _search_font_size(
+            lambda size: width(size) <= max_text_length, font_size, -1,
+            hint=width_hint)
+        if width(font_size) != max_text_length:
+            font_size += 1
 
-    if_shorter = if_longer = True
+    if height(font_size) > max_text_length:
+        area_hint = font_metrics.predict_area_size(words, max_text_length)
+        boundary = _find_boundary(lambda size: height(size) > max_text_length,
+                                  area_hint)
+        if boundary is not None and boundary <= font_size:
+            font_size = boundary - 1
+        else:
+            font_size = _search_font_size(
+                lambda size: height(size) <= max_text_length, font_size, -1,
+                hint=area_hint)
 
-    while if_shorter or if_longer:
-        font = _get_font(font_name, font_size)
-        current_text_length = _get_text_length_in_px(word_with_max_length, font)
+    return font_size - 1
+
+
+def _get_hinted_width_size(width: Callable[[int], int], max_text_length: int,
+                           start: int, hint: Optional[int]) -> Optional[int]:
+    """
+    Возвращает результат пошагового перебора по ширине текста, если граница
+    max_text_length найдена рядом с размером hint. Направление перебора
+    определяется положением start относительно границы без измерения текста
+    на размере start. Если граница не подтвердилась - возвращает None
+    """
+    boundary = _find_boundary(lambda size: width(size) >= max_text_length, hint)
+    if boundary is None:
+        return None
+
+    if start < boundary:
+        # Перебор шёл вверх и остановился на boundary
+        return boundary if width(boundary) == max_text_length else boundary - 1
+    if start == boundary or width(boundary) != max_text_length:
+        # Перебор шёл вниз и остановился на boundary
+        return boundary
+    # Ширина на нескольких размерах подряд может быть равна границе, и
+    # перебор вниз остановился бы на большем из них - нужен поиск
+    return None
+
+
+def _find_boundary(is_reached: Callable[[int], bool], hint: Optional[int],
+                   min_font_size: int = MIN_FONT_SIZE) -> Optional[int]:
+    """
+    Возвращает наименьший размер, для которого выполняется условие
+    is_reached, если он равен hint либо hint + 1. Проверяет только hint и
+    соседний с ним размер, иначе возвращает None
+    """
+    if hint is None or hint <= min_font_size:
+        return None
+    if is_reached(hint):
+        return hint if not is_reached(hint - 1) else None
+    return hint + 1 if is_reached(hint + 1) else None
 
-        if current_text_length < max_text_length:
-            font_size += 1
-            if_shorter = False
-        elif current_text_length > max_text_length:
-            font_size -= 1
-            if_longer = False
-        else:
-            break
 
+def _search_font_size(is_reached: Callable[[int], bool], start: int,
+                      direction: int, min_font_size: int = MIN_FONT_SIZE,
+                      hint: Optional[int] = None) -> int:
+    """
+    Возвращает ближайший к start (в направлении direction) размер шрифта, для
+    которого выполняется условие is_reached. Для start условие не выполняется.
+    Граница ищется экспоненциальным шагом от start (либо в обе стороны от
+    подсказки hint, если она лежит за start в направлении direction), затем
+    уточняется бинарным поиском
+    """
+    passed = start
+    if hint is not None and (hint - start) * direction > 0:
+        hint = max(hint, min_font_size)
+        if is_reached(hint):
+            # Граница между start и hint - ищем её, двигаясь от hint назад
+            candidate = hint
+            step = 1
+            while True:
+                probe = candidate - direction * step
+                if (probe - start) * direction <= 0:
+                    break
+                if not is_reached(probe):
+                    passed = probe
+                    break
+                candidate = probe
+                step *= 2
+            return _bisect_font_size(is_reached, passed, candidate)
+        passed = hint
+
+    step = 1
     while True:
-        font = _get_font(font_name, font_size)
-        text_area_height = _get_text_area_height_in_px(words, font)
+        candidate = max(passed + direction * step, min_font_size)
+        if is_reached(candidate):
+            break
+        if candidate == min_font_size:
+            return min_font_size
+        passed = candidate
+        step *= 2
 
-        if max_text_length < text_area_height:
-            font_size -= 1
+    return _bisect_font_size(is_reached, passed, candidate)
+
+
+def _bisect_font_size(is_reached: Callable[[int], bool], passed: int,
+                      candidate: int) -> int:
+    """
+    Бинарный поиск ближайшего к passed размера, для которого выполняется
+    условие is_reached. Для passed условие не выполняется, для candidate -
+    выполняется
+    """
+    while abs(candidate - passed) > 1:
+        middle = (candidate + passed) // 2
+        if is_reached(middle):
+            candidate = middle
         else:
-            break
+            passed = middle
 
-    return font_size - 1
+    return candidate
 
 
 def _get_font(font_name: str, font_size: int) -> ImageFont.ImageFont:
-    font = os.path.join(FONTS_DIR, font_name)
-    return ImageFont.truetype(font=font, size=font_size)
+    return font_cache.get_font(font_name, font_size)
 
 
 def _get_text_length_in_px(text: str, font: ImageFont.ImageFont) -> int:
@@ -127,6 +261,93 @@ def _draw_text(draw: ImageDraw.Draw,
                                  int(word_width[1] / 5))
 
 
+def _get_mask_size(mask: Image.Image) -> int:
+    return mask.width * mask.height
+
+
+# Общий для процесса кэш масок текста: ключ - текст (с разбивкой по строкам),
+# шрифт и размеры изображения, значение - маска текста в режиме "L"
+text_mask_cache = LRUCache(TEXT_MASK_CACHE_MAX_BYTES, get_size=_get_mask_size)
+
+
+def get_text_mask(text: Sequence[str], *,
+                  picture_width: int = PICTURE_WIDTH,
+                  picture_height: int = PICTURE_HEIGHT,
+                  font_name: str = DEFAULT_FONT,
+                  max_text_length: int = TEXT_AREA_SIZE) -> Image.Image:
+    """
+    Возвращает маску текста - полутоновое изображение (режим "L"), в котором
+    яркость пикселя равна непрозрачности текста. Маска не зависит от цветов
+    стикера, поэтому подбор размера шрифта и отрисовка текста выполняются
+    один раз, а маска берётся из кэша. Возвращённую маску нельзя изменять
+    """
+    key = (tuple(text), font_name, picture_width, picture_height,
+           max_text_length)
+    return text_mask_cache.get_or_load(
+        key, lambda: _draw_text_mask(text, picture_width, picture_height,
+                                     font_name, max_text_length))
+
+
+def _draw_text_mask(text: Sequence[str], picture_width: int,
+                    picture_height: int, font_name: str,
+                    max_text_length: int) -> Image.Image:
+    mask = Image.new('L', (picture_width, picture_height), 0)
+    draw = ImageDraw.Draw(mask)
+
+    font_size = _get_font_size(text, font_name, max_text_length)
+    font = _get_font(font_name, font_size)
+    vertical_offset = _get_vertical_offset(text, picture_height, font)
+    _draw_text(draw, text, font, 255, vertical_offset, picture_width)
+
+    return mask
+
+
+def _get_preview_mask(text: Sequence[str], preview_size: int,
+                      picture_width: int, picture_height: int,
+                      font_name: str, max_text_length: int) -> Image.Image:
+    """
+    Возвращает уменьшенную маску текста: большая сторона превью равна
+    preview_size, пропорции стикера сохраняются
+    """
+    scale = preview_size / max(picture_width, picture_height)
+    size = (max(round(picture_width * scale), 1),
+            max(round(picture_height * scale), 1))
+    key = (tuple(text), font_name, picture_width, picture_height,
+           max_text_length, size)
+    return text_mask_cache.get_or_load(
+        key, lambda: get_text_mask(
+            text, picture_width=picture_width, picture_height=picture_height,
+            font_name=font_name, max_text_length=max_text_length,
+        ).resize(size, Image.LANCZOS))
+
+
+def _fill_mask(mask: Image.Image, background_color: Sequence[int],
+               font_color: Sequence[int], mode: str) -> Image.Image:
+    """
+    Раскрашивает маску текста: яркость пикселя маски становится индексом в
+    палитре из смесей цвета фона и цвета текста (как при наложении текста
+    на фон), а изображение с палитрой переводится в режим mode.
+    Смеси считаются так же, как в Pillow, поэтому результат попиксельно
+    совпадает с отрисовкой текста прямо на фоне
+    """
+    image = mask.convert('P')
+    image.putpalette(_get_palette(tuple(background_color), tuple(font_color)))
+    if mode == 'P':
+        return image
+    return image.convert(mode)
+
+
+@functools.lru_cache(maxsize=256)
+def _get_palette(background_color: Tuple[int, ...],
+                 font_color: Tuple[int, ...]) -> Tuple[int, ...]:
+    palette = []
+    for alpha in range(256):
+        for background, font in zip(background_color[:3], font_color[:3]):
+            value = background * (255 - alpha) + font * alpha + 128
+            palette.append(((value >> 8) + value) >> 8)
+    return tuple(palette)
+
+
 def create_sticker(text: Sequence[str], *,
                    picture_width: int = PICTURE_WIDTH,
                    picture_height: int = PICTURE_HEIGHT,
@@ -137,14 +358,75 @@ def create_sticker(text: Sequence[str], *,
                    mode: str = DEFAULT_MODE
                    ) -> Image.Image:
     """
-    Создаёт изображение в зависимости от переданных параметров
+    Создаёт изображение в зависимости от переданных параметров.
+    Текст накладывается по маске из кэша, поэтому стикеры, которые
+    отличаются от уже созданных только цветами, не отрисовываются заново
     """
-    image = Image.new(mode, (picture_width, picture_height), background_color)
-    draw = ImageDraw.Draw(image, mode=mode)
+    mask = get_text_mask(text, picture_width=picture_width,
+                         picture_height=picture_height, font_name=font_name,
+                         max_text_length=max_text_length)
+    return _fill_mask(mask, background_color, font_color, mode)
+
+
+def create_preview(text: Sequence[str], *,
+                   preview_size: int,
+                   picture_width: int = PICTURE_WIDTH,
+                   picture_height: int = PICTURE_HEIGHT,
+                   background_color: Sequence[int] = RGB_WHITE,
+                   font_name: str = DEFAULT_FONT,
+                   font_color: Sequence[int] = RGB_BLACK,
+                   max_text_length: int = TEXT_AREA_SIZE,
+                   mode: str = DEFAULT_MODE
+                   ) -> Image.Image:
+    """
+    Создаёт уменьшенное превью стикера (большая сторона - preview_size
+    пикселей). Расположение текста совпадает со стикером, созданным
+    create_sticker с теми же параметрами
+    """
+    mask = _get_preview_mask(text, preview_size, picture_width,
+                             picture_height, font_name, max_text_length)
+    return _fill_mask(mask, background_color, font_color, mode)
+
+
+def encode_sticker(image: Image.Image, image_format: str = DEFAULT_FORMAT,
+                   max_size: int = MAX_STICKER_SIZE) -> bytes:
+    """
+    Кодирует изображение в заданный формат в памяти.
+    Для WebP подбирает параметры кодирования так, чтобы размер изображения не
+    превышал max_size
+    """
+    if image_format.upper() == 'WEBP':
+        return _encode_webp(image, max_size)
+    return _encode_image(image, image_format)
+
+
+def _encode_webp(image: Image.Image, max_size: int) -> bytes:
+    """
+    Кодирует изображение в WebP без потерь, а если результат больше max_size -
+    бинарным поиском подбирает максимальное качество сжатия с потерями,
+    при котором изображение укладывается в max_size
+    """
+    content = _encode_image(image, 'WEBP', lossless=True)
+    if len(content) <= max_size:
+        return content
+
+    low, high = MIN_WEBP_QUALITY, MAX_WEBP_QUALITY
+    best = None
+    while low <= high:
+        quality = (low + high) // 2
+        content = _encode_image(image, 'WEBP', quality=quality, method=6)
+        if len(content) <= max_size:
+            best = content
+            low = quality + 1
+        else:
+            high = quality - 1
+
+    # Если не удалось уложиться в max_size даже с минимальным качеством,
+    # возвращается самый маленький из полученных вариантов
+    return best if best is not None else content
 
-    font_size = _get_font_size(text, font_name, max_text_length)
-    font = _get_font(font_name, font_size)
-    vertical_offset = _get_vertical_offset(text, picture_height, font)
-    _draw_text(draw, text, font, font_color, vertical_offset, picture_width)
 
-    return image
+def _encode_image(image: Image.Image, image_format: str, **params) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **params)
+    return buffer.getvalue()
@@ -0,0 +1,152 @@
+"""
+Трассировка обработки обновлений: каждому обновлению присваивается trace id,
+этапы обработки записываются вложенными интервалами (span) по монотонным
+часам, а по завершении обработки трасса записывается одной JSON-строкой.
+
+Текущая трасса и текущий интервал хранятся в contextvars, поэтому задачи
+asyncio, созданные во время обработки обновления, продолжают его трассу.
+Вне трассы span ничего не делает
+"""
+import contextlib
+import contextvars
+import datetime
+import json
+import logging
+import random
+import time
+import uuid
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
+
+from core.config import TRACE_SAMPLE_RATE, TRACE_SLOW_THRESHOLD
+
+
+logger = logging.getLogger('trace')
+
+# Текущая трасса (Trace) и id текущего интервала
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+# Интервал вне трассы - ничего не делает, поэтому вызов span в горячем пути
+# без трассировки почти ничего не стоит
+_NO_SPAN = contextlib.nullcontext()
+
+
+class Trace:
+    """
+    Трасса обработки одного обновления
+    """
+    __slots__ = ('trace_id', 'name', 'attributes', 'started', 'started_at',
+                 'duration', 'spans', 'sampled')
+
+    def __init__(self, name: str, sampled: bool, **attributes: Any):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attributes = attributes
+        self.started = time.perf_counter()
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.duration: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self.sampled = sampled
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'started_at': self.started_at.isoformat(timespec='milliseconds'),
+            'duration_ms': _to_ms(self.duration),
+            **self.attributes,
+            'spans': self.spans,
+        }
+
+
+class Tracer:
+    """
+    Создаёт трассы и записывает их в лог 'trace'. Записываются доля
+    sample_rate трасс, а также все трассы дольше slow_threshold секунд
+    (0 - не записывать по длительности)
+    """
+    def __init__(self, sample_rate: float = 0, slow_threshold: float = 0):
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.slow_threshold > 0
+
+    @contextlib.contextmanager
+    def trace(self, name: str, **attributes: Any) -> Iterator[Optional[Trace]]:
+        """
+        Начинает трассу обновления. Если трассировка выключена либо трасса
+        уже начата - ничего не делает
+        """
+        if not self.enabled or _current_trace.get() is not None:
+            yield None
+            return
+
+        sampled = self.sample_rate >= 1 or random.random() < self.sample_rate
+        trace = Trace(name, sampled, **attributes)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(None)
+        try:
+            yield trace
+        finally:
+            trace.duration = time.perf_counter() - trace.started
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            if trace.sampled or (self.slow_threshold and
+                                 trace.duration >= self.slow_threshold):
+                self.emit(trace)
+
+    @staticmethod
+    def emit(trace: Trace) -> None:
+        logger.info(json.dumps(trace.to_dict(), ensure_ascii=False,
+                               separators=(',', ':'), default=str))
+
+
+def span(name: str, **attributes: Any) -> ContextManager[Optional[Dict[str, Any]]]:
+    """
+    Записывает интервал в текущую трассу. Возвращает словарь интервала, в
+    который можно добавить атрибуты. Вне трассы возвращает None
+    """
+    if _current_trace.get() is None:
+        return _NO_SPAN
+    return _span(name, attributes)
+
+
+@contextlib.contextmanager
+def _span(name: str, attributes: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    trace = _current_trace.get()
+    started = time.perf_counter()
+    record = {
+        'id': len(trace.spans),
+        'parent': _current_span.get(),
+        'name': name,
+        'start_ms': _to_ms(started - trace.started),
+        **attributes,
+    }
+    trace.spans.append(record)
+    token = _current_span.set(record['id'])
+    try:
+        yield record
+    except BaseException as exc:
+        record['error'] = type(exc).__name__
+        raise
+    finally:
+        record['duration_ms'] = _to_ms(time.perf_counter() - started)
+        _current_span.reset(token)
+
+
+tracer = Tracer(sample_rate=TRACE_SAMPLE_RATE,
+                slow_threshold=TRACE_SLOW_THRESHOLD)
+
+
+def get_trace_id() -> Optional[str]:
+    """
+    Возвращает id текущей трассы
+    """
+    trace = _current_trace.get()
+    return None if trace is None else trace.trace_id
+
+
+def _to_ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 3)
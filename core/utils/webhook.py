@@ -0,0 +1,118 @@
+import asyncio
+import hmac
+import logging
+from typing import Optional, Set
+
+from aiogram import Bot, types
+from aiogram.dispatcher import Dispatcher
+from aiohttp import web
+
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_HANDLER_KEY = 'webhook_handler'
+
+
+class WebhookHandler:
+    """
+    Приём обновлений от Телеграма через вебхук. Обработчик сразу отвечает
+    Телеграму 200 OK, а само обновление обрабатывается в отдельной задаче -
+    одновременно обрабатывается не больше max_concurrent_updates обновлений,
+    остальные запросы ждут освобождения места (и тем самым притормаживают
+    отправку новых обновлений Телеграмом).
+    Если answer_callback_queries - нажатия inline-кнопок подтверждаются
+    методом answerCallbackQuery в ответе на запрос Телеграма, что экономит
+    отдельный запрос к Bot API на каждое нажатие
+    """
+    def __init__(self, dispatcher: Dispatcher, secret: Optional[str] = None,
+                 max_concurrent_updates: int = 100,
+                 answer_callback_queries: bool = True):
+        self.dispatcher = dispatcher
+        self.secret = secret
+        self.max_concurrent_updates = max_concurrent_updates
+        self.answer_callback_queries = answer_callback_queries
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.received = 0
+        self.failed = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not self._check_secret(request.match_info.get('secret')):
+            raise web.HTTPNotFound()
+        try:
+            update = types.Update(**await request.json())
+        except ValueError:
+            raise web.HTTPBadRequest()
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_updates)
+        await self._semaphore.acquire()
+        self.received += 1
+        task = asyncio.create_task(self._process_update(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if self.answer_callback_queries and update.callback_query is not None:
+            return web.json_response({
+                'method': 'answerCallbackQuery',
+                'callback_query_id': update.callback_query.id,
+            })
+        return web.Response(text='ok')
+
+    async def wait_closed(self) -> None:
+        """
+        Дожидается обработки всех принятых обновлений
+        """
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _process_update(self, update: types.Update) -> None:
+        Bot.set_current(self.dispatcher.bot)
+        Dispatcher.set_current(self.dispatcher)
+        try:
+            await self.dispatcher.process_update(update)
+        except Exception as exc:
+            self.failed += 1
+            logger.exception(msg=exc)
+        finally:
+            self._semaphore.release()
+
+    def _check_secret(self, secret: Optional[str]) -> bool:
+        if not self.secret:
+            return secret is None
+        return secret is not None and hmac.compare_digest(secret, self.secret)
+
+
+def get_webhook_path(path: str, secret: Optional[str] = None) -> str:
+    """
+    Возвращает путь вебхука. Секрет добавляется в путь последним сегментом,
+    чтобы обновления мог присылать только Телеграм
+    """
+    path = '/' + path.strip('/')
+    if secret:
+        return f'{path.rstrip("/")}/{secret}'
+    return path
+
+
+def create_webhook_app(dispatcher: Dispatcher, path: str,
+                       secret: Optional[str] = None,
+                       max_concurrent_updates: int = 100,
+                       answer_callback_queries: bool = True) -> web.Application:
+    """
+    Создаёт aiohttp-приложение, принимающее обновления по адресу path
+    """
+    webhook_handler = WebhookHandler(dispatcher, secret=secret,
+                                     max_concurrent_updates=max_concurrent_updates,
+                                     answer_callback_queries=answer_callback_queries)
+    route = '/' + path.strip('/')
+    if secret:
+        route = f'{route.rstrip("/")}/{{secret}}'
+
+    app = web.Application()
+    app[WEBHOOK_HANDLER_KEY] = webhook_handler
+    app.router.add_post(route, webhook_handler.handle)
+    app.on_shutdown.append(_on_shutdown)
+    return app
+
+
+async def _on_shutdown(app: web.Application) -> None:
+    await app[WEBHOOK_HANDLER_KEY].wait_closed()
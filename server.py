@@ -1,28 +1,133 @@
 import asyncio
 import io
-from typing import NoReturn, Sequence, Union
+import os
+import time
+import zipfile
+from typing import Dict, NoReturn, Optional, Sequence, Set, Tuple, Union
 
 from aiogram import Bot, types
+from aiogram.bot.api import TELEGRAM_PRODUCTION, TelegramAPIServer
 from aiogram.contrib.fsm_storage.memory import MemoryStorage
 from aiogram.contrib.middlewares.logging import LoggingMiddleware
 from aiogram.dispatcher import Dispatcher
 from aiogram.utils import executor
+from aiohttp import web
 
-from core.config import ACCESS_IDS, ALL_USER_COMMANDS, TOKEN
-from core.logs.log_helper import get_logger
-from core.types import Answer, CloseSession
-from core.utils.middleware import AccessMiddleware
+from core.config import (
+    ACCESS_DENY_INTERVAL, ACCESS_IDS, ACCESS_IDS_CHECK_INTERVAL, ACCESS_IDS_PATH,
+    ALL_USER_COMMANDS, BOT_MODE, CONTENT_DIR, CONTENT_JANITOR_BATCH_SIZE,
+    CONTENT_JANITOR_INTERVAL, CONTENT_MAX_AGE, CONTENT_MAX_BYTES,
+    FILE_ID_CACHE_SIZE, METRICS_HOST, METRICS_PORT, PREVIEW_MAX_CONCURRENT,
+    PREVIEW_MAX_QUEUE_SIZE, RENDER_CACHE_DIR, RENDER_CACHE_DISK_MAX_BYTES,
+    RENDER_CACHE_MAX_BYTES, RENDER_EXECUTOR, RENDER_MAX_CONCURRENT,
+    RENDER_MAX_QUEUE_SIZE, RENDER_MAX_TASKS_PER_WORKER, RENDER_TIMEOUT,
+    RENDER_WORKERS, SESSION_STORE, SESSION_STORE_BATCH_SIZE,
+    SESSION_STORE_FLUSH_INTERVAL, SESSION_STORE_PATH, TELEGRAM_API_URL,
+    THROTTLE_COMMANDS, THROTTLE_MESSAGES, THROTTLE_PERIOD, THROTTLE_RENDERS,
+    TOKEN, WEBAPP_HOST, WEBAPP_PORT,
+    WEBHOOK_MAX_CONCURRENT_UPDATES, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_URL,
+)
+from core.logs.log_helper import (
+    get_dropped_records, get_logger, get_trace_logger, stop_logging,
+)
+from core.utils.access_list import AccessList
+from core.utils.content_janitor import ContentJanitor
+from core.types import (
+    Answer, CloseSession, RenderQueueFull, RendersThrottled, RenderTask,
+    RenderTimeout,
+)
+from core.utils.file_id_cache import FileIdCache, get_file_id
+from core.utils.font_cache import font_cache
+from core.utils.font_metrics import font_metrics_registry
+from core.utils.metrics import (
+    SEND_DURATION, SEND_ERRORS, create_metrics_app, register_cache_metrics,
+    registry,
+)
+from core.utils.middleware import AccessMiddleware, ThrottlingMiddleware
+from core.utils.pack_session_handler import pack_handler
+from core.utils.quick_session_handler import quick_handler
+from core.utils.render_cache import RenderCache
+from core.utils.render_pool import RenderPool
+from core.utils.render_scheduler import RenderScheduler
+from core.utils.session_store import create_session_store
+from core.utils.tracing import span, tracer
 from core.utils.sessions_dispatcher import SessionsDispatcher
 from core.utils.user_session_handler import handler
+from core.utils.webhook import create_webhook_app, get_webhook_path
 
 
 logger = get_logger()
+if tracer.enabled:
+    get_trace_logger()
 
-sessions_dispatcher = SessionsDispatcher(user_session_handler=handler)
+session_store = create_session_store(SESSION_STORE, SESSION_STORE_PATH,
+                                     batch_size=SESSION_STORE_BATCH_SIZE,
+                                     flush_interval=SESSION_STORE_FLUSH_INTERVAL)
+sessions_dispatcher = SessionsDispatcher(user_session_handler=handler,
+                                         session_store=session_store,
+                                         session_handlers={
+                                             'create_pack': pack_handler,
+                                             'quick_sticker': quick_handler,
+                                         })
+render_pool = RenderPool(executor_type=RENDER_EXECUTOR,
+                         max_workers=RENDER_WORKERS,
+                         timeout=RENDER_TIMEOUT,
+                         max_tasks_per_worker=RENDER_MAX_TASKS_PER_WORKER,
+                         cache=RenderCache(
+                             max_memory_size=RENDER_CACHE_MAX_BYTES,
+                             disk_directory=RENDER_CACHE_DIR,
+                             max_disk_size=RENDER_CACHE_DISK_MAX_BYTES))
+render_scheduler = RenderScheduler(render_pool,
+                                   max_concurrent=RENDER_MAX_CONCURRENT,
+                                   max_queue_size=RENDER_MAX_QUEUE_SIZE)
+# Превью на панелях отрисовываются в отдельной очереди с собственным
+# бюджетом воркеров и без учёта в лимите стикеров пользователя
+preview_scheduler = RenderScheduler(render_pool,
+                                    max_concurrent=PREVIEW_MAX_CONCURRENT,
+                                    max_queue_size=PREVIEW_MAX_QUEUE_SIZE)
+file_id_cache = FileIdCache(max_items=FILE_ID_CACHE_SIZE)
+content_janitor = ContentJanitor(CONTENT_DIR, max_age=CONTENT_MAX_AGE,
+                                 max_size=CONTENT_MAX_BYTES,
+                                 interval=CONTENT_JANITOR_INTERVAL,
+                                 batch_size=CONTENT_JANITOR_BATCH_SIZE,
+                                 exclude=(RENDER_CACHE_DIR,))
+throttling_middleware = ThrottlingMiddleware(
+    limits={
+        'commands': THROTTLE_COMMANDS,
+        'messages': THROTTLE_MESSAGES,
+        'renders': THROTTLE_RENDERS,
+    },
+    period=THROTTLE_PERIOD,
+)
+
+# Статистика кэшей шрифтов отражает только процесс бота - при
+# RENDER_EXECUTOR='process' шрифты кэшируются в процессах воркеров
+cache_stats = {
+    'font': font_cache.fonts.stats,
+    'font_file': font_cache.files.stats,
+    'render': render_pool.cache.memory.stats,
+    'file_id': file_id_cache.stats,
+}
+if render_pool.cache.disk is not None:
+    cache_stats['render_disk'] = render_pool.cache.disk.stats
+register_cache_metrics(cache_stats)
+registry.callback('active_sessions', 'Количество открытых сессий', 'gauge',
+                  lambda: [({}, len(session_store))])
+registry.callback('log_records_dropped', 'Количество записей лога, отброшенных '
+                  'из-за заполненной очереди', 'counter',
+                  lambda: [({}, get_dropped_records())])
+registry.callback('render_queue_size', 'Количество стикеров в очереди отрисовки',
+                  'gauge', lambda: [({}, render_scheduler.queue_size)])
+registry.callback('renders_in_progress', 'Количество выполняющихся отрисовок',
+                  'gauge', lambda: [({}, render_scheduler.active)])
+registry.callback('preview_queue_size', 'Количество превью в очереди отрисовки',
+                  'gauge', lambda: [({}, preview_scheduler.queue_size)])
 loop = asyncio.get_event_loop()
 loop.create_task(sessions_dispatcher.close_old_sessions())
 
-bot = Bot(token=TOKEN)
+bot = Bot(token=TOKEN,
+          server=(TelegramAPIServer.from_base(TELEGRAM_API_URL)
+                  if TELEGRAM_API_URL else TELEGRAM_PRODUCTION))
 dispatcher = Dispatcher(bot, storage=MemoryStorage(), loop=loop)
 
 
@@ -31,10 +136,12 @@ async def process_command(message: types.Message) -> None:
     """
     Обработка зарегистрированных команд из бота
     """
-    answers = sessions_dispatcher.command_handler(
-        chat_id=message.from_user.id,
-        command=message.text)
-    await answer_handler(message.from_user.id, answers)
+    with tracer.trace('command', chat_id=message.from_user.id,
+                      message_id=message.message_id, command=message.text):
+        answers = sessions_dispatcher.command_handler(
+            chat_id=message.from_user.id,
+            command=message.text)
+        await answer_handler(message.from_user.id, answers)
 
 
 @dispatcher.message_handler()
@@ -42,59 +149,441 @@ async def process_message(message: types.Message) -> None:
     """
     Обработка сообщений из бота
     """
-    answers = sessions_dispatcher.message_handler(
-        chat_id=message.from_user.id,
-        message=message.text)
-    await answer_handler(message.from_user.id, answers)
+    with tracer.trace('message', chat_id=message.from_user.id,
+                      message_id=message.message_id):
+        answers = sessions_dispatcher.message_handler(
+            chat_id=message.from_user.id,
+            message=message.text)
+        await answer_handler(message.from_user.id, answers)
+
+
+@dispatcher.callback_query_handler()
+async def process_callback(callback_query: types.CallbackQuery) -> None:
+    """
+    Обработка нажатий inline-кнопок
+    """
+    # В режиме вебхука нажатие подтверждается в ответе на запрос Телеграма
+    # (см. WebhookHandler), без отдельного запроса к Bot API
+    if BOT_MODE != 'webhook':
+        await callback_query.answer()
+    if callback_query.message is None:
+        return
+    with tracer.trace('callback', chat_id=callback_query.from_user.id,
+                      message_id=callback_query.message.message_id):
+        answers = sessions_dispatcher.callback_handler(
+            chat_id=callback_query.from_user.id,
+            data=callback_query.data)
+        await answer_handler(callback_query.from_user.id, answers,
+                             message_id=callback_query.message.message_id)
 
 
 async def answer_handler(chat_id: int,
-                         answers: Sequence[Union[Answer, CloseSession]]) -> None:
+                         answers: Sequence[Union[Answer, CloseSession]],
+                         message_id: Optional[int] = None) -> None:
     """
-    Обрабатывает кортеж из ответов пользователю
+    Обрабатывает кортеж из ответов пользователю.
+    Отрисовка всех стикеров из ответов запускается сразу и параллельно, а
+    ответы отправляются по порядку по мере готовности их стикеров.
+    message_id - сообщение с нажатой inline-кнопкой, ответы 'panel'
+    редактируют его вместо отправки нового сообщения
     """
+    renders = {}
+    render_tasks = _get_pending_render_tasks(answers)
+    if render_tasks:
+        try:
+            renders = _start_renders(chat_id, render_tasks)
+        except (RenderQueueFull, RendersThrottled) as exc:
+            # Ответы со стикерами не отправляются, остальные ответы
+            # (сообщения, закрытие сессии) обрабатываются как обычно
+            logger.warning(msg=exc)
+            answers = [answer for answer in answers
+                       if not isinstance(answer, Answer) or
+                       not _get_render_tasks(answer)]
+            if isinstance(exc, RenderQueueFull):
+                await bot.send_message(chat_id=chat_id,
+                                       text='Бот сейчас перегружен, '
+                                            'попробуйте ещё раз через минуту')
+            elif throttling_middleware.should_notify(chat_id, 'renders'):
+                await bot.send_message(
+                    chat_id=chat_id,
+                    text=throttling_middleware.get_notice('renders'))
+        else:
+            # Сообщаем об очереди, только если впереди стикеры других чатов
+            position = render_scheduler.get_position(chat_id)
+            if position > 1:
+                await bot.send_message(chat_id=chat_id,
+                                       text=f'Бот сейчас загружен, вы '
+                                            f'#{position} в очереди на '
+                                            f'отрисовку')
+    previews = _get_pending_render_tasks(answers, previews=True)
+    if previews:
+        try:
+            futures = preview_scheduler.submit(chat_id, tuple(previews.values()))
+        except RenderQueueFull as exc:
+            # Панели отправляются без нового превью (см. answer_handler_helper)
+            logger.warning(msg=exc)
+        else:
+            renders.update(zip(previews, futures))
+    # id задач, отрисовка которых не удалась: ответы с этими стикерами
+    # (например, остальные альбомы и архив набора) не отправляются, а
+    # пользователь получает одно сообщение об ошибке
+    failed = set()
+    try:
+        for answer in answers:
+            if isinstance(answer, Answer):
+                if failed and any(id(render_task) in failed
+                                  for render_task in _get_render_tasks(answer)):
+                    continue
+                try:
+                    await answer_handler_helper(chat_id, answer, renders,
+                                                message_id)
+                except RenderTimeout as exc:
+                    logger.warning(msg=exc)
+                    if not failed:
+                        await bot.send_message(chat_id=chat_id,
+                                               text='Не удалось создать '
+                                                    'стикер, попробуйте ещё '
+                                                    'раз позже')
+                    failed |= _get_failed_render_tasks(answer, renders)
+                except Exception as exc:
+                    logger.exception(msg=exc)
+            elif isinstance(answer, CloseSession):
+                sessions_dispatcher.close_session(chat_id)
+    finally:
+        # Отрисовки, результат которых уже не понадобится (например, после
+        # ошибки отправки), отменяются, а их ошибки - забираются
+        for render in renders.values():
+            render.cancel()
+        await asyncio.gather(*renders.values(), return_exceptions=True)
+
+
+def _get_pending_render_tasks(answers: Sequence[Union[Answer, CloseSession]],
+                              previews: bool = False) -> Dict[int, RenderTask]:
+    """
+    Возвращает неотрисованные задачи из ответов: id(задачи) -> задача.
+    previews=True - вернуть превью панелей вместо стикеров
+    """
+    render_tasks = {}
     for answer in answers:
-        if isinstance(answer, Answer):
-            try:
-                await answer_handler_helper(chat_id, answer)
-            except Exception as exc:
-                logger.exception(msg=exc)
-        elif isinstance(answer, CloseSession):
-            sessions_dispatcher.close_session(chat_id)
-    return
+        if (not isinstance(answer, Answer) or
+                (answer.content_type == 'panel') != previews):
+            continue
+        for render_task in _get_render_tasks(answer):
+            if not render_task.done:
+                render_tasks[id(render_task)] = render_task
+    return render_tasks
 
 
-async def answer_handler_helper(chat_id: int, answer: Answer) -> None:
+def _start_renders(chat_id: int, render_tasks: Dict[int, RenderTask]
+                   ) -> Dict[int, asyncio.Future]:
     """
-    Отправляет ответ в зависимости от типа контента в Answer
+    Ставит стикеры в очередь отрисовки, если пользователь не превысил лимит
+    стикеров. Возвращает словарь id(задачи на отрисовку) -> future отрисовки.
+    Если очередь отклонила стикеры, списанные токены возвращаются
     """
-    if answer.content_path:
-        if answer.content_location == 'local':
-            content = io.FileIO(answer.content_path, mode='rb')
-        else:
-            content = answer.content_path
+    if not throttling_middleware.consume(chat_id, 'renders', len(render_tasks)):
+        raise RendersThrottled(f'Пользователь {chat_id} превысил лимит '
+                               f'стикеров')
+    try:
+        futures = render_scheduler.submit(chat_id, tuple(render_tasks.values()))
+    except RenderQueueFull:
+        throttling_middleware.refund(chat_id, 'renders', len(render_tasks))
+        raise
+    return dict(zip(render_tasks, futures))
+
+
+def _get_failed_render_tasks(answer: Answer,
+                             renders: Dict[int, asyncio.Future]) -> Set[int]:
+    """
+    Возвращает id задач ответа, отрисовка которых завершилась ошибкой (если
+    такие задачи не найдены - id всех задач ответа)
+    """
+    render_tasks = {id(render_task) for render_task in _get_render_tasks(answer)}
+    failed = {task_id for task_id in render_tasks
+              if task_id in renders and renders[task_id].done() and
+              not renders[task_id].cancelled() and
+              renders[task_id].exception() is not None}
+    return failed or render_tasks
+
+
+def _get_render_tasks(answer: Answer) -> Sequence[RenderTask]:
+    if answer.render_tasks is not None:
+        return answer.render_tasks
+    if answer.render_task is not None:
+        return (answer.render_task,)
+    return ()
+
+
+async def _wait_rendered(render_task: RenderTask,
+                         renders: Dict[int, asyncio.Future]) -> None:
+    """
+    Дожидается отрисовки стикера, запущенной в _start_renders (либо
+    отрисовывает стикер, если отрисовка не была запущена)
+    """
+    render = renders.get(id(render_task))
+    if render is not None:
+        await render
+    elif not render_task.done:
+        await render_pool.render(render_task)
 
+
+async def answer_handler_helper(chat_id: int, answer: Answer,
+                                renders: Optional[Dict[int, asyncio.Future]] = None,
+                                message_id: Optional[int] = None) -> None:
+    """
+    Отправляет ответ в зависимости от типа контента в Answer.
+    Файлы, которые уже были загружены в Телеграм, отправляются по file_id
+    """
+    renders = renders or {}
     if answer.content_type == 'message':
-        await bot.send_message(chat_id=chat_id,
-                               text=answer.text,
-                               reply_markup=answer.keyboard)
-    elif answer.content_type == 'photo':
-        await bot.send_photo(chat_id=chat_id,
-                             photo=content,
-                             caption=answer.text,
-                             reply_markup=answer.keyboard)
-    elif answer.content_type == 'document':
-        await bot.send_document(chat_id=chat_id,
-                                document=content,
-                                caption=answer.text,
-                                reply_markup=answer.keyboard)
+        await send_answer(chat_id, answer)
+        return
+    if answer.content_type == 'panel':
+        preview = None
+        if answer.render_task is not None:
+            if not answer.render_task.done and id(answer.render_task) not in renders:
+                # Очередь превью переполнена: в отправленной панели
+                # обновляются только подпись и кнопки, а новую панель без
+                # превью отправить нельзя
+                if message_id is None:
+                    await bot.send_message(chat_id=chat_id,
+                                           text='Бот сейчас перегружен, '
+                                                'попробуйте ещё раз через минуту')
+                    return
+            else:
+                content, file_name = await get_content(answer, renders)
+                preview = types.InputFile(io.BytesIO(content), filename=file_name)
+        await send_answer(chat_id, answer, preview, message_id=message_id)
+        return
+    if answer.content_type == 'media_group':
+        await send_answer(chat_id, answer, await get_media_group(answer, renders))
+        return
+    if answer.content_type == 'archive':
+        await send_answer(chat_id, answer, await get_archive(answer, renders))
+        return
+
+    file_id_key = file_id = None
+    if (answer.render_task is None and answer.content is None and
+            answer.content_location == 'local'):
+        # Локальный файл (например, пример шрифтов) ищется в кэше по пути,
+        # без чтения и хеширования содержимого
+        file_id_key = file_id_cache.get_path_key(answer.content_type,
+                                                 answer.content_path)
+        file_id = file_id_cache.get(file_id_key)
+
+    if file_id is not None:
+        content = file_id
+    else:
+        content, file_name = await get_content(answer, renders)
+        if isinstance(content, bytes):
+            if file_id_key is None:
+                file_id_key = file_id_cache.get_key(answer.content_type, content)
+                file_id = file_id_cache.get(file_id_key)
+            content = file_id or types.InputFile(io.BytesIO(content),
+                                                 filename=file_name)
+
+    message = await send_answer(chat_id, answer, content)
+    if message is not None and file_id_key is not None and file_id is None:
+        file_id_cache.put(file_id_key, get_file_id(message, answer.content_type))
+
+
+async def send_answer(chat_id: int, answer: Answer,
+                      content: Union[types.InputFile, types.MediaGroup,
+                                     str, None] = None,
+                      message_id: Optional[int] = None
+                      ) -> Optional[types.Message]:
+    """
+    Отправляет ответ в Телеграм и учитывает время отправки и ошибки в метриках.
+    Панель (ответ 'panel') редактируется в сообщении message_id, если оно
+    передано, иначе отправляется новым сообщением. Панель с превью стикера
+    (content) отправляется как фото с подписью; если превью не отрисовано,
+    у фото редактируются только подпись и кнопки
+    """
+    with span('send', content_type=answer.content_type):
+        started = time.perf_counter()
+        try:
+            if answer.content_type == 'message':
+                message = await bot.send_message(chat_id=chat_id,
+                                                  text=answer.text,
+                                                  reply_markup=answer.keyboard)
+            elif answer.content_type == 'panel' and content is not None:
+                if message_id is None:
+                    message = await bot.send_photo(chat_id=chat_id,
+                                                   photo=content,
+                                                   caption=answer.text,
+                                                   reply_markup=answer.keyboard)
+                else:
+                    message = await bot.edit_message_media(
+                        media=types.InputMediaPhoto(content, caption=answer.text),
+                        chat_id=chat_id, message_id=message_id,
+                        reply_markup=answer.keyboard)
+            elif answer.content_type == 'panel' and answer.render_task is not None:
+                message = await bot.edit_message_caption(
+                    caption=answer.text, chat_id=chat_id,
+                    message_id=message_id, reply_markup=answer.keyboard)
+            elif answer.content_type == 'panel':
+                if message_id is None:
+                    message = await bot.send_message(chat_id=chat_id,
+                                                      text=answer.text,
+                                                      reply_markup=answer.keyboard)
+                else:
+                    message = await bot.edit_message_text(
+                        text=answer.text, chat_id=chat_id,
+                        message_id=message_id, reply_markup=answer.keyboard)
+            elif answer.content_type == 'photo':
+                message = await bot.send_photo(chat_id=chat_id,
+                                               photo=content,
+                                               caption=answer.text,
+                                               reply_markup=answer.keyboard)
+            elif answer.content_type in ('document', 'archive'):
+                message = await bot.send_document(chat_id=chat_id,
+                                                  document=content,
+                                                  caption=answer.text,
+                                                  reply_markup=answer.keyboard)
+            elif answer.content_type == 'sticker':
+                message = await bot.send_sticker(chat_id=chat_id,
+                                                 sticker=content,
+                                                 reply_markup=answer.keyboard)
+            elif answer.content_type == 'media_group':
+                # Альбом не может содержать меньше 2 фото
+                if len(content.media) == 1:
+                    message = await bot.send_photo(chat_id=chat_id,
+                                                   photo=content.media[0].file)
+                else:
+                    message = (await bot.send_media_group(chat_id=chat_id,
+                                                          media=content))[0]
+            else:
+                return None
+        except Exception:
+            SEND_ERRORS.labels(answer.content_type).inc()
+            raise
+
+        SEND_DURATION.labels(answer.content_type).observe(
+            time.perf_counter() - started)
+        return message
+
+
+async def get_media_group(answer: Answer,
+                          renders: Dict[int, asyncio.Future]) -> types.MediaGroup:
+    """
+    Возвращает альбом из стикеров Answer, дождавшись их отрисовки
+    """
+    media_group = types.MediaGroup()
+    for render_task in answer.render_tasks:
+        await _wait_rendered(render_task, renders)
+        media_group.attach_photo(types.InputFile(io.BytesIO(render_task.content),
+                                                 filename=render_task.file_name))
+    return media_group
+
+
+async def get_archive(answer: Answer,
+                      renders: Dict[int, asyncio.Future]) -> types.InputFile:
+    """
+    Возвращает zip-архив со стикерами Answer (название архива - в
+    content_path), дождавшись их отрисовки. Стикеры уже сжаты, поэтому
+    архив собирается без сжатия
+    """
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, mode='w', compression=zipfile.ZIP_STORED) as file:
+        for render_task in answer.render_tasks:
+            await _wait_rendered(render_task, renders)
+            file.writestr(render_task.file_name, render_task.content)
+    archive.seek(0)
+    return types.InputFile(archive, filename=answer.content_path)
+
+
+async def get_content(answer: Answer,
+                      renders: Optional[Dict[int, asyncio.Future]] = None
+                      ) -> Tuple[Union[bytes, str], Optional[str]]:
+    """
+    Возвращает содержимое файла из Answer (либо file_id/URL файла на сервере
+    Телеграма) и имя файла. При необходимости отрисовывает стикер
+    """
+    if answer.render_task is not None:
+        await _wait_rendered(answer.render_task, renders or {})
+        return answer.render_task.content, answer.render_task.file_name
+
+    if answer.content is not None:
+        content = answer.content
+        if not isinstance(content, bytes):
+            content = content.read()
+        return content, None
+
+    if answer.content_location == 'local':
+        loop = asyncio.get_running_loop()
+        content = await loop.run_in_executor(None, _read_file, answer.content_path)
+        return content, os.path.basename(answer.content_path)
+    return answer.content_path, None
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, mode='rb') as file:
+        return file.read()
+
+
+async def start_webhook() -> NoReturn:
+    """
+    Запускает приём обновлений через вебхук
+    """
+    app = create_webhook_app(dispatcher, WEBHOOK_PATH, secret=WEBHOOK_SECRET,
+                             max_concurrent_updates=WEBHOOK_MAX_CONCURRENT_UPDATES)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, WEBAPP_HOST, WEBAPP_PORT).start()
+        await bot.set_webhook(
+            WEBHOOK_URL.rstrip('/') + get_webhook_path(WEBHOOK_PATH, WEBHOOK_SECRET),
+            drop_pending_updates=True,
+            # Телеграм допускает не больше 100 одновременных соединений
+            max_connections=min(WEBHOOK_MAX_CONCURRENT_UPDATES, 100),
+        )
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await bot.session.close()
+
+
+async def start_metrics_server() -> web.AppRunner:
+    """
+    Запускает HTTP-сервер, отдающий метрики по адресу /metrics
+    """
+    runner = web.AppRunner(create_metrics_app(registry))
+    await runner.setup()
+    await web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+    return runner
 
 
 def main() -> NoReturn:
     dispatcher.middleware.setup(LoggingMiddleware(logger))
-    dispatcher.middleware.setup(AccessMiddleware(ACCESS_IDS))
+    # Проверка доступа - до ограничения частоты: посторонние пользователи
+    # не получают бакетов и уведомлений об ограничении, только отказ в
+    # доступе (не чаще раза в ACCESS_DENY_INTERVAL)
+    access_list = AccessList(ACCESS_IDS, ACCESS_IDS_PATH,
+                             check_interval=ACCESS_IDS_CHECK_INTERVAL)
+    dispatcher.middleware.setup(AccessMiddleware(
+        access_list, deny_interval=ACCESS_DENY_INTERVAL))
+    dispatcher.middleware.setup(throttling_middleware)
 
-    executor.start_polling(dispatcher, skip_updates=True, timeout=60)
+    render_pool.start()
+    janitor = loop.create_task(content_janitor.run())
+    if METRICS_PORT:
+        metrics_runner = loop.run_until_complete(start_metrics_server())
+    try:
+        if BOT_MODE == 'webhook':
+            try:
+                loop.run_until_complete(start_webhook())
+            except KeyboardInterrupt:
+                pass
+        else:
+            executor.start_polling(dispatcher, skip_updates=True, timeout=60)
+    finally:
+        janitor.cancel()
+        if METRICS_PORT:
+            loop.run_until_complete(metrics_runner.cleanup())
+        render_pool.shutdown()
+        session_store.close()
+        font_metrics_registry.save()
+        stop_logging()
 
 
 if __name__ == '__main__':
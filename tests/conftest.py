@@ -1,11 +1,11 @@
 import datetime
-import os
 
 import pytest
 import pytz
 
-from core.config import CONTENT_DIR
 from core.types import UserSession, StickerParameters
+from core.utils.pack_session_handler import pack_handler
+from core.utils.quick_session_handler import quick_handler
 from core.utils.sessions_dispatcher import SessionsDispatcher
 from core.utils.user_session_handler import handler as _handler
 
@@ -23,7 +23,9 @@ def handler():
 @pytest.fixture(scope='module')
 def sessions_dispatcher(handler):
     return SessionsDispatcher(
-        user_session_handler=handler
+        user_session_handler=handler,
+        session_handlers={'create_pack': pack_handler,
+                          'quick_sticker': quick_handler},
     )
 
 
@@ -39,10 +41,3 @@ def user_session():
         data_class=StickerParameters()
     )
 
-
-@pytest.fixture(scope='session', autouse=True)
-def del_tmp_images():
-    yield
-    for file in os.listdir(path=CONTENT_DIR):
-        if file.endswith('.png'):
-            os.remove(os.path.join(CONTENT_DIR, file))
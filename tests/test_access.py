@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from core.utils.access_list import AccessList, parse_access_ids
+from core.utils.middleware import AccessMiddleware
+
+
+def test_parse_access_ids():
+    text = '123, 456\n# комментарий\n-100789  # группа\n\n'
+    assert parse_access_ids(text) == frozenset({123, 456, -100789})
+    assert parse_access_ids('') == frozenset()
+
+
+def test_parse_access_ids_raise():
+    with pytest.raises(ValueError):
+        parse_access_ids('123, YOUR_ID')
+
+
+def test_access_list_from_env_string():
+    access_list = AccessList('1, 2')
+    assert 1 in access_list
+    assert '1' not in access_list
+    assert 3 not in access_list
+
+
+def test_access_list_hot_reload(tmp_path):
+    path = tmp_path / 'access_ids.txt'
+    path.write_text('1\n')
+    access_list = AccessList('5', str(path), check_interval=0)
+    assert access_list.ids == frozenset({1, 5})
+
+    path.write_text('1\n2\n')
+    os.utime(path, ns=(0, 10 ** 9))
+    assert 2 in access_list
+
+    # При ошибке в файле остаётся последний загруженный список
+    path.write_text('1\nfoo\n')
+    os.utime(path, ns=(0, 2 * 10 ** 9))
+    assert access_list.ids == frozenset({1, 2, 5})
+
+    path.unlink()
+    assert access_list.ids == frozenset({1, 2, 5})
+
+
+def test_access_list_check_interval(tmp_path, monkeypatch):
+    path = tmp_path / 'access_ids.txt'
+    path.write_text('1\n')
+    access_list = AccessList(path=str(path), check_interval=60)
+    path.write_text('1\n2\n')
+    assert 2 not in access_list
+    monkeypatch.setattr(AccessList, '_get_monotonic_time',
+                        staticmethod(lambda: access_list._next_check))
+    assert 2 in access_list
+
+
+def test_deny_reply_once_per_interval(monkeypatch, chat_id):
+    now = [0.0]
+    monkeypatch.setattr(AccessMiddleware, '_get_monotonic_time',
+                        staticmethod(lambda: now[0]))
+    middleware = AccessMiddleware(frozenset(), deny_interval=10,
+                                  max_denied_users=2)
+    assert middleware.should_reply(chat_id)
+    assert not middleware.should_reply(chat_id)
+    now[0] = 10
+    assert middleware.should_reply(chat_id)
+    assert not middleware.should_reply(chat_id)
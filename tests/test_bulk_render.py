@@ -0,0 +1,116 @@
+import collections
+import json
+import zipfile
+
+import pytest
+
+from core.fonts import DEFAULT_FONT, FONTS
+from core.types import RenderTask
+from core.utils.bulk_render import (
+    StickerWriter, create_stickers, get_render_task, read_rows, read_tasks,
+)
+from core.utils.sticker_creator import COLORS_MAP, RGB_BLACK, RGB_WHITE
+
+
+def test_get_render_task_defaults():
+    task = get_render_task({'text': 'Съешь  же ещё'}, 7, 'PNG')
+    assert task.text == ('Съешь', 'же', 'ещё')
+    assert task.file_name == '000007.png'
+    assert task.font_name == DEFAULT_FONT
+    assert task.font_color == RGB_BLACK
+    assert task.background_color == RGB_WHITE
+    assert task.image_format == 'PNG'
+
+
+def test_get_render_task_parameters():
+    task = get_render_task({
+        'text': 'Съешь же ещё этих',
+        'splitting': [1, 3],
+        'font': '2',
+        'font_color': 'Красный',
+        'background_color': '0, 0, 255',
+        'format': 'webp',
+        'file_name': 'sticker.webp',
+    }, 1)
+    assert task.text == ('Съешь', 'же ещё этих')
+    assert task.font_name == FONTS[2]
+    assert task.font_color == COLORS_MAP['Красный']
+    assert task.background_color == (0, 0, 255)
+    assert task.image_format == 'WEBP'
+    assert task.file_name == 'sticker.webp'
+
+
+@pytest.mark.parametrize(
+    'row',
+    [
+        {'text': ''},
+        {'text': 'foo bar', 'splitting': '1, 2'},
+        {'text': 'foo', 'font': '100'},
+        {'text': 'foo', 'font': 'unknown.ttf'},
+        {'text': 'foo', 'font_color': '300, 0, 0'},
+    ]
+)
+def test_get_render_task_errors(row):
+    with pytest.raises(Exception):
+        get_render_task(row, 1)
+
+
+def test_read_rows(tmp_path):
+    csv_path = tmp_path / 'stickers.csv'
+    csv_path.write_text('text,font\nfoo bar,1\nbaz,\n', encoding='utf-8')
+    assert [row['text'] for row in read_rows(str(csv_path))] == ['foo bar', 'baz']
+
+    jsonl_path = tmp_path / 'stickers.jsonl'
+    jsonl_path.write_text('\n'.join(json.dumps({'text': text})
+                                    for text in ('foo', 'bar')) + '\n\n',
+                          encoding='utf-8')
+    assert [row['text'] for row in read_rows(str(jsonl_path))] == ['foo', 'bar']
+
+
+def test_read_tasks_skips_invalid_rows(tmp_path, capsys, caplog):
+    path = tmp_path / 'stickers.jsonl'
+    path.write_text('{"text": "foo"}\n{"text": ""}\n{"text": "bar"}\n',
+                    encoding='utf-8')
+    stats = collections.Counter()
+    tasks = list(read_tasks(str(path), 'PNG', stats))
+    assert [task.text for task in tasks] == [('foo',), ('bar',)]
+    assert stats['skipped'] == 1
+    assert 'Строка 2 пропущена' in caplog.text
+    assert capsys.readouterr().err == ''
+
+
+def test_create_stickers_keeps_bounded_in_flight():
+    submitted = []
+
+    def tasks():
+        for index in range(20):
+            submitted.append(index)
+            yield RenderTask(text=(str(index),), file_name=f'{index}.png')
+
+    results = []
+    for task in create_stickers(tasks(), executor_type='thread', max_workers=2,
+                                max_in_flight=3):
+        # Новые задачи не читаются, пока не будут получены готовые
+        # (одна прочитанная задача ждёт освобождения места)
+        assert len(submitted) - len(results) <= 3 + 1
+        results.append(task)
+
+    assert sorted(task.file_name for task in results) == sorted(
+        f'{index}.png' for index in range(20))
+    assert all(task.done and task.content.startswith(b'\x89PNG')
+               for task in results)
+
+
+def test_sticker_writer(tmp_path):
+    task = RenderTask(text=('foo',), file_name='foo.png', content=b'png')
+
+    writer = StickerWriter(str(tmp_path / 'stickers'))
+    writer.write(task)
+    writer.close()
+    assert (tmp_path / 'stickers' / 'foo.png').read_bytes() == b'png'
+
+    writer = StickerWriter(str(tmp_path / 'stickers.zip'))
+    writer.write(task)
+    writer.close()
+    with zipfile.ZipFile(tmp_path / 'stickers.zip') as archive:
+        assert archive.read('foo.png') == b'png'
@@ -0,0 +1,68 @@
+import pytest
+
+from core.utils.cache import LRUCache
+
+
+def test_get_put_equals():
+    cache = LRUCache(max_size=10)
+    cache.put('foo', b'bar')
+    assert cache.get('foo') == b'bar'
+    assert cache.get('baz') is None
+    assert cache.hits == 1 and cache.misses == 1
+    assert cache.size == 3
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(max_size=6)
+    cache.put('a', b'aa')
+    cache.put('b', b'bb')
+    cache.put('c', b'cc')
+    cache.get('a')
+    cache.put('d', b'dd')
+    assert 'a' in cache and 'c' in cache and 'd' in cache
+    assert 'b' not in cache
+    assert cache.size == 6
+    assert cache.evictions == 1
+
+
+def test_replace_value_updates_size():
+    cache = LRUCache(max_size=10)
+    cache.put('a', b'aaaa')
+    cache.put('a', b'a')
+    assert len(cache) == 1
+    assert cache.size == 1
+
+
+def test_value_bigger_than_budget_is_not_stored():
+    cache = LRUCache(max_size=2)
+    cache.put('a', b'aaa')
+    assert 'a' not in cache
+    assert cache.size == 0
+
+
+def test_get_or_load_calls_loader_once():
+    cache = LRUCache(max_size=10, get_size=lambda value: 1)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return object()
+
+    first = cache.get_or_load('key', loader)
+    second = cache.get_or_load('key', loader)
+    assert first is second
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize(
+    'hits, misses, hit_rate',
+    (
+        (0, 0, 0.0),
+        (1, 1, 0.5),
+        (3, 1, 0.75),
+    )
+)
+def test_stats_hit_rate_equals(hits, misses, hit_rate):
+    cache = LRUCache(max_size=10)
+    cache.hits, cache.misses = hits, misses
+    assert cache.stats()['hit_rate'] == hit_rate
@@ -0,0 +1,59 @@
+import asyncio
+import os
+
+import pytest
+
+from core.utils.content_janitor import ContentJanitor
+
+
+def _create_file(path, size: int, mtime: float) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode='wb') as file:
+        file.write(b'x' * size)
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+@pytest.fixture
+def content_dir(tmp_path):
+    _create_file(tmp_path / 'old.png', 100, 1000)
+    _create_file(tmp_path / 'stickers' / 'a.png', 100, 2000)
+    _create_file(tmp_path / 'b.png', 100, 3000)
+    _create_file(tmp_path / 'render_cache' / 'cached', 100, 0)
+    return tmp_path
+
+
+def test_scan_excludes_and_sorts(content_dir):
+    janitor = ContentJanitor(str(content_dir),
+                             exclude=(str(content_dir / 'render_cache'),))
+    entries = janitor.scan()
+    assert [os.path.basename(path) for _, _, path in entries] == [
+        'old.png', 'a.png', 'b.png']
+
+
+def test_clean_by_age_and_size(content_dir):
+    janitor = ContentJanitor(str(content_dir), max_age=1000, max_size=100,
+                             batch_size=1,
+                             exclude=(str(content_dir / 'render_cache'),))
+    report = asyncio.run(janitor.clean(now=2500))
+    assert report.files == 3
+    assert report.size == 300
+    assert report.expired_files == 1
+    assert report.evicted_files == 1
+    assert report.reclaimed_bytes == 200
+    assert os.path.exists(content_dir / 'b.png')
+    assert not os.path.exists(content_dir / 'old.png')
+    assert not os.path.exists(content_dir / 'stickers' / 'a.png')
+    assert os.path.exists(content_dir / 'render_cache' / 'cached')
+
+
+def test_clean_without_limits(content_dir):
+    report = asyncio.run(ContentJanitor(str(content_dir)).clean(now=10 ** 10))
+    assert report.removed_files == 0
+    assert report.files == 4
+
+
+def test_missing_directory(tmp_path):
+    report = asyncio.run(ContentJanitor(str(tmp_path / 'missing'),
+                                        max_age=1).clean())
+    assert report.files == 0
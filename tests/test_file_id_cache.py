@@ -0,0 +1,60 @@
+import os
+
+import pytest
+from aiogram import types
+
+from core.utils.file_id_cache import FileIdCache, get_file_id
+
+
+def test_get_key_equals():
+    assert FileIdCache.get_key('photo', b'foo') == FileIdCache.get_key('photo', b'foo')
+    assert FileIdCache.get_key('photo', b'foo') != FileIdCache.get_key('photo', b'bar')
+    assert FileIdCache.get_key('photo', b'foo') != FileIdCache.get_key('document', b'foo')
+
+
+def test_get_path_key_equals(tmp_path):
+    path = tmp_path / 'foo.png'
+    path.write_bytes(b'foo')
+    key = FileIdCache.get_path_key('photo', str(path))
+    assert key == FileIdCache.get_path_key('photo', str(path))
+    assert key != FileIdCache.get_path_key('document', str(path))
+    path.write_bytes(b'foobar')
+    os.utime(path, ns=(0, 0))
+    assert key != FileIdCache.get_path_key('photo', str(path))
+
+
+def test_put_get_equals():
+    file_id_cache = FileIdCache(max_items=1)
+    first = FileIdCache.get_key('photo', b'foo')
+    second = FileIdCache.get_key('photo', b'bar')
+    file_id_cache.put(first, 'file_id_1')
+    assert file_id_cache.get(first) == 'file_id_1'
+    file_id_cache.put(second, 'file_id_2')
+    assert file_id_cache.get(first) is None
+    assert file_id_cache.get(second) == 'file_id_2'
+
+
+def test_put_none_is_ignored():
+    file_id_cache = FileIdCache(max_items=1)
+    key = FileIdCache.get_key('photo', b'foo')
+    file_id_cache.put(key, None)
+    assert file_id_cache.stats()['items'] == 0
+
+
+_photo = {'file_id': 'small', 'file_unique_id': 's', 'width': 90, 'height': 90}
+_big_photo = {'file_id': 'big', 'file_unique_id': 'b', 'width': 512, 'height': 512}
+_document = {'file_id': 'document', 'file_unique_id': 'd'}
+
+
+@pytest.mark.parametrize(
+    'message, content_type, result',
+    (
+        ({'photo': [_photo, _big_photo]}, 'photo', 'big'),
+        ({'document': _document}, 'document', 'document'),
+        ({'document': _document}, 'photo', None),
+        ({}, 'document', None),
+    )
+)
+def test_get_file_id_equals(message, content_type, result):
+    message = types.Message(**message)
+    assert get_file_id(message, content_type) == result
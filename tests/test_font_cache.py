@@ -0,0 +1,31 @@
+import pytest
+
+from core.config import FONTS_DIR
+from core.fonts import FONTS
+from core.utils.font_cache import FontCache
+
+
+def test_get_font_bytes_reads_file_once(tmp_path):
+    (tmp_path / 'font.ttf').write_bytes(b'font')
+    font_cache = FontCache(str(tmp_path), max_fonts_size=100,
+                           max_files_size=100)
+    assert font_cache.get_font_bytes('font.ttf') == b'font'
+    (tmp_path / 'font.ttf').unlink()
+    assert font_cache.get_font_bytes('font.ttf') == b'font'
+    assert font_cache.files.misses == 1
+    assert font_cache.files.hits == 1
+
+
+@pytest.mark.parametrize(
+    'font',
+    [font for font in FONTS.values()]
+)
+def test_get_font_is_cached(font):
+    font_cache = FontCache(FONTS_DIR, max_fonts_size=1024 * 1024 * 1024,
+                           max_files_size=1024 * 1024 * 1024)
+    first = font_cache.get_font(font, 42)
+    second = font_cache.get_font(font, 42)
+    assert first is second
+    assert font_cache.get_font(font, 43) is not first
+    assert font_cache.fonts.hits == 1 and font_cache.fonts.misses == 2
+    assert font_cache.files.misses == 1
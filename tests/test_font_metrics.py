@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from core.fonts import FONTS
+from core.utils.font_metrics import FontMetrics, FontMetricsRegistry
+from core.utils.sticker_creator import (
+    _get_font, _get_text_area_height_in_px, _get_text_length_in_px,
+)
+
+
+@pytest.fixture(scope='module')
+def font_metrics():
+    return FontMetrics.build(FONTS[1])
+
+
+@pytest.mark.parametrize(
+    'text',
+    ['foo', 'Привет,', 'WWWWW', 'Съешь же ещё', '1234567890']
+)
+def test_predict_size_is_close(font_metrics, text):
+    font_size = font_metrics.predict_size(text, 492)
+    width = _get_text_length_in_px(text, _get_font(FONTS[1], font_size))
+    assert abs(width - 492) / 492 < 0.05
+
+
+@pytest.mark.parametrize(
+    'words',
+    [('foo', 'bar'), ('раз', 'два', 'три', 'четыре', 'пять'), ('a', 'g', 'y')]
+)
+def test_predict_area_size_is_close(font_metrics, words):
+    font_size = font_metrics.predict_area_size(words, 492)
+    height = _get_text_area_height_in_px(words, _get_font(FONTS[1], font_size))
+    assert abs(height - 492) / 492 < 0.1
+
+
+def test_unknown_chars_are_measured_lazily(font_metrics):
+    assert 'ß' not in font_metrics.glyphs
+    assert font_metrics.get_text_width('ßß') > 0
+    assert 'ß' in font_metrics.glyphs and 'ßß' in font_metrics.pairs
+
+
+def test_registry_persists_metrics(tmp_path):
+    registry = FontMetricsRegistry(str(tmp_path))
+    font_metrics = registry.get(FONTS[1])
+    assert registry.get(FONTS[1]) is font_metrics
+
+    path = tmp_path / f'{FONTS[1]}.json'
+    data = json.loads(path.read_text(encoding='utf-8'))
+    assert data['reference_size'] == font_metrics.reference_size
+    assert len(data['glyphs']) == len(font_metrics.glyphs)
+
+    # Загруженная таблица не измеряет уже известные символы заново
+    loaded = FontMetricsRegistry(str(tmp_path)).get(FONTS[1])
+    loaded._measure = None
+    assert loaded.get_glyph('a') == font_metrics.get_glyph('a')
+    assert (loaded.ascent, loaded.descent) == (font_metrics.ascent,
+                                               font_metrics.descent)
+
+
+def test_registry_rebuilds_broken_file(tmp_path):
+    (tmp_path / f'{FONTS[1]}.json').write_text('{', encoding='utf-8')
+    font_metrics = FontMetricsRegistry(str(tmp_path)).get(FONTS[1])
+    assert font_metrics.glyphs
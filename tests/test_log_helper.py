@@ -0,0 +1,28 @@
+import logging
+import queue
+
+from core.logs.log_helper import DroppingQueueHandler, SamplingFilter
+
+
+def _get_record(level: int) -> logging.LogRecord:
+    return logging.LogRecord('test', level, __file__, 1, 'message', None, None)
+
+
+def test_queue_handler_drops_when_full():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+    for _ in range(5):
+        handler.handle(_get_record(logging.WARNING))
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_sampling_filter():
+    assert all(SamplingFilter(0).filter(_get_record(logging.INFO))
+               for _ in range(100))
+    assert not any(SamplingFilter(0).filter(_get_record(logging.DEBUG))
+                   for _ in range(100))
+    assert all(SamplingFilter(1).filter(_get_record(logging.DEBUG))
+               for _ in range(100))
+    passed = sum(SamplingFilter(0.5).filter(_get_record(logging.DEBUG))
+                 for _ in range(1000))
+    assert 300 < passed < 700
@@ -1,13 +1,16 @@
 from core.utils.messages import _messages_map, get_message
+from core.utils.pack_session_handler import pack_handler
+from core.utils.quick_session_handler import quick_handler
 
 
 def test_step_in_handler(handler):
     for step in _messages_map.keys():
-        assert step in handler.steps
+        assert (step in handler.steps or step in pack_handler.steps or
+                step in quick_handler.steps)
 
 
 def test_step_in_messages_map(handler):
-    for step in handler.steps:
+    for step in handler.steps + pack_handler.steps + quick_handler.steps:
         assert step in _messages_map
 
 
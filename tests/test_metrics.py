@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from core.utils.metrics import MetricsRegistry, create_metrics_app
+
+
+@pytest.fixture()
+def registry():
+    return MetricsRegistry(prefix='test_')
+
+
+def test_counter(registry):
+    counter = registry.counter('requests', 'Количество запросов')
+    counter.inc()
+    counter.inc(2)
+    assert registry.render() == (
+        '# HELP test_requests_total Количество запросов\n'
+        '# TYPE test_requests_total counter\n'
+        'test_requests_total 3\n'
+    )
+
+
+def test_labelled_metrics(registry):
+    gauge = registry.gauge('temperature', 'Температура', ('room',))
+    gauge.labels('kitchen').set(21.5)
+    gauge.labels(room='hall').inc()
+    gauge.labels(room='hall').dec(3)
+    assert gauge.labels('kitchen') is gauge.labels(room='kitchen')
+    assert registry.render().splitlines()[2:] == [
+        'test_temperature{room="hall"} -2',
+        'test_temperature{room="kitchen"} 21.5',
+    ]
+
+    with pytest.raises(ValueError):
+        gauge.labels('kitchen', 'extra')
+
+
+def test_histogram(registry):
+    histogram = registry.histogram('duration_seconds', 'Время', ('step',),
+                                   buckets=(0.1, 1))
+    child = histogram.labels('set_text')
+    for value in (0.05, 0.1, 0.5, 2):
+        child.observe(value)
+    assert child.count == 4
+    assert registry.render().splitlines()[2:] == [
+        'test_duration_seconds_bucket{step="set_text",le="0.1"} 2',
+        'test_duration_seconds_bucket{step="set_text",le="1"} 3',
+        'test_duration_seconds_bucket{step="set_text",le="+Inf"} 4',
+        'test_duration_seconds_sum{step="set_text"} 2.65',
+        'test_duration_seconds_count{step="set_text"} 4',
+    ]
+
+
+def test_callback_metric(registry):
+    items = []
+    registry.callback('items', 'Количество элементов', 'gauge',
+                      lambda: [({}, len(items))])
+    items.extend((1, 2))
+    assert registry.render().splitlines()[-1] == 'test_items 2'
+
+    registry.callback('cache_hits', 'Попадания', 'counter',
+                      lambda: [({'cache': 'font'}, 5)])
+    assert registry.render().splitlines()[-1] == 'test_cache_hits_total{cache="font"} 5'
+
+
+def test_duplicate_metric(registry):
+    registry.counter('requests', 'Количество запросов')
+    with pytest.raises(ValueError):
+        registry.gauge('requests', 'Количество запросов')
+
+
+def test_label_escaping(registry):
+    registry.counter('errors', 'Ошибки', ('error',)).labels('a "b"\n').inc()
+    assert registry.render().splitlines()[-1] == r'test_errors_total{error="a \"b\"\n"} 1'
+
+
+def test_metrics_endpoint(registry):
+    registry.counter('requests', 'Количество запросов').inc()
+
+    async def run():
+        async with TestClient(TestServer(create_metrics_app(registry))) as client:
+            response = await client.get('/metrics')
+            return response.status, response.content_type, await response.text()
+
+    status, content_type, text = asyncio.run(run())
+    assert status == 200
+    assert content_type == 'text/plain'
+    assert 'test_requests_total 1' in text
@@ -0,0 +1,68 @@
+import pytest
+
+from core.config import PACK_MAX_STICKERS
+from core.fonts import FONTS
+from core.types import Answer, CloseSession, NotCorrectPhrases
+from core.utils.pack_session_handler import (
+    MEDIA_GROUP_SIZE, _get_phrases, pack_handler,
+)
+
+
+def _create_pack_session(sessions_dispatcher, chat_id):
+    sessions_dispatcher.close_session(chat_id)
+    answers = sessions_dispatcher.command_handler(chat_id, '/create_pack')
+    return sessions_dispatcher._sessions[chat_id], answers
+
+
+def test_get_phrases():
+    assert _get_phrases(' foo  bar \n\n baz\n') == ('foo bar', 'baz')
+
+
+@pytest.mark.parametrize('text', ['', ' \n ', 'foo 😀',
+                                  '\n'.join(['foo'] * (PACK_MAX_STICKERS + 1))])
+def test_get_phrases_raise(text):
+    with pytest.raises(NotCorrectPhrases):
+        _get_phrases(text)
+
+
+def test_pack_session_uses_pack_handler(sessions_dispatcher, chat_id):
+    user_session, answers = _create_pack_session(sessions_dispatcher, chat_id)
+    assert user_session.command == 'create_pack'
+    assert answers[0].text == pack_handler.handle_session(user_session)[0].text
+
+    sessions_dispatcher.message_handler(chat_id, 'foo bar\nbaz')
+    assert user_session.data_class.phrases == ('foo bar', 'baz')
+    assert pack_handler.steps[user_session.current_step] == 'set_background_color'
+    sessions_dispatcher.close_session(chat_id)
+
+
+def test_service_commands(sessions_dispatcher, chat_id):
+    user_session, _ = _create_pack_session(sessions_dispatcher, chat_id)
+    sessions_dispatcher.command_handler(chat_id, '/next_step')
+    assert user_session.current_step == 0
+
+    sessions_dispatcher.message_handler(chat_id, 'foo')
+    sessions_dispatcher.command_handler(chat_id, '/step_back')
+    assert user_session.current_step == 0
+    sessions_dispatcher.close_session(chat_id)
+
+
+def test_send_pack(sessions_dispatcher, chat_id):
+    phrases_count = MEDIA_GROUP_SIZE + 2
+    _create_pack_session(sessions_dispatcher, chat_id)
+    for message in ('\n'.join(f'foo {i}' for i in range(phrases_count)),
+                    'Белый', str(min(FONTS))):
+        sessions_dispatcher.message_handler(chat_id, message)
+    answers = sessions_dispatcher.message_handler(chat_id, 'Чёрный')
+
+    albums = [answer for answer in answers
+              if isinstance(answer, Answer) and answer.content_type == 'media_group']
+    assert [len(album.render_tasks) for album in albums] == [MEDIA_GROUP_SIZE, 2]
+    archive, = [answer for answer in answers
+                if isinstance(answer, Answer) and answer.content_type == 'archive']
+    assert archive.content_path.endswith('.zip')
+    assert len(archive.render_tasks) == phrases_count
+    assert len({task.file_name for task in archive.render_tasks}) == phrases_count
+    assert archive.render_tasks[0].text == ('foo', '0')
+    assert all(task.image_format == 'PNG' for task in archive.render_tasks)
+    assert any(isinstance(answer, CloseSession) for answer in answers)
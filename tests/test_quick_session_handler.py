@@ -0,0 +1,184 @@
+import pytest
+
+from core.fonts import FONTS
+from core.types import CloseSession
+from core.utils.quick_session_handler import (
+    _get_splitting_presets, quick_handler,
+)
+from core.utils.sticker_creator import COLORS_MAP
+
+
+PREVIEW_SIZE = 256
+
+
+@pytest.fixture
+def preview_size(monkeypatch):
+    monkeypatch.setattr('core.utils.quick_session_handler.PREVIEW_SIZE',
+                        PREVIEW_SIZE)
+    return PREVIEW_SIZE
+
+
+def _create_quick_session(sessions_dispatcher, chat_id, text='foo bar baz'):
+    sessions_dispatcher.close_session(chat_id)
+    sessions_dispatcher.command_handler(chat_id, '/quick_sticker')
+    answers = sessions_dispatcher.message_handler(chat_id, text)
+    return sessions_dispatcher._sessions[chat_id], answers
+
+
+def _get_buttons(panel):
+    return {button.text: button.callback_data
+            for row in panel.keyboard.inline_keyboard for button in row}
+
+
+def _press(sessions_dispatcher, chat_id, answers, text):
+    return sessions_dispatcher.callback_handler(chat_id,
+                                                _get_buttons(answers[0])[text])
+
+
+@pytest.mark.parametrize(
+    'words_count, expected_result',
+    [
+        (1, ((1,),)),
+        (2, ((1, 1), (2,))),
+        (7, ((1,) * 7, (7,), (4, 3), (3, 2, 2), (2, 2, 2, 1))),
+    ]
+)
+def test_get_splitting_presets(words_count, expected_result):
+    assert _get_splitting_presets(words_count) == expected_result
+
+
+def test_quick_sticker(sessions_dispatcher, chat_id):
+    user_session, answers = _create_quick_session(sessions_dispatcher, chat_id)
+    assert user_session.command == 'quick_sticker'
+    assert answers[0].content_type == 'panel'
+
+    answers = _press(sessions_dispatcher, chat_id, answers, 'Чёрный')
+    assert user_session.data_class.background_color == COLORS_MAP['Чёрный']
+    assert quick_handler.steps[user_session.current_step] == 'choose_font'
+
+    answers = sessions_dispatcher.callback_handler(
+        chat_id, list(_get_buttons(answers[0]).values())[0])
+    assert user_session.data_class.font_name == FONTS[min(FONTS)]
+
+    answers = _press(sessions_dispatcher, chat_id, answers, 'Белый')
+    assert user_session.data_class.font_color == COLORS_MAP['Белый']
+
+    answers = _press(sessions_dispatcher, chat_id, answers, '2, 1')
+    panel, sticker, close_session = answers
+    assert panel.content_type == 'panel' and panel.keyboard is None
+    assert sticker.render_task.text == ('foo bar', 'baz')
+    # Превью отключено по умолчанию
+    assert panel.render_task is None
+    assert sticker.render_task.background_color == COLORS_MAP['Чёрный']
+    assert isinstance(close_session, CloseSession)
+    sessions_dispatcher.close_session(chat_id)
+
+
+def test_callback_data_is_compact(sessions_dispatcher, chat_id):
+    _, answers = _create_quick_session(sessions_dispatcher, chat_id)
+    for data in _get_buttons(answers[0]).values():
+        assert len(data.encode()) <= 12
+    sessions_dispatcher.close_session(chat_id)
+
+
+def test_navigation(sessions_dispatcher, chat_id):
+    user_session, answers = _create_quick_session(sessions_dispatcher, chat_id)
+    # На первой панели нет кнопки "Назад"
+    assert '« Назад' not in _get_buttons(answers[0])
+
+    answers = _press(sessions_dispatcher, chat_id, answers, 'Далее »')
+    assert quick_handler.steps[user_session.current_step] == 'choose_font'
+    _press(sessions_dispatcher, chat_id, answers, '« Назад')
+    assert quick_handler.steps[user_session.current_step] == 'choose_background_color'
+    sessions_dispatcher.close_session(chat_id)
+
+
+def test_stale_buttons(sessions_dispatcher, chat_id):
+    user_session, first_panel = _create_quick_session(sessions_dispatcher,
+                                                      chat_id)
+    _press(sessions_dispatcher, chat_id, first_panel, 'Чёрный')
+    step = user_session.current_step
+
+    # Кнопки предыдущей панели
+    assert _press(sessions_dispatcher, chat_id, first_panel, 'Белый') == ()
+    assert user_session.data_class.background_color == COLORS_MAP['Чёрный']
+    assert user_session.current_step == step
+
+    # Кнопки панели закрытой сессии
+    user_session, _ = _create_quick_session(sessions_dispatcher, chat_id)
+    user_session.created = user_session.created.replace(
+        microsecond=(user_session.created.microsecond + 1) % 1000000)
+    assert _press(sessions_dispatcher, chat_id, first_panel, 'Белый') == ()
+    sessions_dispatcher.close_session(chat_id)
+    assert _press(sessions_dispatcher, chat_id, first_panel, 'Белый') == ()
+
+
+def test_stale_buttons_after_step_back(sessions_dispatcher, chat_id):
+    user_session, first_panel = _create_quick_session(sessions_dispatcher,
+                                                      chat_id)
+    sessions_dispatcher.command_handler(chat_id, '/step_back')
+    assert user_session.current_step == 0
+    # Данные кнопки первой панели не становятся текстом стикера
+    assert _press(sessions_dispatcher, chat_id, first_panel, 'Белый') == ()
+    assert user_session.data_class.text == 'foo bar baz'
+    assert user_session.current_step == 0
+    sessions_dispatcher.close_session(chat_id)
+
+
+def test_not_numeric_button_value(sessions_dispatcher, chat_id):
+    user_session, _ = _create_quick_session(sessions_dispatcher, chat_id)
+    # Тег сессии без цифр - 'a'
+    user_session.created = user_session.created.replace(microsecond=10)
+    answers = sessions_dispatcher.callback_handler(
+        chat_id, f'a:{user_session.current_step}:x')
+    # Значение не похоже на данные кнопки и разбирается как присланный цвет
+    assert answers[0].content_type == 'message'
+    assert quick_handler.steps[user_session.current_step] == \
+        'choose_background_color'
+    sessions_dispatcher.close_session(chat_id)
+
+
+def test_typed_values(sessions_dispatcher, chat_id):
+    user_session, _ = _create_quick_session(sessions_dispatcher, chat_id,
+                                            text='foo')
+    answers = sessions_dispatcher.message_handler(chat_id, '1 2 3')
+    assert user_session.data_class.background_color == (1, 2, 3)
+    # Новая панель отправляется новым сообщением
+    assert answers[0].content_type == 'panel'
+
+    answers = sessions_dispatcher.message_handler(chat_id, '0')
+    assert answers[0].content_type == 'message'
+    sessions_dispatcher.message_handler(chat_id, str(min(FONTS)))
+    # Текст из одного слова - шаг разбивки пропускается
+    answers = sessions_dispatcher.message_handler(chat_id, '4 5 6')
+    assert answers[1].render_task.font_color == (4, 5, 6)
+    assert isinstance(answers[-1], CloseSession)
+    sessions_dispatcher.close_session(chat_id)
+
+
+def test_callbacks_of_other_sessions(sessions_dispatcher, chat_id):
+    sessions_dispatcher.close_session(chat_id)
+    sessions_dispatcher.command_handler(chat_id, '/create_sticker')
+    user_session = sessions_dispatcher._sessions[chat_id]
+    assert sessions_dispatcher.callback_handler(chat_id, 'a:0:0') == ()
+    assert user_session.current_step == 0
+    sessions_dispatcher.close_session(chat_id)
+
+
+def test_panel_preview(sessions_dispatcher, chat_id, preview_size):
+    user_session, answers = _create_quick_session(sessions_dispatcher, chat_id)
+    preview = answers[0].render_task
+    assert preview.preview_size == preview_size
+    # До выбора разбивки - по слову на строку
+    assert preview.text == ('foo', 'bar', 'baz')
+    assert preview.background_color == user_session.data_class.background_color
+
+    answers = _press(sessions_dispatcher, chat_id, answers, 'Синий')
+    assert answers[0].render_task.background_color == COLORS_MAP['Синий']
+    answers = sessions_dispatcher.callback_handler(
+        chat_id, list(_get_buttons(answers[0]).values())[0])
+    answers = _press(sessions_dispatcher, chat_id, answers, 'Белый')
+    panel, sticker, _ = _press(sessions_dispatcher, chat_id, answers, '2, 1')
+    # Превью на последней панели показывает итоговый стикер
+    assert panel.render_task.text == sticker.render_task.text
+    sessions_dispatcher.close_session(chat_id)
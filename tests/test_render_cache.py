@@ -0,0 +1,103 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from core.types import RenderTask
+from core.utils.render_cache import DiskCache, RenderCache, get_render_key
+from core.utils.render_pool import RenderPool
+
+
+def test_render_key_normalized_text():
+    first = RenderTask(text=('foo  bar', 'baz'), file_name='1.png')
+    second = RenderTask(text=(' foo bar ', 'baz'), file_name='2.png',
+                        font_color=[0, 0, 0])
+    assert get_render_key(first) == get_render_key(second)
+
+
+def test_render_key_depends_on_parameters():
+    task = RenderTask(text=('foo',), file_name='1.png')
+    keys = {
+        get_render_key(task),
+        get_render_key(RenderTask(text=('bar',), file_name='1.png')),
+        get_render_key(RenderTask(text=('foo',), file_name='1.png',
+                                  background_color=(0, 0, 0))),
+        get_render_key(RenderTask(text=('foo',), file_name='1.png',
+                                  font_color=(255, 0, 0))),
+        get_render_key(RenderTask(text=('foo',), file_name='1.png',
+                                  font_name='foo.ttf')),
+        get_render_key(RenderTask(text=('foo',), file_name='1.png',
+                                  picture_width=256)),
+        get_render_key(RenderTask(text=('foo',), file_name='1.png',
+                                  preview_size=128)),
+    }
+    assert len(keys) == 7
+
+
+class TestDiskCache:
+
+    def test_put_get_equals(self, tmp_path):
+        cache = DiskCache(str(tmp_path), max_size=10)
+        cache.put('foo', b'bar')
+        assert cache.get('foo') == b'bar'
+        assert cache.get('baz') is None
+        assert cache.hits == 1 and cache.misses == 1
+
+    def test_evicts_oldest_files(self, tmp_path):
+        cache = DiskCache(str(tmp_path), max_size=4)
+        cache.put('a', b'aa')
+        cache.put('b', b'bb')
+        cache.get('a')
+        cache.put('c', b'cc')
+        assert sorted(os.listdir(tmp_path)) == ['a', 'c']
+        assert cache.size == 4
+
+    def test_index_existing_files(self, tmp_path):
+        DiskCache(str(tmp_path), max_size=10).put('foo', b'bar')
+        cache = DiskCache(str(tmp_path), max_size=10)
+        assert 'foo' in cache
+        assert cache.size == 3
+        assert cache.get('foo') == b'bar'
+
+    def test_concurrent_put_same_key(self, tmp_path):
+        cache = DiskCache(str(tmp_path), max_size=1 << 20)
+        content = b'x' * (1 << 16)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: cache.put('foo', content), range(16)))
+        assert os.listdir(tmp_path) == ['foo']
+        assert cache.get('foo') == content
+        assert cache.size == len(content)
+
+
+def test_render_cache_promotes_disk_hits(tmp_path):
+    cache = RenderCache(max_memory_size=10, disk_directory=str(tmp_path),
+                        max_disk_size=10)
+    cache.put_to_disk('foo', b'bar')
+    assert cache.get('foo') is None
+    assert cache.get_from_disk('foo') == b'bar'
+    assert cache.get('foo') == b'bar'
+    assert set(cache.stats()) == {'memory', 'disk'}
+
+
+def test_render_cache_without_disk():
+    cache = RenderCache(max_memory_size=10)
+    assert cache.disk is None
+    assert cache.get_from_disk('foo') is None
+
+
+def test_render_cache_disk_write_error(tmp_path, caplog):
+    cache = RenderCache(max_memory_size=10, disk_directory=str(tmp_path),
+                        max_disk_size=10)
+    os.rmdir(tmp_path)
+    cache.put_to_disk('foo', b'bar')
+    assert 'foo' not in cache.disk
+    assert 'foo' in caplog.text
+
+
+def test_render_pool_uses_cache():
+    task = RenderTask(text=('foo',), file_name='sticker.png')
+    cache = RenderCache(max_memory_size=10)
+    cache.put(get_render_key(task), b'sticker')
+    render_pool = RenderPool(cache=cache)
+    asyncio.run(render_pool.render(task))
+    assert task.content == b'sticker'
+    assert render_pool._executor is None
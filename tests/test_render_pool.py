@@ -0,0 +1,85 @@
+import asyncio
+import io
+import time
+
+import pytest
+from PIL import Image
+
+from core.fonts import FONTS
+from core.types import RenderTask, RenderTimeout
+from core.utils.render_pool import RenderPool
+
+
+@pytest.fixture
+def render_pool():
+    pool = RenderPool(executor_type='thread', max_workers=2, timeout=5)
+    yield pool
+    pool.shutdown()
+
+
+def test_not_correct_executor_type():
+    with pytest.raises(ValueError):
+        RenderPool(executor_type='foo')
+
+
+def test_run_equals(render_pool):
+    assert asyncio.run(render_pool.run(pow, 2, 10)) == 1024
+
+
+def test_run_in_process_pool_equals():
+    render_pool = RenderPool(executor_type='process', max_workers=1)
+    try:
+        assert asyncio.run(render_pool.run(pow, 2, 10)) == 1024
+    finally:
+        render_pool.shutdown()
+
+
+def test_run_concurrently(render_pool):
+    async def run_many():
+        return await asyncio.gather(*(render_pool.run(time.sleep, 0.1)
+                                      for _ in range(2)))
+
+    started = time.monotonic()
+    asyncio.run(run_many())
+    assert time.monotonic() - started < 0.2
+
+
+def test_render_timeout(render_pool):
+    render_pool.timeout = 0.01
+    render_pool.start()
+    executor = render_pool._executor
+    with pytest.raises(RenderTimeout):
+        asyncio.run(render_pool.run(time.sleep, 0.2))
+    assert render_pool._executor is not None
+    assert render_pool._executor is not executor
+    assert render_pool.abandoned_tasks == 1
+
+
+def test_recycle_after_max_tasks(render_pool):
+    render_pool.max_tasks_per_worker = 2
+    render_pool.start()
+    executor = render_pool._executor
+    for _ in range(render_pool.max_tasks_per_worker * render_pool.max_workers):
+        asyncio.run(render_pool.run(pow, 2, 2))
+    assert render_pool._executor is not executor
+    assert render_pool._tasks_count == 0
+
+
+@pytest.mark.parametrize(
+    'font',
+    [font for font in FONTS.values()]
+)
+def test_render_equals(render_pool, font):
+    task = RenderTask(text=('foo', 'bar'), font_name=font,
+                      file_name='sticker.png')
+    asyncio.run(render_pool.render(task))
+    assert task.done
+    assert task.content.startswith(b'\x89PNG')
+
+
+def test_render_preview_equals(render_pool):
+    task = RenderTask(text=('foo', 'bar'), file_name='preview.png',
+                      preview_size=128)
+    asyncio.run(render_pool.render(task))
+    image = Image.open(io.BytesIO(task.content))
+    assert image.size == (128, 128) and image.mode == 'P'
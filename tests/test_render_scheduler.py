@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from core.types import RenderQueueFull, RenderTask
+from core.utils.render_scheduler import RenderScheduler
+
+
+class _ManualRenderPool:
+    """
+    Пул, в котором отрисовка завершается по команде теста
+    """
+    def __init__(self):
+        self.rendering = []
+
+    async def render(self, task: RenderTask) -> None:
+        done = asyncio.get_running_loop().create_future()
+        self.rendering.append((task, done))
+        await done
+        task.content = b'content'
+
+    def finish(self, count: int = 1) -> None:
+        for _ in range(count):
+            _, done = self.rendering.pop(0)
+            done.set_result(None)
+
+
+def _get_tasks(name: str, count: int):
+    return tuple(RenderTask(text=(name,), file_name=f'{name}{i}.png')
+                 for i in range(count))
+
+
+def test_concurrency_limit_and_round_robin():
+    async def run():
+        render_pool = _ManualRenderPool()
+        scheduler = RenderScheduler(render_pool, max_concurrent=2,
+                                    max_queue_size=10)
+        heavy = scheduler.submit(1, _get_tasks('heavy', 5))
+        light = scheduler.submit(2, _get_tasks('light', 1))
+        await asyncio.sleep(0)
+        assert scheduler.active == 2
+        assert scheduler.queue_size == 4
+        assert scheduler.get_position(1) == 1
+        assert scheduler.get_position(2) == 2
+
+        order = []
+        while render_pool.rendering:
+            order.append(render_pool.rendering[0][0].file_name)
+            render_pool.finish()
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+        await asyncio.gather(*heavy, *light)
+        return order, scheduler
+
+    order, scheduler = asyncio.run(run())
+    # После первого стикера из очереди тяжёлого чата очередь переходит к
+    # лёгкому чату
+    assert order.index('light0.png') == 3
+    assert scheduler.active == scheduler.queue_size == 0
+
+
+def test_queue_full():
+    async def run():
+        render_pool = _ManualRenderPool()
+        scheduler = RenderScheduler(render_pool, max_concurrent=1,
+                                    max_queue_size=2)
+        futures = scheduler.submit(1, _get_tasks('a', 3))
+        with pytest.raises(RenderQueueFull):
+            scheduler.submit(2, _get_tasks('b', 1))
+        await asyncio.sleep(0)
+        render_pool.finish()
+        await asyncio.sleep(0)
+        for future in futures:
+            future.cancel()
+        await asyncio.gather(*futures, return_exceptions=True)
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.active == scheduler.queue_size == 0
+
+
+def test_cancel_releases_slots():
+    async def run():
+        render_pool = _ManualRenderPool()
+        scheduler = RenderScheduler(render_pool, max_concurrent=1,
+                                    max_queue_size=10)
+        futures = scheduler.submit(1, _get_tasks('a', 3))
+        # Отмена до начала выполнения не должна терять место
+        for future in futures:
+            future.cancel()
+        await asyncio.gather(*futures, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert scheduler.active == scheduler.queue_size == 0
+
+        task, = _get_tasks('b', 1)
+        render = asyncio.ensure_future(scheduler.render(2, task))
+        while not render_pool.rendering:
+            await asyncio.sleep(0)
+        render_pool.finish()
+        await render
+        return task
+
+    assert asyncio.run(run()).done
@@ -0,0 +1,186 @@
+import datetime
+import sqlite3
+import time
+
+import pytest
+import pytz
+
+from core.config import SESSION_TTL
+from core.types import RenderTask, StickerParameters, UserSession
+from core.utils.session_store import (
+    MemorySessionStore, SQLiteSessionStore, create_session_store,
+    deserialize_session, serialize_session,
+)
+from core.utils.sessions_dispatcher import SessionsDispatcher
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def session_store(request, tmp_path):
+    store = create_session_store(request.param, str(tmp_path / 'sessions.sqlite3'))
+    yield store
+    store.close()
+
+
+def _get_user_session() -> UserSession:
+    return UserSession(
+        created=datetime.datetime.now(pytz.timezone('Europe/Minsk')),
+        current_step=3,
+        data_class=StickerParameters(text='foo bar', splitting_numbers=(1, 1),
+                                     font_color=(1, 2, 3)),
+        render_task=RenderTask(text=('foo', 'bar'), file_name='foo.png',
+                               content=b'foo'),
+    )
+
+
+def test_save_get_equals(session_store, chat_id):
+    user_session = _get_user_session()
+    session_store.save(chat_id, user_session)
+    assert session_store.get(chat_id) is user_session
+    assert session_store[chat_id] is user_session
+    assert chat_id in session_store
+    assert len(session_store) == 1
+    assert list(session_store) == [chat_id]
+
+
+def test_delete(session_store, chat_id):
+    session_store.save(chat_id, _get_user_session())
+    session_store.delete(chat_id)
+    assert session_store.get(chat_id) is None
+    assert chat_id not in session_store
+    assert len(session_store) == 0
+    with pytest.raises(KeyError):
+        session_store[chat_id]
+
+
+def test_pop_clear(session_store, chat_id):
+    user_session = _get_user_session()
+    session_store.save(chat_id, user_session)
+    assert session_store.pop(chat_id) is user_session
+    assert session_store.pop(chat_id) is None
+    session_store.save(chat_id, user_session)
+    session_store.clear()
+    assert len(session_store) == 0
+
+
+def test_serialize_session_equals():
+    user_session = _get_user_session()
+    result = deserialize_session(serialize_session(user_session))
+    assert result.created == user_session.created
+    assert result.current_step == user_session.current_step
+    assert result.data_class == user_session.data_class
+    assert result.render_task.text == user_session.render_task.text
+    assert result.render_task.file_name == user_session.render_task.file_name
+    assert result.render_task.content is None
+
+
+def test_serialize_pack_session_equals():
+    user_session = _get_user_session()
+    user_session.command = 'create_pack'
+    user_session.data_class.phrases = ('foo bar', 'baz')
+    result = deserialize_session(serialize_session(user_session))
+    assert result.command == 'create_pack'
+    assert result.data_class == user_session.data_class
+
+
+def test_sqlite_store_persists_sessions(tmp_path, chat_id):
+    path = str(tmp_path / 'sessions.sqlite3')
+    session_store = SQLiteSessionStore(path, batch_size=100)
+    session_store.save(chat_id, _get_user_session())
+    session_store.save(chat_id + 1, _get_user_session())
+    session_store.delete(chat_id + 1)
+    session_store.close()
+
+    session_store = SQLiteSessionStore(path)
+    assert list(session_store) == [chat_id]
+    assert session_store.get(chat_id).data_class.text == 'foo bar'
+    session_store.close()
+
+
+def test_sqlite_store_batches_writes(tmp_path, chat_id):
+    session_store = SQLiteSessionStore(str(tmp_path / 'sessions.sqlite3'),
+                                       batch_size=2, flush_interval=60)
+    session_store.save(chat_id, _get_user_session())
+    assert len(session_store._pending) == 1
+    session_store.save(chat_id + 1, _get_user_session())
+    assert len(session_store._pending) == 0
+    session_store.close()
+
+
+def test_sqlite_store_purge(tmp_path, chat_id):
+    session_store = SQLiteSessionStore(str(tmp_path / 'sessions.sqlite3'))
+    session_store.save(chat_id, _get_user_session())
+    assert session_store.purge(time.time() - 60) == 0
+    assert session_store.purge(time.time() + 60) == 1
+    session_store.close()
+
+
+def test_sqlite_store_is_single_process(tmp_path, chat_id):
+    path = str(tmp_path / 'sessions.sqlite3')
+    session_store = SQLiteSessionStore(path)
+    session_store.save(chat_id, _get_user_session())
+    session_store.flush()
+    with pytest.raises(sqlite3.OperationalError):
+        sqlite3.connect(path, timeout=0).execute('SELECT * FROM sessions')
+    session_store.close()
+
+
+def test_sqlite_store_len_without_queries(tmp_path, chat_id):
+    session_store = SQLiteSessionStore(str(tmp_path / 'sessions.sqlite3'),
+                                       flush_interval=60)
+    session_store.save(chat_id, _get_user_session())
+    queries = []
+    session_store._connection.set_trace_callback(queries.append)
+    assert len(session_store) == 1
+    assert chat_id in session_store
+    assert session_store.get(chat_id + 1) is None
+    assert queries == []
+    session_store.close()
+
+
+def test_memory_store_is_default(handler):
+    sessions_dispatcher = SessionsDispatcher(user_session_handler=handler)
+    assert isinstance(sessions_dispatcher._sessions, MemorySessionStore)
+
+
+def test_dispatcher_restores_sessions(handler, tmp_path, chat_id):
+    path = str(tmp_path / 'sessions.sqlite3')
+    sessions_dispatcher = SessionsDispatcher(
+        user_session_handler=handler, session_store=SQLiteSessionStore(path))
+    sessions_dispatcher.command_handler(chat_id, '/create_sticker')
+    sessions_dispatcher.message_handler(chat_id, 'foo bar')
+    sessions_dispatcher._sessions.close()
+
+    sessions_dispatcher = SessionsDispatcher(
+        user_session_handler=handler, session_store=SQLiteSessionStore(path))
+    user_session = sessions_dispatcher._get_session(chat_id)
+    assert user_session.data_class.text == 'foo bar'
+    assert user_session.current_step == handler.steps.index('set_background_color')
+    # Запись восстановленной сессии и запись после её продления
+    assert len(sessions_dispatcher._expiry_heap) == 2
+    now = sessions_dispatcher._get_monotonic_time() + SESSION_TTL - 1
+    sessions_dispatcher._close_old_sessions(now=now)
+    assert sessions_dispatcher._get_session(chat_id) is user_session
+    sessions_dispatcher._sessions.close()
+
+
+def test_dispatcher_expires_restored_sessions(handler, tmp_path, chat_id):
+    path = str(tmp_path / 'sessions.sqlite3')
+    sessions_dispatcher = SessionsDispatcher(
+        user_session_handler=handler, session_store=SQLiteSessionStore(path))
+    sessions_dispatcher.command_handler(chat_id, '/create_sticker')
+    sessions_dispatcher._sessions.close()
+
+    sessions_dispatcher = SessionsDispatcher(
+        user_session_handler=handler, session_store=SQLiteSessionStore(path))
+    # Пользователь, не закончивший стикер, присылает стартовую команду
+    sessions_dispatcher.command_handler(chat_id, '/create_sticker')
+    sessions_dispatcher.command_handler(chat_id + 1, '/create_sticker')
+    sessions_dispatcher._sessions.close()
+
+    sessions_dispatcher = SessionsDispatcher(
+        user_session_handler=handler, session_store=SQLiteSessionStore(path))
+    assert len(sessions_dispatcher._expiry_heap) == 2
+    now = sessions_dispatcher._get_monotonic_time() + SESSION_TTL + 1
+    assert sessions_dispatcher._close_old_sessions(now=now) == 2
+    assert len(sessions_dispatcher._sessions) == 0
+    sessions_dispatcher._sessions.close()
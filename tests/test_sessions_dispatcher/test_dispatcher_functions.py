@@ -2,10 +2,12 @@ import datetime
 
 import pytest
 
+from core.config import SESSION_TTL
 from core.types import (
     UserSession,
     NotCreatedUserSession, NotClosedUserSession,
 )
+from core.utils.sessions_dispatcher import SessionsDispatcher
 
 
 class TestCreateSession:
@@ -48,14 +50,66 @@ def test_close_session(sessions_dispatcher, chat_id):
 def test_close_old_session(sessions_dispatcher, chat_id):
     command = '/create_sticker'
     sessions_dispatcher.command_handler(chat_id, command)
-    _datetime = sessions_dispatcher._get_now_datetime().replace(year=2019)
-    sessions_dispatcher._sessions[chat_id].created = _datetime
-    result = sessions_dispatcher._close_old_sessions()
-    assert result is None
+    now = sessions_dispatcher._get_monotonic_time() + SESSION_TTL + 1
+    result = sessions_dispatcher._close_old_sessions(now=now)
+    assert result >= 1
     assert len(sessions_dispatcher._sessions) == 0
     assert chat_id not in sessions_dispatcher._sessions
 
 
+def test_close_old_session_after_activity(sessions_dispatcher, chat_id):
+    sessions_dispatcher._sessions.clear()
+    sessions_dispatcher.command_handler(chat_id, '/create_sticker')
+    user_session = sessions_dispatcher._sessions[chat_id]
+    user_session.expires_at += SESSION_TTL
+    now = sessions_dispatcher._get_monotonic_time() + SESSION_TTL + 1
+    sessions_dispatcher._close_old_sessions(now=now)
+    assert sessions_dispatcher._sessions[chat_id] is user_session
+    sessions_dispatcher._close_old_sessions(now=now + SESSION_TTL)
+    assert chat_id not in sessions_dispatcher._sessions
+
+
+def test_touch_session(sessions_dispatcher, chat_id):
+    sessions_dispatcher._sessions.clear()
+    sessions_dispatcher._create_session(chat_id)
+    user_session = sessions_dispatcher._sessions[chat_id]
+    user_session.expires_at = 0
+    sessions_dispatcher.message_handler(chat_id, 'foo')
+    assert user_session.expires_at > sessions_dispatcher._get_monotonic_time()
+
+
+def test_touch_session_on_start_command(sessions_dispatcher, chat_id):
+    sessions_dispatcher._sessions.clear()
+    sessions_dispatcher.command_handler(chat_id, '/create_sticker')
+    user_session = sessions_dispatcher._sessions[chat_id]
+    user_session.expires_at = 0
+    # Сессия не закрыта - стартовая команда продлевает её
+    sessions_dispatcher.command_handler(chat_id, '/create_sticker')
+    assert user_session.expires_at > sessions_dispatcher._get_monotonic_time()
+
+
+def test_close_old_sessions_in_batches(handler):
+    sessions_dispatcher = SessionsDispatcher(user_session_handler=handler)
+    for chat_id in range(5):
+        sessions_dispatcher._create_session(chat_id)
+    now = sessions_dispatcher._get_monotonic_time() + SESSION_TTL + 1
+    assert sessions_dispatcher._close_old_sessions(now=now, batch_size=3) == 3
+    assert len(sessions_dispatcher._sessions) == 2
+    assert sessions_dispatcher._close_old_sessions(now=now, batch_size=3) == 2
+    assert len(sessions_dispatcher._sessions) == 0
+
+
+def test_close_old_sessions_skips_closed(sessions_dispatcher, chat_id):
+    sessions_dispatcher._sessions.clear()
+    sessions_dispatcher._create_session(chat_id)
+    sessions_dispatcher.close_session(chat_id)
+    user_session = sessions_dispatcher._create_session(chat_id)
+    user_session.expires_at += SESSION_TTL
+    now = sessions_dispatcher._get_monotonic_time() + SESSION_TTL + 1
+    sessions_dispatcher._close_old_sessions(now=now)
+    assert sessions_dispatcher._sessions[chat_id] is user_session
+
+
 def test_get_now_datetime(sessions_dispatcher):
     _datetime = sessions_dispatcher._get_now_datetime()
     assert isinstance(_datetime, datetime.datetime)
@@ -1,8 +1,16 @@
+import io
+
 import pytest
-from PIL import Image
+from PIL import Image, ImageChops, ImageDraw, features
 
 from core.fonts import FONTS
-from core.utils.sticker_creator import COLORS_MAP, create_sticker
+from core.utils.sticker_creator import (
+    COLORS_MAP, IMAGE_FACTOR, MAX_STICKER_SIZE, TEXT_AREA_SIZE, create_preview,
+    create_sticker, encode_sticker, get_text_mask, text_mask_cache,
+    _draw_text, _get_font, _get_font_size, _get_text_area_height_in_px,
+    _find_boundary, _get_hinted_width_size, _get_text_length_in_px,
+    _get_vertical_offset, _search_font_size,
+)
 
 
 @pytest.mark.parametrize(
@@ -19,7 +27,255 @@ def test_sticker_creator(text, font):
     assert image.width == 512 and image.height == 512
 
 
+@pytest.mark.parametrize(
+    'font',
+    [font for font in FONTS.values()]
+)
+@pytest.mark.parametrize(
+    'font_color, background_color',
+    [
+        (COLORS_MAP['Чёрный'], COLORS_MAP['Белый']),
+        (COLORS_MAP['Жёлтый'], COLORS_MAP['Синий']),
+        (COLORS_MAP['Фиолетовый'], COLORS_MAP['Оранжевый']),
+    ]
+)
+def test_create_sticker_equals_drawing(font, font_color, background_color):
+    text = ('Съешь же ещё', 'этих мягких', 'булок')
+    # Эталон - отрисовка текста прямо на фоне (исходная реализация)
+    expected = Image.new('RGBA', (512, 512), background_color)
+    font_size = _get_font_size(text, font, TEXT_AREA_SIZE)
+    image_font = _get_font(font, font_size)
+    _draw_text(ImageDraw.Draw(expected, mode='RGBA'), text, image_font,
+               font_color, _get_vertical_offset(text, 512, image_font), 512)
+
+    image = create_sticker(text, font_name=font, font_color=font_color,
+                           background_color=background_color)
+    assert image.mode == 'RGBA'
+    assert ImageChops.difference(image, expected).getbbox() is None
+
+
+def test_recolor_uses_cached_mask():
+    text_mask_cache.clear()
+    misses = text_mask_cache.misses
+    for font_color, background_color in ((COLORS_MAP['Чёрный'], COLORS_MAP['Белый']),
+                                         (COLORS_MAP['Белый'], COLORS_MAP['Синий'])):
+        create_sticker(('foo', 'bar'), font_color=font_color,
+                       background_color=background_color)
+    assert text_mask_cache.misses - misses == 1
+
+    create_sticker(('foo bar',))
+    assert text_mask_cache.misses - misses == 2
+
+
+def test_create_preview():
+    text = ('foo', 'bar')
+    preview = create_preview(text, preview_size=128,
+                             background_color=COLORS_MAP['Синий'],
+                             font_color=COLORS_MAP['Жёлтый'])
+    assert preview.size == (128, 128) and preview.mode == 'RGBA'
+    assert preview.getpixel((0, 0)) == COLORS_MAP['Синий'] + (255,)
+
+    # Текст расположен так же, как на стикере
+    mask = get_text_mask(text).resize((128, 128), Image.LANCZOS)
+    background = Image.new('RGB', (128, 128), COLORS_MAP['Синий'])
+    assert (ImageChops.difference(preview.convert('RGB'), background).getbbox() ==
+            mask.getbbox())
+
+    preview = create_preview(text, preview_size=128, picture_width=512,
+                             picture_height=256, mode='P')
+    assert preview.size == (128, 64) and preview.mode == 'P'
+
+
+def test_encode_sticker_equals():
+    image = Image.new('RGBA', (16, 16), COLORS_MAP['Белый'])
+    content = encode_sticker(image)
+    assert content.startswith(b'\x89PNG')
+    assert Image.open(io.BytesIO(content)).size == (16, 16)
+
+
+@pytest.mark.skipif(not features.check('webp'),
+                    reason='Pillow собран без поддержки WebP')
+@pytest.mark.parametrize(
+    'max_size',
+    [MAX_STICKER_SIZE, 100 * 1024]
+)
+def test_encode_webp_sticker_fits_max_size(max_size):
+    image = Image.effect_noise((512, 512), 128).convert('RGBA')
+    content = encode_sticker(image, 'WEBP', max_size=max_size)
+    assert content.startswith(b'RIFF') and content[8:12] == b'WEBP'
+    assert len(content) <= max_size
+
+
 def test_colors_map():
     for rgb in COLORS_MAP.values():
         for val in rgb:
             assert 0 <= val <= 255
+
+
+def _get_font_size_linear(words, font_name, max_text_length):
+    """
+    Эталонный пошаговый подбор размера шрифта (исходная реализация)
+    """
+    word_with_max_length = max(words, key=len)
+    font_size = int(max_text_length / len(word_with_max_length) * IMAGE_FACTOR)
+
+    if_shorter = if_longer = True
+
+    while if_shorter or if_longer:
+        font = _get_font(font_name, font_size)
+        current_text_length = _get_text_length_in_px(word_with_max_length, font)
+
+        if current_text_length < max_text_length:
+            font_size += 1
+            if_shorter = False
+        elif current_text_length > max_text_length:
+            font_size -= 1
+            if_longer = False
+        else:
+            break
+
+    while True:
+        font = _get_font(font_name, font_size)
+        text_area_height = _get_text_area_height_in_px(words, font)
+
+        if max_text_length < text_area_height:
+            font_size -= 1
+        else:
+            break
+
+    return font_size - 1
+
+
+@pytest.mark.parametrize(
+    'font',
+    [font for font in FONTS.values()]
+)
+@pytest.mark.parametrize(
+    'words',
+    [
+        ('a',),
+        ('foo',),
+        ('foo', 'bar'),
+        ('Привет,', 'мир!'),
+        ('!@#',),
+        ('1234567890',),
+        ('WWWWWWWWWWWWWWWWWWWW',),
+        ('iiiiiiiiiiiiiiiiiiii',),
+        ('очень длинная строка с текстом для стикера',),
+        ('раз', 'два', 'три', 'четыре', 'пять'),
+        ('a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j'),
+        ('Съешь же ещё', 'этих мягких', 'французских булок'),
+    ]
+)
+@pytest.mark.parametrize(
+    'max_text_length',
+    [TEXT_AREA_SIZE, 256]
+)
+def test_get_font_size_equals_linear_search(words, font, max_text_length):
+    assert (_get_font_size(words, font, max_text_length) ==
+            _get_font_size_linear(words, font, max_text_length))
+
+
+@pytest.mark.parametrize(
+    'start, direction, boundary, result',
+    (
+        (10, 1, 11, 11),
+        (10, 1, 100, 100),
+        (10, 1, 1000, 1000),
+        (100, -1, 99, 99),
+        (100, -1, 3, 3),
+        (100, -1, 1, 1),
+        (100, -1, 0, 1),
+    )
+)
+def test_search_font_size_equals(start, direction, boundary, result):
+    calls = []
+
+    def is_reached(size):
+        calls.append(size)
+        return size >= boundary if direction > 0 else size <= boundary
+
+    assert _search_font_size(is_reached, start, direction) == result
+    assert len(calls) <= 2 * max(abs(start - boundary), 1).bit_length() + 1
+
+
+@pytest.mark.parametrize(
+    'start, direction, boundary',
+    (
+        (10, 1, 11),
+        (10, 1, 100),
+        (100, -1, 3),
+        (100, -1, 0),
+    )
+)
+@pytest.mark.parametrize(
+    'hint_offset',
+    [-50, -1, 0, 1, 50]
+)
+def test_search_font_size_with_hint_equals(start, direction, boundary,
+                                           hint_offset):
+    def is_reached(size):
+        calls.append(size)
+        return size >= boundary if direction > 0 else size <= boundary
+
+    calls = []
+    expected = _search_font_size(is_reached, start, direction)
+    calls = []
+    assert _search_font_size(is_reached, start, direction,
+                             hint=boundary + hint_offset) == expected
+    if hint_offset in (-1, 0, 1) and boundary > 1:
+        # Подсказка рядом с границей - хватает нескольких проверок
+        assert len(calls) <= 4
+
+
+@pytest.mark.parametrize(
+    'hint, result',
+    ((49, 50), (50, 50), (48, None), (51, None), (None, None))
+)
+def test_find_boundary_equals(hint, result):
+    calls = []
+
+    def is_reached(size):
+        calls.append(size)
+        return size >= 50
+
+    assert _find_boundary(is_reached, hint) == result
+    assert len(calls) <= 2
+
+
+def _get_width_size_linear(width, max_text_length, font_size):
+    # Подбор по ширине из эталонной реализации _get_font_size_linear
+    if_shorter = if_longer = True
+    while if_shorter or if_longer:
+        if width(font_size) < max_text_length:
+            font_size += 1
+            if_shorter = False
+        elif width(font_size) > max_text_length:
+            font_size -= 1
+            if_longer = False
+        else:
+            break
+    return font_size
+
+
+@pytest.mark.parametrize('start', [10, 59, 60, 61, 62, 100])
+@pytest.mark.parametrize('hint_offset', [-2, -1, 0, 1])
+@pytest.mark.parametrize('max_text_length', [40, 41])
+def test_get_hinted_width_size_equals_linear(start, hint_offset,
+                                             max_text_length):
+    # Ширина на размерах 60 и 61 одинакова и равна 40
+    def width(size):
+        calls.append(size)
+        return size * 2 // 3
+
+    calls = []
+    expected = _get_width_size_linear(width, max_text_length, start)
+    boundary = next(size for size in range(1, 200)
+                    if width(size) >= max_text_length)
+    calls = []
+    result = _get_hinted_width_size(width, max_text_length, start,
+                                    boundary + hint_offset)
+    assert result is None or result == expected
+    if hint_offset in (-1, 0) and width(boundary) != max_text_length:
+        assert result == expected
+    assert len(set(calls)) <= 2
@@ -0,0 +1,83 @@
+import pytest
+
+from core.utils.middleware import ThrottlingMiddleware
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(ThrottlingMiddleware, '_get_monotonic_time',
+                        staticmethod(clock))
+    return clock
+
+
+@pytest.fixture
+def middleware(clock):
+    return ThrottlingMiddleware({'commands': 2, 'renders': 10, 'messages': 0},
+                                period=10)
+
+
+def test_consume_limit(middleware, chat_id):
+    assert middleware.consume(chat_id, 'commands')
+    assert middleware.consume(chat_id, 'commands')
+    assert not middleware.consume(chat_id, 'commands')
+    # Бакеты пользователей независимы
+    assert middleware.consume(chat_id + 1, 'commands')
+
+
+def test_unlimited_kind(middleware, chat_id):
+    assert all(middleware.consume(chat_id, 'messages') for _ in range(100))
+
+
+def test_refill(middleware, clock, chat_id):
+    middleware.consume(chat_id, 'commands', cost=2)
+    assert not middleware.consume(chat_id, 'commands')
+    clock.now += 5
+    assert middleware.consume(chat_id, 'commands')
+    assert not middleware.consume(chat_id, 'commands')
+    clock.now += 100
+    assert middleware._buckets['commands'][chat_id].tokens <= 2
+
+
+def test_cost_above_limit_requires_full_bucket(middleware, clock, chat_id):
+    assert middleware.consume(chat_id, 'renders', cost=50)
+    assert not middleware.consume(chat_id, 'renders', cost=50)
+    clock.now += 10
+    assert middleware.consume(chat_id, 'renders', cost=50)
+
+
+def test_one_notice_per_period(middleware, clock, chat_id):
+    assert not middleware.should_notify(chat_id, 'commands')
+    middleware.consume(chat_id, 'commands', cost=3)
+    assert middleware.should_notify(chat_id, 'commands')
+    assert not middleware.should_notify(chat_id, 'commands')
+    clock.now += 10
+    assert middleware.should_notify(chat_id, 'commands')
+
+
+def test_cleanup_idle_buckets(middleware, clock, chat_id):
+    middleware.consume(chat_id, 'commands')
+    clock.now += 5
+    middleware.consume(chat_id + 1, 'commands')
+    clock.now += 5
+    middleware.consume(chat_id + 1, 'commands')
+    assert list(middleware._buckets['commands']) == [chat_id + 1]
+
+
+def test_refund(middleware, clock, chat_id):
+    assert middleware.consume(chat_id, 'renders', cost=8)
+    assert not middleware.consume(chat_id, 'renders', cost=5)
+    middleware.refund(chat_id, 'renders', cost=8)
+    assert middleware.consume(chat_id, 'renders', cost=10)
+    # Возврат не превышает лимит, а для неограниченных видов ничего не делает
+    middleware.refund(chat_id, 'renders', cost=50)
+    assert middleware._buckets['renders'][chat_id].tokens == 10
+    middleware.refund(chat_id, 'messages')
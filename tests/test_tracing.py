@@ -0,0 +1,117 @@
+import asyncio
+import json
+
+import pytest
+
+from core.utils import tracing
+from core.utils.tracing import Tracer, get_trace_id, span
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    traces = []
+    monkeypatch.setattr(tracing.logger, 'info',
+                        lambda line: traces.append(json.loads(line)))
+    return traces
+
+
+def test_nested_spans(emitted):
+    with Tracer(sample_rate=1).trace('message', chat_id=1) as trace:
+        assert get_trace_id() == trace.trace_id
+        with span('handle_session', step=0):
+            with span('step', step='set_text') as record:
+                record['answers'] = 2
+        with span('send'):
+            pass
+
+    assert get_trace_id() is None
+    assert len(emitted) == 1
+    line = emitted[0]
+    assert line['trace_id'] == trace.trace_id
+    assert line['name'] == 'message'
+    assert line['chat_id'] == 1
+    assert line['duration_ms'] >= 0
+    handle, step, send = line['spans']
+    assert handle['parent'] is None and handle['step'] == 0
+    assert step['parent'] == handle['id'] and step['answers'] == 2
+    assert send['parent'] is None
+    assert all(record['duration_ms'] >= 0 for record in line['spans'])
+
+
+def test_span_error(emitted):
+    with pytest.raises(ValueError):
+        with Tracer(sample_rate=1).trace('command'):
+            with span('step'):
+                raise ValueError()
+
+    assert emitted[0]['spans'][0]['error'] == 'ValueError'
+
+
+def test_span_outside_trace(emitted):
+    with span('step') as record:
+        assert record is None
+    assert not emitted
+
+
+def test_disabled_tracer(emitted):
+    tracer = Tracer()
+    assert not tracer.enabled
+    with tracer.trace('message') as trace:
+        assert trace is None
+        with span('step') as record:
+            assert record is None
+    assert not emitted
+
+
+def test_nested_trace(emitted):
+    tracer = Tracer(sample_rate=1)
+    with tracer.trace('message'):
+        with tracer.trace('command') as trace:
+            assert trace is None
+    assert len(emitted) == 1
+
+
+def test_not_sampled(emitted, monkeypatch):
+    monkeypatch.setattr(tracing.random, 'random', lambda: 0.5)
+    with Tracer(sample_rate=0.1, slow_threshold=10).trace('message'):
+        pass
+    assert not emitted
+
+    with Tracer(sample_rate=0.9).trace('message'):
+        pass
+    assert len(emitted) == 1
+
+
+def test_slow_trace(emitted, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(tracing.time, 'perf_counter', lambda: now[0])
+    tracer = Tracer(slow_threshold=2)
+
+    with tracer.trace('message'):
+        now[0] += 1
+    assert not emitted
+
+    with tracer.trace('message'):
+        now[0] += 3
+    assert len(emitted) == 1
+    assert emitted[0]['duration_ms'] == 3000
+
+
+def test_context_propagation(emitted):
+    async def render(index):
+        with span('render', index=index):
+            await asyncio.sleep(0)
+
+    async def handle():
+        with Tracer(sample_rate=1).trace('message'):
+            with span('handle_session'):
+                tasks = [asyncio.create_task(render(index))
+                         for index in range(3)]
+            await asyncio.gather(*tasks)
+
+    asyncio.run(handle())
+
+    handle_record, *renders = emitted[0]['spans']
+    assert [record['index'] for record in renders] == [0, 1, 2]
+    # Задачи продолжают трассу с интервалом, в котором были созданы
+    assert all(record['parent'] == handle_record['id'] for record in renders)
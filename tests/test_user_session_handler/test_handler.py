@@ -2,6 +2,8 @@ from typing import Callable, Sequence
 
 import pytest
 
+from core.types import Answer, SessionHandler, TooManyTransitions, Transition
+
 
 def test_handler_steps_count(handler):
     for step in handler.steps:
@@ -52,3 +54,55 @@ def test_update_current_step(handler, user_session, message):
     for index, step_name in enumerate(handler.steps):
         user_session.current_step = index
         assert handler.update_current_step(user_session, message) is None
+
+
+@pytest.fixture
+def toy_handler():
+    toy_handler = SessionHandler(steps=('first', 'second', 'third'),
+                                 max_transitions=4)
+
+    @toy_handler.register_function(alias='first')
+    def _first(user_session, message):
+        if message is None:
+            return (Answer(text='first'),)
+        return Transition()
+
+    @toy_handler.register_function(alias='second')
+    def _second(user_session, message):
+        return Transition()
+
+    @toy_handler.register_function(alias='third')
+    def _third(user_session, message):
+        if message == 'step_back':
+            return Transition('step_back')
+        return (Answer(text='third'),)
+
+    return toy_handler
+
+
+def test_transitions(toy_handler, user_session):
+    durations = []
+    toy_handler.add_transition_hook(
+        lambda step, result, duration: durations.append((step, result)))
+
+    answers = toy_handler.handle_session(user_session, 'text')
+    assert answers[0].text == 'third'
+    assert user_session.current_step == 2
+    assert [step for step, _ in durations] == ['first', 'second', 'third']
+    assert durations[0][1] == Transition()
+
+
+def test_runaway_transitions(toy_handler, user_session):
+    # third -> second -> third ... - шаги передают управление друг другу
+    @toy_handler.register_function(alias='third')
+    def _third(user_session, message):
+        return Transition('step_back')
+
+    user_session.current_step = 1
+    with pytest.raises(TooManyTransitions):
+        toy_handler.handle_session(user_session)
+
+
+def test_unregistered_step(user_session):
+    with pytest.raises(KeyError):
+        SessionHandler(steps=('first',)).handle_session(user_session)
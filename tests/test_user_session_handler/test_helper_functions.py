@@ -3,9 +3,11 @@ import datetime
 import pytest
 import pytz
 
+import core.utils.session_helpers as helpers
 import core.utils.user_session_handler as ush
 from core.fonts import MAX_FONT_NUMBER, MIN_FONT_NUMBER
 from core.types import (
+    RenderTask,
     NotCorrectFontNumber, NotCorrectRGBCode, NotCorrectSplittingText,
 )
 
@@ -25,7 +27,7 @@ class TestSetColorHelper:
         )
     )
     def test_equals(self, code, result):
-        assert ush._set_color_helper(code) == result
+        assert helpers.set_color_helper(code) == result
 
     @pytest.mark.parametrize(
         'code',
@@ -38,7 +40,7 @@ class TestSetColorHelper:
     )
     def test_not_correct_rgb_code(self, code):
         with pytest.raises(NotCorrectRGBCode):
-            ush._set_color_helper(code)
+            helpers.set_color_helper(code)
 
 
 class TestSetFontHelper:
@@ -51,7 +53,7 @@ class TestSetFontHelper:
         )
     )
     def test_equals(self, font_number, user_session):
-        assert ush._set_font_helper(font_number, user_session) is None
+        assert helpers.set_font_helper(font_number, user_session) is None
 
     @pytest.mark.parametrize(
         'font_number',
@@ -64,7 +66,7 @@ class TestSetFontHelper:
     )
     def test_not_correct_font_number(self, font_number, user_session):
         with pytest.raises(NotCorrectFontNumber):
-            ush._set_font_helper(font_number, user_session)
+            helpers.set_font_helper(font_number, user_session)
 
 
 class TestGetSplittingNumbers:
@@ -80,7 +82,7 @@ class TestGetSplittingNumbers:
         )
     )
     def test_equals(self, pattern, default_pattern, result):
-        assert ush._get_splitting_numbers(pattern, default_pattern) == result
+        assert helpers.get_splitting_numbers(pattern, default_pattern) == result
 
     @pytest.mark.parametrize(
         'pattern, default_pattern',
@@ -96,7 +98,7 @@ class TestGetSplittingNumbers:
     )
     def test_not_correct_splitting_text(self, pattern, default_pattern):
         with pytest.raises(NotCorrectSplittingText):
-            ush._get_splitting_numbers(pattern, default_pattern)
+            helpers.get_splitting_numbers(pattern, default_pattern)
 
 
 @pytest.mark.parametrize(
@@ -112,7 +114,7 @@ class TestGetSplittingNumbers:
     )
 )
 def test_is_valid_rgb_code_equals(code, result):
-    assert ush._is_valid_rgb_code(code) == result
+    assert helpers._is_valid_rgb_code(code) == result
 
 
 @pytest.mark.parametrize(
@@ -124,7 +126,7 @@ def test_is_valid_rgb_code_equals(code, result):
     )
 )
 def test_set_splitting_numbers_helper_equals(text, result):
-    assert ush._set_splitting_numbers_helper(text) == result
+    assert helpers.set_splitting_numbers_helper(text) == result
 
 
 @pytest.mark.parametrize(
@@ -148,7 +150,7 @@ def test_get_split_pattern_equals(count, result):
     )
 )
 def test_get_str_splitting_numbers_equals(pattern, result):
-    assert ush._get_str_splitting_numbers(pattern) == result
+    assert helpers.get_str_splitting_numbers(pattern) == result
 
 
 @pytest.mark.parametrize(
@@ -161,12 +163,36 @@ def test_get_str_splitting_numbers_equals(pattern, result):
     )
 )
 def test_get_splitting_text_equals(text, pattern, result):
-    assert ush._get_splitting_text(text, pattern) == result
+    assert helpers.get_splitting_text(text, pattern) == result
 
 
 def test_generate_filename_equals():
-    assert isinstance(ush._generate_filename(), str)
+    assert isinstance(helpers.generate_filename(), str)
 
 
 def test_get_date_formatted_equals():
-    assert ush._get_date_formatted(_datetime) == _datetime.strftime('%Y-%m-%d')
+    assert helpers.get_date_formatted(_datetime) == _datetime.strftime('%Y-%m-%d')
+
+
+@pytest.mark.parametrize(
+    'image_format, extension',
+    (
+        ('PNG', '.png'),
+        ('WEBP', '.webp'),
+    )
+)
+def test_get_file_name_equals(image_format, extension):
+    assert helpers.get_file_name(_datetime, image_format).endswith(extension)
+
+
+def test_get_png_render_task_equals():
+    png_task = RenderTask(text=('foo',), file_name='foo.png')
+    webp_task = RenderTask(text=('foo',), file_name='foo.webp',
+                           image_format='WEBP', content=b'foo')
+    assert ush._get_png_render_task(None) is None
+    assert ush._get_png_render_task(png_task) is png_task
+    result = ush._get_png_render_task(webp_task)
+    assert result.image_format == 'PNG'
+    assert result.file_name == 'foo.png'
+    assert result.content is None
+    assert result.text == webp_task.text
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import time
+from typing import List
+
+import pytest
+from aiogram import Bot, types
+from aiogram.dispatcher import Dispatcher
+from aiohttp.test_utils import TestClient, TestServer
+
+from core.utils.webhook import (
+    WEBHOOK_HANDLER_KEY, create_webhook_app, get_webhook_path,
+)
+
+
+TOKEN = '123456789:AAEtestTOKENtestTOKENtestTOKENtest12'
+
+
+def get_update(update_id: int, text: str = 'test') -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 1600000000,
+            'chat': {'id': 1, 'type': 'private'},
+            'from': {'id': 1, 'is_bot': False, 'first_name': 'test'},
+            'text': text,
+        },
+    }
+
+
+def post_updates(updates: List[dict], path: str, secret: str = '',
+                 handler_delay: float = 0, max_concurrent_updates: int = 100):
+    received = []
+
+    async def run():
+        bot = Bot(token=TOKEN)
+        dispatcher = Dispatcher(bot)
+
+        @dispatcher.message_handler()
+        async def process_message(message: types.Message) -> None:
+            await asyncio.sleep(handler_delay)
+            received.append((message.message_id, message.text,
+                             Bot.get_current() is bot))
+
+        app = create_webhook_app(dispatcher, '/webhook', secret=secret,
+                                 max_concurrent_updates=max_concurrent_updates)
+        async with TestClient(TestServer(app)) as client:
+            statuses = []
+            for update in updates:
+                response = await client.post(path, json=update)
+                statuses.append(response.status)
+            await app[WEBHOOK_HANDLER_KEY].wait_closed()
+        await bot.session.close()
+        return statuses
+
+    return asyncio.run(run()), received
+
+
+@pytest.mark.parametrize(
+    'path, secret, expected_result',
+    [
+        ('webhook', None, '/webhook'),
+        ('/webhook/', '', '/webhook'),
+        ('/webhook', 'secret', '/webhook/secret'),
+        ('/', 'secret', '/secret'),
+    ]
+)
+def test_get_webhook_path(path, secret, expected_result):
+    assert get_webhook_path(path, secret) == expected_result
+
+
+def test_webhook_processes_updates():
+    statuses, received = post_updates([get_update(i) for i in range(1, 6)],
+                                      path='/webhook')
+    assert statuses == [200] * 5
+    assert sorted(received) == [(i, 'test', True) for i in range(1, 6)]
+
+
+def test_webhook_checks_secret():
+    statuses, received = post_updates(
+        [get_update(1), get_update(2), get_update(3)],
+        path='/webhook/wrong', secret='secret',
+    )
+    assert statuses == [404] * 3
+    assert received == []
+
+    statuses, received = post_updates([get_update(1)], path='/webhook/secret',
+                                      secret='secret')
+    assert statuses == [200]
+    assert received == [(1, 'test', True)]
+
+
+def test_webhook_responds_before_processing():
+    # Обработка каждого обновления занимает 0.2 секунды, но ответы приходят
+    # сразу, а сами обновления обрабатываются одновременно
+    started = time.monotonic()
+    statuses, received = post_updates([get_update(i) for i in range(1, 11)],
+                                      path='/webhook', handler_delay=0.2)
+    elapsed = time.monotonic() - started
+    assert statuses == [200] * 10
+    assert len(received) == 10
+    assert elapsed < 1
+
+
+def test_webhook_rejects_invalid_json():
+    async def run():
+        bot = Bot(token=TOKEN)
+        app = create_webhook_app(Dispatcher(bot), '/webhook')
+        async with TestClient(TestServer(app)) as client:
+            response = await client.post('/webhook', data=b'not json')
+            status = response.status
+        await bot.session.close()
+        return status
+
+    assert asyncio.run(run()) == 400
+
+
+@pytest.mark.parametrize('answer_callback_queries', [True, False])
+def test_webhook_answers_callback_queries(answer_callback_queries):
+    update = {
+        'update_id': 1,
+        'callback_query': {
+            'id': '42',
+            'from': {'id': 1, 'is_bot': False, 'first_name': 'test'},
+            'chat_instance': '1',
+            'data': 'a:1:0',
+        },
+    }
+    received = []
+
+    async def run():
+        bot = Bot(token=TOKEN)
+        dispatcher = Dispatcher(bot)
+
+        @dispatcher.callback_query_handler()
+        async def process_callback(callback_query: types.CallbackQuery) -> None:
+            received.append(callback_query.data)
+
+        app = create_webhook_app(dispatcher, '/webhook',
+                                 answer_callback_queries=answer_callback_queries)
+        async with TestClient(TestServer(app)) as client:
+            response = await client.post('/webhook', json=update)
+            body = await response.text()
+            await app[WEBHOOK_HANDLER_KEY].wait_closed()
+        await bot.session.close()
+        return body
+
+    body = asyncio.run(run())
+    assert received == ['a:1:0']
+    if answer_callback_queries:
+        assert json.loads(body) == {'method': 'answerCallbackQuery',
+                                    'callback_query_id': '42'}
+    else:
+        assert body == 'ok'